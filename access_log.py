@@ -0,0 +1,244 @@
+"""Append-only, indexed store for person-detection access log entries.
+
+Entries live in SQLite (WAL mode) keyed by an increasing sequence number,
+so appending is a single-row insert and listing newest-first is an index
+walk that can resume from a cursor. Labels get their own index table for
+filtering. Entries keep the shape the API has always returned.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    ts REAL NOT NULL,
+    entry TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_ts ON entries (ts);
+CREATE TABLE IF NOT EXISTS entry_labels (
+    label TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (label, seq)
+) WITHOUT ROWID;
+"""
+
+
+def _entry_time(entry):
+    """Epoch seconds of an entry's local ``timestamp`` string."""
+    try:
+        return datetime.strptime(entry["timestamp"], TIMESTAMP_FORMAT).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return 0.0
+
+
+def _well_formed(entry):
+    """True if a legacy entry is a dict with a string ``id`` and a list of string labels."""
+    if not isinstance(entry, dict) or not isinstance(entry.get("id"), str):
+        return False
+    labels = entry.get("labels", [])
+    return isinstance(labels, list) and all(isinstance(label, str) for label in labels)
+
+
+class AccessLogStore:
+    """Access log entries in SQLite, newest first.
+
+    Every method takes the store's own lock, so one instance can be shared
+    by the detection thread and request handlers.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def _insert(self, entry):
+        cur = self._db.execute(
+            "INSERT INTO entries (id, ts, entry) VALUES (?, ?, ?)",
+            (entry["id"], _entry_time(entry), json.dumps(entry)),
+        )
+        self._db.executemany(
+            "INSERT OR IGNORE INTO entry_labels VALUES (?, ?)",
+            [(label, cur.lastrowid) for label in entry.get("labels", [])],
+        )
+
+    def append(self, entry):
+        """Add a new entry (a dict with at least ``id`` and ``timestamp``)."""
+        self.append_many([entry])
+
+    def append_many(self, entries):
+        """Add several entries in one transaction (one commit, one WAL sync)."""
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            for entry in entries:
+                self._insert(entry)
+
+    def migrate_json(self, json_path):
+        """One-time import of a legacy ``access_log.json`` (newest first).
+
+        The file is renamed to ``*.migrated`` afterwards so it is not
+        imported again. Duplicate and malformed entries are skipped. Returns
+        the number of entries imported.
+        """
+        if not os.path.isfile(json_path):
+            return 0
+        try:
+            with open(json_path, "r") as f:
+                entries = json.load(f)
+        except (json.JSONDecodeError, OSError) as exc:
+            print(f"Warning: could not migrate {json_path} ({exc})")
+            return 0
+        if not isinstance(entries, list):
+            print(f"Warning: could not migrate {json_path} (not a list of entries)")
+            return 0
+        imported = 0
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            for entry in reversed(entries):
+                if not _well_formed(entry):
+                    continue
+                self._db.execute("SAVEPOINT entry")
+                try:
+                    self._insert(entry)
+                    imported += 1
+                except sqlite3.IntegrityError:
+                    # Duplicate id; skip it
+                    self._db.execute("ROLLBACK TO entry")
+                self._db.execute("RELEASE entry")
+        skipped = len(entries) - imported
+        if skipped:
+            print(f"Warning: skipped {skipped} duplicate or malformed entries in {json_path}")
+        os.replace(json_path, json_path + ".migrated")
+        return imported
+
+    def page(self, limit=100, cursor=None, since=None, until=None, label=None,
+             cursors=False):
+        """Return ``(entries, next_cursor)``, newest first.
+
+        ``cursor`` is the value returned by the previous page; ``since`` and
+        ``until`` bound the entry time (epoch seconds, ``until`` exclusive);
+        ``label`` keeps only entries with that label. ``next_cursor`` is None
+        on the last page. With ``cursors`` a third item lists, per entry,
+        the cursor that continues right after it.
+        """
+        where, args = [], []
+        if label is not None:
+            sql = ("SELECT e.seq, e.entry FROM entry_labels l "
+                   "JOIN entries e ON e.seq = l.seq")
+            where.append("l.label = ?")
+            args.append(label)
+            seq_col = "l.seq"
+        else:
+            sql = "SELECT e.seq, e.entry FROM entries e"
+            seq_col = "e.seq"
+        if cursor is not None:
+            where.append(f"{seq_col} < ?")
+            args.append(int(cursor))
+        if since is not None:
+            where.append("e.ts >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("e.ts < ?")
+            args.append(until)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {seq_col} DESC LIMIT ?"
+        args.append(limit + 1)
+
+        with self._lock:
+            rows = self._db.execute(sql, args).fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = str(rows[-1][0]) if more else None
+        entries = [json.loads(entry) for _, entry in rows]
+        if cursors:
+            return entries, next_cursor, [str(seq) for seq, _ in rows]
+        return entries, next_cursor
+
+    def get(self, entry_id):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT entry FROM entries WHERE id = ?", (entry_id,),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, entry_id, **fields):
+        """Set fields of an entry; returns the updated entry, or None if it does not exist."""
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            row = self._db.execute(
+                "SELECT entry FROM entries WHERE id = ?", (entry_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            entry = {**json.loads(row[0]), **fields}
+            self._db.execute(
+                "UPDATE entries SET entry = ? WHERE id = ?", (json.dumps(entry), entry_id),
+            )
+        return entry
+
+    def _delete(self, entry_id):
+        row = self._db.execute(
+            "SELECT seq, entry FROM entries WHERE id = ?", (entry_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        seq, entry = row[0], json.loads(row[1])
+        self._db.execute("DELETE FROM entries WHERE seq = ?", (seq,))
+        self._db.executemany(
+            "DELETE FROM entry_labels WHERE label = ? AND seq = ?",
+            [(label, seq) for label in entry.get("labels", [])],
+        )
+        return entry
+
+    def delete(self, entry_id):
+        """Remove one entry; returns it, or None if it does not exist."""
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            return self._delete(entry_id)
+
+    def delete_many(self, entry_ids):
+        """Remove several entries in one transaction; returns those that existed."""
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            removed = [self._delete(entry_id) for entry_id in entry_ids]
+        return [entry for entry in removed if entry is not None]
+
+    def oldest(self, limit):
+        """Return ``(id, ts)`` of up to ``limit`` entries, oldest first."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT id, ts FROM entries ORDER BY seq LIMIT ?", (limit,),
+            ).fetchall()
+
+    def ids(self):
+        """Set of all entry ids."""
+        with self._lock:
+            return {r[0] for r in self._db.execute("SELECT id FROM entries")}
+
+    def clear(self):
+        """Remove every entry; returns ``(id, image)`` for each removed one."""
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            removed = self._db.execute(
+                "SELECT id, json_extract(entry, '$.image') FROM entries"
+            ).fetchall()
+            self._db.execute("DELETE FROM entries")
+            self._db.execute("DELETE FROM entry_labels")
+        return removed
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT count(*) FROM entries").fetchone()[0]
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,572 @@
+"""Aggregator mode: one API over the monitors of several rooms.
+
+Each room runs its own monitor (a "node"). The aggregator keeps one
+Server-Sent Events connection open per node and caches what it pushes
+(the latest reading, detection toggles and detection summary), so
+``/nodes`` and ``/reading`` answer from memory and every aggregator
+``/events`` subscriber is fed from those same connections. Video is
+relayed: however many viewers watch a node's camera, the aggregator holds
+one upstream ``/video_feed`` connection per camera and profile, opened for
+the first viewer and closed a few seconds after the last one leaves.
+Access log pages and snapshot images are fetched on demand over a shared
+pool of keep-alive connections; the logs of every node are merged into
+one newest-first view with its own cursor.
+
+Fetches block on the network. Under the gevent server they must not run on
+the hub's thread, so ``run_blocking`` is pointed at gevent's thread pool
+(see gevent_server.py); with the threaded development server it simply
+calls the function.
+"""
+
+import base64
+import binascii
+import heapq
+import http.client
+import json
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from access_log import _entry_time
+from events import EventHub
+from metrics import registry
+from streaming import DEFAULT_PROFILES, MjpegBroadcaster
+
+# Events the nodes push whose latest value is cached per node
+CACHED_EVENTS = ("sensor", "detection_status", "detections")
+
+_NODE_REQUEST = registry.stage("node_request")
+_OPENED = registry.counter("node_connections_opened", "HTTP connections opened to nodes.")
+_REUSED = registry.counter(
+    "node_connections_reused", "Node requests sent on a pooled keep-alive connection.",
+)
+
+
+class NodeError(RuntimeError):
+    """A node could not be reached or sent something unexpected."""
+
+
+def parse_node(spec):
+    """Parse ``NAME=URL`` or ``URL`` into ``(name, host, port)``.
+
+    Without a name the node is called ``host:port``.
+    """
+    name, sep, url = spec.partition("=")
+    if not sep:
+        name, url = "", spec
+    if "://" not in url:
+        url = f"http://{url}"
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme != "http" or not parts.hostname:
+        raise ValueError(f"Node '{spec}' must be an http://host:port URL")
+    port = parts.port or 80
+    name = name or f"{parts.hostname}:{port}"
+    if "/" in name:
+        raise ValueError(f"Node name '{name}' must not contain '/'")
+    return name, parts.hostname, port
+
+
+def _call(fn, *args):
+    return fn(*args)
+
+
+class ConnectionPool:
+    """Keep-alive HTTP connections to the nodes, shared by all requests.
+
+    Up to ``max_idle`` idle connections per node are kept for the next
+    request. A pooled connection the node has since closed is retried once
+    on a fresh one. Nodes on the development server close every
+    connection, so only gevent-served nodes benefit from the reuse.
+    """
+
+    def __init__(self, timeout=5.0, max_idle=4):
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle = {}  # (host, port) -> [HTTPConnection]
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.reused = 0
+
+    def _connect(self, address, timeout=None):
+        with self._lock:
+            self.opened += 1
+        _OPENED.inc()
+        return http.client.HTTPConnection(*address, timeout=timeout or self.timeout)
+
+    def _acquire(self, address):
+        with self._lock:
+            idle = self._idle.get(address)
+            if idle:
+                self.reused += 1
+                _REUSED.inc()
+                return idle.pop(), True
+        return self._connect(address), False
+
+    def _release(self, address, conn):
+        with self._lock:
+            idle = self._idle.setdefault(address, [])
+            if len(idle) < self.max_idle:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def get(self, address, path, headers=None):
+        """GET ``path``; returns ``(status, headers, body)`` or raises NodeError."""
+        conn, reused = self._acquire(address)
+        while True:
+            try:
+                conn.request("GET", path, headers=headers or {})
+                response = conn.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, OSError) as exc:
+                conn.close()
+                if reused:
+                    # The node closed the idle connection; try a fresh one
+                    conn, reused = self._connect(address), False
+                    continue
+                raise NodeError(f"{address[0]}:{address[1]}: {exc}") from exc
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(address, conn)
+            return response.status, response.headers, body
+
+    def open_stream(self, address, path, timeout):
+        """GET ``path`` on a dedicated connection for a long-lived response.
+
+        Returns ``(connection, response)``; the caller reads the response
+        and closes the connection. Streams are never pooled.
+        """
+        conn = self._connect(address, timeout)
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+        except (http.client.HTTPException, OSError) as exc:
+            conn.close()
+            raise NodeError(f"{address[0]}:{address[1]}: {exc}") from exc
+        if response.status != 200:
+            conn.close()
+            raise NodeError(f"{address[0]}:{address[1]}{path}: HTTP {response.status}")
+        return conn, response
+
+    def stats(self):
+        with self._lock:
+            idle = sum(len(conns) for conns in self._idle.values())
+            return {"opened": self.opened, "reused": self.reused, "idle": idle}
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+def _read_events(response):
+    """Yield ``(event, data)`` from a ``text/event-stream`` response."""
+    event, data = "message", []
+    while True:
+        line = response.readline()
+        if not line:
+            return
+        line = line.rstrip(b"\r\n").decode()
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith(":"):
+            continue  # keepalive comment
+        else:
+            field, _, value = line.partition(":")
+            value = value[1:] if value.startswith(" ") else value
+            if field == "event":
+                event = value
+            elif field == "data":
+                data.append(value)
+
+
+def _read_part(response):
+    """Read one JPEG from a multipart MJPEG response; None at the end."""
+    line = response.readline()
+    while line in (b"\r\n", b"\n"):  # the previous part's trailer
+        line = response.readline()
+    if not line:
+        return None
+    if not line.startswith(b"--frame"):
+        raise NodeError("Unexpected data in MJPEG stream")
+    length = None
+    while True:
+        line = response.readline()
+        if not line:
+            return None
+        if line in (b"\r\n", b"\n"):
+            break
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value)
+    if length is None:
+        raise NodeError("MJPEG part without Content-Length")
+    jpeg = response.read(length)
+    return jpeg if len(jpeg) == length else None
+
+
+class UpstreamStream:
+    """A node's camera profile relayed to any number of local viewers.
+
+    The relay thread holds one connection to the node's ``/video_feed``
+    while anyone is watching and republishes each JPEG as it arrives.
+    It exits ``idle_secs`` after the last viewer leaves and is started
+    again by the next one.
+    """
+
+    def __init__(self, node, profile, max_viewers=None, idle_secs=5.0):
+        self.node = node
+        self.profile = profile
+        self.idle_secs = idle_secs
+        self.broadcaster = MjpegBroadcaster(max_viewers)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._conn = None
+        self.connects = 0
+        self.frames = 0
+        self.error = None
+
+    @property
+    def connected(self):
+        return self._conn is not None
+
+    def open_viewer(self):
+        """Register a viewer (ViewerLimitError when full) and make sure the relay runs."""
+        viewer = self.broadcaster.open_viewer()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, daemon=True,
+                    name=f"relay-{self.node.name}-{self.profile}",
+                )
+                self._thread.start()
+        return viewer
+
+    def _finished(self):
+        """Whether the relay can stop; decided under the lock open_viewer takes."""
+        with self._lock:
+            if self.broadcaster.viewer_count or self.node.stopped:
+                return self.node.stopped
+            self._thread = None
+            return True
+
+    def _relay(self):
+        """Relay frames until nobody has watched for ``idle_secs``."""
+        query = urllib.parse.urlencode({"profile": self.profile})
+        conn, response = self.node.pool.open_stream(
+            self.node.address, f"/video_feed?{query}", self.node.stream_timeout,
+        )
+        self._conn = conn
+        self.connects += 1
+        self.error = None
+        idle_since = None
+        try:
+            while not self.node.stopped:
+                jpeg = _read_part(response)
+                if jpeg is None:
+                    raise NodeError("Video stream ended")
+                now = time.monotonic()
+                self.broadcaster.publish(jpeg, now)
+                self.frames += 1
+                if self.broadcaster.viewer_count:
+                    idle_since = None
+                elif idle_since is None:
+                    idle_since = now
+                elif now - idle_since >= self.idle_secs:
+                    return
+        finally:
+            self._conn = None
+            conn.close()
+
+    def _run(self):
+        while True:
+            try:
+                self._relay()
+            except (NodeError, http.client.HTTPException, OSError, ValueError) as exc:
+                self.error = str(exc)
+                self.node._stop.wait(1.0)
+            if self._finished():
+                return
+
+    def close(self):
+        conn = self._conn
+        if conn is not None:
+            conn.close()
+
+    def status(self):
+        return {
+            "viewers": self.broadcaster.viewer_count,
+            "upstream_connected": self.connected,
+            "upstream_connects": self.connects,
+            "frames_relayed": self.frames,
+            "error": self.error,
+        }
+
+
+class Node:
+    """One monitor being aggregated: its cached state, event feed and streams."""
+
+    def __init__(self, name, host, port, pool, event_hub, profiles=DEFAULT_PROFILES,
+                 max_viewers=None, stream_idle_secs=5.0, stream_timeout=10.0,
+                 events_timeout=45.0):
+        self.name = name
+        self.address = (host, port)
+        self.url = f"http://{host}:{port}"
+        self.pool = pool
+        self.stream_timeout = stream_timeout
+        self.events_timeout = events_timeout  # a node sends a keepalive every 15 s
+        self._event_hub = event_hub
+        self._stop = threading.Event()
+        self._events_conn = None
+        self._thread = None
+        self.online = False
+        self.error = None
+        self.last_event_at = None
+        self.state = dict.fromkeys(CACHED_EVENTS)
+        self.streams = {
+            profile: UpstreamStream(self, profile, max_viewers, stream_idle_secs)
+            for profile in profiles
+        }
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._events_loop, daemon=True, name=f"node-{self.name}-events",
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        conn = self._events_conn
+        if conn is not None:
+            conn.close()
+        for stream in self.streams.values():
+            stream.close()
+
+    def _set_online(self, online, error=None):
+        self.error = error
+        if online != self.online:
+            self.online = online
+            self._event_hub.publish("node_status", {
+                "node": self.name, "online": online, "error": error,
+            })
+
+    def _events_loop(self):
+        """Follow the node's /events, reconnecting with backoff while it is down."""
+        backoff = 1.0
+        while not self.stopped:
+            try:
+                conn, response = self.pool.open_stream(
+                    self.address, "/events", self.events_timeout,
+                )
+                self._events_conn = conn
+                try:
+                    self._set_online(True)
+                    backoff = 1.0
+                    for event, data in _read_events(response):
+                        self._on_event(event, data)
+                finally:
+                    self._events_conn = None
+                    conn.close()
+                error = "Event stream ended"
+            except (NodeError, http.client.HTTPException, OSError, ValueError) as exc:
+                error = str(exc)
+            if self.stopped:
+                return
+            self._set_online(False, error)
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    def _on_event(self, event, data):
+        self.last_event_at = time.time()
+        if event == "resync":
+            # We only ever need the latest values, which keep coming
+            return
+        if event in self.state:
+            self.state[event] = data
+        self._event_hub.publish(event, {"node": self.name, "data": data})
+
+    def get(self, path, headers=None):
+        """GET ``path`` from the node through the pool; blocks."""
+        t0 = registry.clock()
+        try:
+            return self.pool.get(self.address, path, headers)
+        finally:
+            _NODE_REQUEST.since(t0)
+
+    def status(self):
+        return {
+            "name": self.name,
+            "url": self.url,
+            "online": self.online,
+            "error": self.error,
+            "last_event_at": self.last_event_at,
+            **self.state,
+            "streams": {name: s.status() for name, s in self.streams.items()},
+        }
+
+
+def _encode_cursor(state):
+    raw = json.dumps(state, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _decode_cursor(cursor):
+    """Per-node positions from an aggregate cursor; raises ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        state = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError):
+        raise ValueError(f"Invalid cursor '{cursor}'") from None
+    if not isinstance(state, dict) or not all(
+        value is None or (isinstance(value, str) and value.isdigit())
+        for value in state.values()
+    ):
+        raise ValueError(f"Invalid cursor '{cursor}'")
+    return state
+
+
+class Aggregator:
+    """The nodes of a multi-room deployment behind one API.
+
+    ``nodes`` is a list of ``NAME=URL`` / ``URL`` strings (see parse_node).
+    """
+
+    def __init__(self, nodes, max_stream_viewers=None, max_event_subscribers=None,
+                 timeout=5.0, stream_idle_secs=5.0):
+        self.pool = ConnectionPool(timeout)
+        self.event_hub = EventHub(max_subscribers=max_event_subscribers)
+        self.nodes = {}
+        for spec in nodes:
+            name, host, port = parse_node(spec)
+            if name in self.nodes:
+                raise ValueError(f"Duplicate node name '{name}'")
+            self.nodes[name] = Node(
+                name, host, port, self.pool, self.event_hub,
+                max_viewers=max_stream_viewers, stream_idle_secs=stream_idle_secs,
+            )
+        if not self.nodes:
+            raise ValueError("No nodes to aggregate")
+        # Fans access log requests out to every node at once
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(self.nodes), thread_name_prefix="node-fetch",
+        )
+        self.run_blocking = _call
+        self._order = {name: i for i, name in enumerate(self.nodes)}
+
+    def start(self):
+        for node in self.nodes.values():
+            node.start()
+
+    def stop(self):
+        for node in self.nodes.values():
+            node.stop()
+        self._executor.shutdown(wait=False)
+        self.pool.close()
+
+    def client_buses(self):
+        """The FrameBuses HTTP clients wait on (relayed streams and /events)."""
+        return [
+            stream.broadcaster.bus
+            for node in self.nodes.values() for stream in node.streams.values()
+        ] + [self.event_hub.bus]
+
+    def fetch(self, name, path, headers=None):
+        """GET ``path`` from node ``name``; returns ``(status, headers, body)``.
+
+        Raises KeyError for an unknown node and NodeError if it cannot be
+        reached. Safe to call from a request handler in either server mode.
+        """
+        return self.run_blocking(self.nodes[name].get, path, headers)
+
+    def _fetch_page(self, node, query):
+        status, headers, body = node.get(f"/access-logs?{urllib.parse.urlencode(query)}")
+        if status != 200:
+            raise NodeError(f"{node.name}: /access-logs answered HTTP {status}")
+        entries = json.loads(body)
+        cursors = headers.get("X-Entry-Cursors", "")
+        cursors = cursors.split(",") if cursors else []
+        if len(cursors) != len(entries):
+            raise NodeError(f"{node.name}: no per-entry cursors (node too old?)")
+        return entries, cursors, headers.get("X-Next-Cursor") is not None
+
+    def _page(self, limit, cursor, since, until, label):
+        state = _decode_cursor(cursor) if cursor else {}
+        base = {"limit": limit, "cursors": 1}
+        for key, value in (("from", since), ("to", until), ("label", label)):
+            if value is not None:
+                base[key] = value
+        # A node missing from the cursor starts from its newest entry; one
+        # mapped to None has no more entries
+        active = [n for n in self.nodes.values() if state.get(n.name, "") is not None]
+        futures = {}
+        for node in active:
+            query = dict(base)
+            if state.get(node.name):
+                query["cursor"] = state[node.name]
+            futures[node.name] = self._executor.submit(self._fetch_page, node, query)
+        pages, unavailable = {}, []
+        for name, future in futures.items():
+            try:
+                pages[name] = future.result()
+            except (NodeError, ValueError) as exc:
+                print(f"Warning: access logs from node {name} unavailable ({exc})")
+                unavailable.append(name)
+
+        # Each node's page is already newest first; merge them by entry time
+        heads = []
+        for name, (entries, _, _) in pages.items():
+            if entries:
+                heads.append((-_entry_time(entries[0]), self._order[name], 0, name))
+        heapq.heapify(heads)
+        merged, taken = [], dict.fromkeys(pages, 0)
+        while heads and len(merged) < limit:
+            _, order, i, name = heapq.heappop(heads)
+            entries = pages[name][0]
+            merged.append(dict(entries[i], node=name))
+            taken[name] = i + 1
+            if i + 1 < len(entries):
+                heapq.heappush(heads, (-_entry_time(entries[i + 1]), order, i + 1, name))
+
+        new_state = dict(state)
+        for name, (entries, cursors, more) in pages.items():
+            count = taken[name]
+            if count == len(entries) and not more:
+                new_state[name] = None
+            elif count:
+                new_state[name] = cursors[count - 1]
+            elif name not in state:
+                # Pin the start so newer entries cannot shift later pages
+                new_state[name] = str(int(cursors[0]) + 1)
+        more = any(new_state[name] is not None for name in pages)
+        return merged, _encode_cursor(new_state) if more else None, unavailable
+
+    def page(self, limit=100, cursor=None, since=None, until=None, label=None):
+        """One page of every node's access log merged newest first.
+
+        Returns ``(entries, next_cursor, unavailable)``. Entries carry a
+        ``node`` key; ``cursor`` is the previous page's ``next_cursor``,
+        which is None after the last page. Nodes that cannot be reached
+        are listed in ``unavailable`` and left out of this page. Raises
+        ValueError for a malformed cursor.
+        """
+        return self.run_blocking(self._page, limit, cursor, since, until, label)
+
+    def readings(self):
+        """Latest cached sensor reading per node (None before the first one)."""
+        return {name: node.state["sensor"] for name, node in self.nodes.items()}
+
+    def status(self):
+        return {
+            "nodes": [node.status() for node in self.nodes.values()],
+            "pool": self.pool.stats(),
+        }
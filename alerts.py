@@ -0,0 +1,614 @@
+"""Alert rules evaluated incrementally over the sensor and detection streams.
+
+A rule watches one signal, aggregates it over a sliding window and
+compares the result with a threshold::
+
+    [{"name": "hot", "signal": "temperature", "op": ">", "value": 30, "for_secs": 300},
+     {"name": "damp", "signal": "humidity", "aggregate": "rate",
+      "window_secs": 3600, "op": ">", "value": 10},
+     {"name": "after-hours", "signal": "people", "op": ">", "value": 0,
+      "schedule": {"days": ["mon", "tue", "wed", "thu", "fri"],
+                   "hours": "08:00-18:00", "outside": true}}]
+
+Signals are ``temperature`` and ``humidity`` (every sensor reading),
+``people`` (confirmed person tracks) and ``detections`` (all tracks),
+the last two after every detection pass. Aggregates are ``last`` (the
+default), ``avg``, ``min``, ``max`` and ``rate`` (units per hour, the
+least-squares slope over the window). Each is updated as samples enter
+and leave the window, so a sample costs amortized O(1) per rule on its
+signal however long the window is; history is never rescanned. Windows
+are kept as time buckets, so memory does not grow with the sample rate,
+and rules over the same signal, aggregate and window length share one.
+
+A rule fires once its condition has held for ``for_secs`` and resolves
+once it has been false for ``clear_secs``. A ``schedule`` limits when the
+condition can hold. Firing and resolved alerts are published on the event
+hub and handed to an AlertDispatcher, which batches them to a sink.
+"""
+
+import collections
+import json
+import operator
+import os
+import threading
+import time
+import urllib.request
+from datetime import datetime
+
+from metrics import registry
+
+SIGNALS = ("temperature", "humidity", "people", "detections")
+AGGREGATES = ("last", "avg", "min", "max", "rate")
+MAX_RULES = 1000
+OPERATORS = {
+    ">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le,
+    "==": operator.eq, "!=": operator.ne,
+}
+DAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+# Time buckets per aggregate window
+_BUCKETS = 120
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_EVAL = registry.stage("alert_eval")  # one sample through every rule on its signal
+_FIRED = registry.counter("alerts", "Alert state changes.", state="firing")
+_RESOLVED = registry.counter("alerts", "Alert state changes.", state="resolved")
+_SENT = registry.counter("alert_deliveries", "Alerts delivered to the sink.")
+_FAILED = registry.counter("alert_delivery_failures", "Failed alert batch deliveries.")
+_DROPPED = registry.counter("alerts_dropped", "Alerts given up on or pushed out of the queue.")
+
+
+def _number(rule, key, name, default=None, minimum=None):
+    value = rule.get(key, default)
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        raise ValueError(f"Rule '{name}': '{key}' must be a number")
+    if minimum is not None and value < minimum:
+        raise ValueError(f"Rule '{name}': '{key}' must be at least {minimum}")
+    return float(value)
+
+
+def _minutes(value, name):
+    try:
+        hours, minutes = value.split(":")
+        hours, minutes = int(hours), int(minutes)
+    except (AttributeError, ValueError):
+        raise ValueError(f"Rule '{name}': schedule times must be HH:MM") from None
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or hours * 60 + minutes > 1440:
+        raise ValueError(f"Rule '{name}': schedule times must be HH:MM")
+    return hours * 60 + minutes
+
+
+def _parse_schedule(schedule, name):
+    if not isinstance(schedule, dict):
+        raise ValueError(f"Rule '{name}': 'schedule' must be an object")
+    days = schedule.get("days", list(DAYS))
+    if not isinstance(days, list) or not all(d in DAYS for d in days):
+        raise ValueError(f"Rule '{name}': schedule 'days' must be a list of {', '.join(DAYS)}")
+    hours = schedule.get("hours", "00:00-24:00")
+    start, sep, end = hours.partition("-") if isinstance(hours, str) else ("", "", "")
+    if not sep:
+        raise ValueError(f"Rule '{name}': schedule 'hours' must be HH:MM-HH:MM")
+    _minutes(start, name), _minutes(end, name)
+    return {
+        "days": [d for d in DAYS if d in days],
+        "hours": hours,
+        "outside": bool(schedule.get("outside", False)),
+    }
+
+
+def parse_rules(data):
+    """Validate a list of rule dicts; returns a normalized copy or raises ValueError."""
+    if not isinstance(data, list):
+        raise ValueError("'rules' must be a list")
+    if len(data) > MAX_RULES:
+        raise ValueError(f"At most {MAX_RULES} rules are supported")
+    rules, names = [], set()
+    for i, rule in enumerate(data):
+        if not isinstance(rule, dict):
+            raise ValueError("Each rule must be an object")
+        name = str(rule.get("name") or f"rule-{i + 1}")
+        if name in names:
+            raise ValueError(f"Rule names must be unique ('{name}' is repeated)")
+        names.add(name)
+        if rule.get("signal") not in SIGNALS:
+            raise ValueError(f"Rule '{name}': 'signal' must be one of {', '.join(SIGNALS)}")
+        aggregate = rule.get("aggregate", "last")
+        if aggregate not in AGGREGATES:
+            raise ValueError(
+                f"Rule '{name}': 'aggregate' must be one of {', '.join(AGGREGATES)}"
+            )
+        if rule.get("op") not in OPERATORS:
+            raise ValueError(f"Rule '{name}': 'op' must be one of {' '.join(OPERATORS)}")
+        parsed = {
+            "name": name,
+            "signal": rule["signal"],
+            "aggregate": aggregate,
+            "window_secs": _number(rule, "window_secs", name, 0, 0),
+            "op": rule["op"],
+            "value": _number(rule, "value", name),
+            "for_secs": _number(rule, "for_secs", name, 0, 0),
+            "clear_secs": _number(rule, "clear_secs", name, 0, 0),
+            "severity": str(rule.get("severity", "warning")),
+        }
+        if aggregate != "last" and not parsed["window_secs"]:
+            raise ValueError(f"Rule '{name}': '{aggregate}' needs a 'window_secs'")
+        if "schedule" in rule:
+            parsed["schedule"] = _parse_schedule(rule["schedule"], name)
+        rules.append(parsed)
+    return rules
+
+
+class _Window:
+    """One aggregate over the last ``secs`` seconds of a signal, kept up to date.
+
+    Samples are summarized per time bucket, ``_BUCKETS`` to a window, so
+    memory does not grow with the sample rate and the window's far edge
+    moves a bucket at a time. min/max keep a monotonic deque of candidates
+    (at most one per bucket); avg and rate keep running sums that expiring
+    buckets are subtracted from. Adding a sample is amortized O(1).
+    """
+
+    def __init__(self, aggregate, secs):
+        self.aggregate = aggregate
+        self.width = secs / _BUCKETS if aggregate != "last" else None
+        self._last = None
+        self._last_t = None
+        self._better = operator.lt if aggregate == "min" else operator.gt
+        self._extreme = collections.deque()  # (bucket, v) min/max candidates, oldest first
+        # avg/rate: [bucket, n, su, sv, suu, suv] with u = t - bucket start
+        self._buckets = collections.deque()
+        self._origin = 0.0
+        self._totals = [0.0] * 5  # n, st, sv, stt, stv with t relative to _origin
+        self._expired = 0
+
+    def add(self, t, v):
+        if self._last_t is not None and t < self._last_t:
+            t = self._last_t  # the clock stepped back; keep the buckets in order
+        self._last_t = t
+        self._last = v
+        if self.width is None:
+            return
+        bucket = int(t // self.width)
+        if self.aggregate in ("min", "max"):
+            extreme = self._extreme
+            while extreme and not self._better(extreme[-1][1], v):
+                extreme.pop()
+            # A worse value from the same bucket would expire with the better one
+            if not extreme or extreme[-1][0] != bucket:
+                extreme.append((bucket, v))
+        else:
+            buckets = self._buckets
+            if not buckets or buckets[-1][0] != bucket:
+                if not buckets:
+                    self._origin = bucket * self.width
+                buckets.append([bucket, 0, 0.0, 0.0, 0.0, 0.0])
+            b = buckets[-1]
+            u = t - bucket * self.width
+            b[1] += 1
+            b[2] += u
+            b[3] += v
+            b[4] += u * u
+            b[5] += u * v
+            totals = self._totals
+            u = t - self._origin
+            totals[0] += 1
+            totals[1] += u
+            totals[2] += v
+            totals[3] += u * u
+            totals[4] += u * v
+        self._expire(bucket - _BUCKETS)
+
+    def advance(self, now):
+        """Drop what has left the window by ``now`` when no samples arrive."""
+        if self.width is not None:
+            self._expire(int(now // self.width) - _BUCKETS)
+
+    def _expire(self, oldest):
+        """Drop buckets up to and including ``oldest``."""
+        extreme = self._extreme
+        while extreme and extreme[0][0] <= oldest:
+            extreme.popleft()
+        buckets = self._buckets
+        while buckets and buckets[0][0] <= oldest:
+            bucket, n, su, sv, suu, suv = buckets.popleft()
+            d = bucket * self.width - self._origin
+            totals = self._totals
+            totals[0] -= n
+            totals[1] -= su + n * d
+            totals[2] -= sv
+            totals[3] -= suu + 2 * d * su + n * d * d
+            totals[4] -= suv + d * sv
+            self._expired += 1
+        if self._expired >= _BUCKETS:
+            self._recompute()
+
+    def _recompute(self):
+        """Rebuild the sums from the buckets, relative to the oldest one.
+
+        Keeps rounding errors from piling up and the relative times small.
+        """
+        self._expired = 0
+        totals = self._totals = [0.0] * 5
+        if not self._buckets:
+            return
+        self._origin = self._buckets[0][0] * self.width
+        for bucket, n, su, sv, suu, suv in self._buckets:
+            d = bucket * self.width - self._origin
+            totals[0] += n
+            totals[1] += su + n * d
+            totals[2] += sv
+            totals[3] += suu + 2 * d * su + n * d * d
+            totals[4] += suv + d * sv
+
+    def value(self):
+        """The aggregate, or None without enough samples in the window."""
+        if self.aggregate == "last":
+            return self._last
+        if self.aggregate in ("min", "max"):
+            return self._extreme[0][1] if self._extreme else None
+        n, st, sv, stt, stv = self._totals
+        if n < 0.5:
+            return None
+        if self.aggregate == "avg":
+            return sv / n
+        denominator = n * stt - st * st
+        if n < 3 or denominator <= 1e-9 * n * stt:
+            return None
+        return (n * stv - st * sv) / denominator * 3600
+
+
+def _schedule_check(schedule):
+    """Return ``in_schedule(now)`` for a parsed schedule."""
+    start, end = (_minutes(x, "") for x in schedule["hours"].split("-"))
+    days = {DAYS.index(d) for d in schedule["days"]}
+    outside = schedule["outside"]
+
+    def in_schedule(now):
+        local = time.localtime(now)
+        minute = local.tm_hour * 60 + local.tm_min
+        if start <= end:
+            inside = local.tm_wday in days and start <= minute < end
+        else:
+            # Overnight range: the part after midnight belongs to the day before
+            inside = ((local.tm_wday in days and minute >= start)
+                      or ((local.tm_wday - 1) % 7 in days and minute < end))
+        return inside != outside
+
+    return in_schedule
+
+
+class Rule:
+    """A parsed rule and its alert state (ok, pending, firing).
+
+    ``window`` aggregates the rule's signal; rules with the same signal,
+    aggregate and window length share one.
+    """
+
+    def __init__(self, spec, window):
+        self.spec = spec
+        self.name = spec["name"]
+        self.window = window
+        self._compare = OPERATORS[spec["op"]]
+        self._in_schedule = _schedule_check(spec["schedule"]) if "schedule" in spec else None
+        self.state = "ok"
+        self.value = None
+        self.since = None  # when the current state began
+        self._true_since = None
+        self._false_since = None
+
+    @staticmethod
+    def window_key(spec):
+        secs = spec["window_secs"] if spec["aggregate"] != "last" else 0
+        return spec["signal"], spec["aggregate"], secs
+
+    def evaluate(self, now):
+        """Check the condition at ``now``; returns "firing", "resolved" or None."""
+        spec = self.spec
+        self.value = self.window.value()
+        holds = self.value is not None and self._compare(self.value, spec["value"])
+        if holds and self._in_schedule is not None:
+            holds = self._in_schedule(now)
+        if holds:
+            self._false_since = None
+            if self._true_since is None:
+                self._true_since = now
+            if self.state == "ok":
+                self.state, self.since = "pending", now
+            if self.state == "pending" and now - self._true_since >= spec["for_secs"]:
+                self.state, self.since = "firing", now
+                return "firing"
+            return None
+        self._true_since = None
+        if self.state == "pending":
+            self.state, self.since = "ok", now
+        elif self.state == "firing":
+            if self._false_since is None:
+                self._false_since = now
+            if now - self._false_since >= spec["clear_secs"]:
+                self.state, self.since = "ok", now
+                return "resolved"
+        return None
+
+    def alert(self, state, now):
+        spec = self.spec
+        return {
+            "rule": self.name,
+            "state": state,
+            "severity": spec["severity"],
+            "signal": spec["signal"],
+            "aggregate": spec["aggregate"],
+            "op": spec["op"],
+            "threshold": spec["value"],
+            "value": round(self.value, 3) if self.value is not None else None,
+            "timestamp": datetime.fromtimestamp(now).strftime(TIMESTAMP_FORMAT),
+        }
+
+    def status(self):
+        return {
+            "rule": self.name,
+            "state": self.state,
+            "value": round(self.value, 3) if self.value is not None else None,
+            "since": (datetime.fromtimestamp(self.since).strftime(TIMESTAMP_FORMAT)
+                      if self.since is not None else None),
+        }
+
+
+class AlertEngine:
+    """Evaluates the rules as samples arrive and reports their state changes.
+
+    Samples are fed with ``observe(signal, value)`` from the producing
+    threads; only the rules on that signal are touched. A background thread
+    calls ``tick()`` every ``tick_secs`` so ``for_secs``, ``clear_secs``
+    and schedules take effect between samples too.
+    """
+
+    def __init__(self, rules=(), event_hub=None, dispatcher=None, tick_secs=1.0):
+        self.event_hub = event_hub
+        self.dispatcher = dispatcher
+        self.tick_secs = tick_secs
+        self._lock = threading.Lock()
+        self._rules = []
+        self._by_signal = {}  # signal -> [Rule]
+        self._windows = {}  # signal -> [_Window], one per distinct aggregate and length
+        self._stop = threading.Event()
+        self._thread = None
+        self.set_rules(rules)
+
+    def set_rules(self, specs):
+        """Replace the rules (parsed specs); unchanged rules keep their window and state."""
+        with self._lock:
+            current = {rule.name: rule for rule in self._rules}
+            windows = {Rule.window_key(rule.spec): rule.window for rule in self._rules}
+            rules = []
+            for spec in specs:
+                rule = current.get(spec["name"])
+                if rule is None or rule.spec != spec:
+                    key = Rule.window_key(spec)
+                    if key not in windows:
+                        windows[key] = _Window(spec["aggregate"], key[2])
+                    rule = Rule(spec, windows[key])
+                rules.append(rule)
+            by_signal, used = {}, {}
+            for rule in rules:
+                by_signal.setdefault(rule.spec["signal"], []).append(rule)
+                used[Rule.window_key(rule.spec)] = rule.window
+            windows_by_signal = {}
+            for (signal, _, _), window in used.items():
+                windows_by_signal.setdefault(signal, []).append(window)
+            self._rules, self._by_signal, self._windows = rules, by_signal, windows_by_signal
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="alerts", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.tick_secs + 1)
+
+    def _run(self):
+        while not self._stop.wait(self.tick_secs):
+            self.tick()
+
+    def observe(self, signal, value, now=None):
+        """Feed one sample of ``signal``."""
+        if signal not in self._by_signal:
+            return
+        now = time.time() if now is None else now
+        t0 = registry.clock()
+        changes = []
+        with self._lock:
+            for window in self._windows.get(signal, ()):
+                window.add(now, value)
+            for rule in self._by_signal.get(signal, ()):
+                change = rule.evaluate(now)
+                if change:
+                    changes.append(rule.alert(change, now))
+        _EVAL.since(t0)
+        self._notify(changes)
+
+    def tick(self, now=None):
+        """Re-check every rule without a new sample."""
+        now = time.time() if now is None else now
+        changes = []
+        with self._lock:
+            for windows in self._windows.values():
+                for window in windows:
+                    window.advance(now)
+            for rule in self._rules:
+                change = rule.evaluate(now)
+                if change:
+                    changes.append(rule.alert(change, now))
+        self._notify(changes)
+
+    def _notify(self, alerts):
+        for alert in alerts:
+            (_FIRED if alert["state"] == "firing" else _RESOLVED).inc()
+            if self.event_hub is not None:
+                self.event_hub.publish("alert", alert)
+            if self.dispatcher is not None:
+                self.dispatcher.submit(alert)
+
+    def status(self):
+        with self._lock:
+            return [rule.status() for rule in self._rules]
+
+
+class WebhookSink:
+    """POSTs each batch as ``{"alerts": [...]}`` JSON to ``url``."""
+
+    def __init__(self, url, timeout=5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alerts):
+        """Deliver ``alerts``; raises OSError (urllib's errors included) on failure."""
+        body = json.dumps({"alerts": alerts}).encode()
+        request = urllib.request.Request(
+            self.url, data=body, headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class AlertDispatcher:
+    """Bounded queue of alerts delivered to a sink by a background thread.
+
+    ``sink`` is any object with ``send(alerts)`` that raises on failure.
+    Alerts arriving within ``linger_secs`` of each other go out together,
+    up to ``batch_size`` per call. A failed batch is retried with
+    exponential backoff up to ``retries`` times before it is dropped;
+    when ``max_queue`` alerts are waiting the oldest is dropped.
+    """
+
+    def __init__(self, sink, batch_size=50, linger_secs=0.5, max_queue=1000,
+                 retries=5, backoff_secs=1.0, max_backoff_secs=60.0):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.linger_secs = linger_secs
+        self.max_queue = max_queue
+        self.retries = retries
+        self.backoff_secs = backoff_secs
+        self.max_backoff_secs = max_backoff_secs
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self.sent = 0
+        self.batches = 0
+        self.failures = 0
+        self.dropped = 0
+        self._last_error = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="alert-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """Deliver what is queued (one attempt per batch), then stop."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self, alert):
+        """Queue an alert without blocking."""
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self._queue.popleft()
+                self.dropped += 1
+                _DROPPED.inc()
+            self._queue.append(alert)
+            self._cond.notify()
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue and not self._stopping:
+                self._cond.wait()
+            if not self._queue:
+                return None
+            # Let a burst of state changes gather into one request
+            deadline = time.monotonic() + self.linger_secs
+            while len(self._queue) < self.batch_size and not self._stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            count = min(self.batch_size, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._deliver(batch)
+
+    def _deliver(self, batch):
+        delay = self.backoff_secs
+        for attempt in range(self.retries + 1):
+            try:
+                self.sink.send(batch)
+            except Exception as exc:
+                self.failures += 1
+                self._last_error = str(exc)
+                _FAILED.inc()
+                with self._cond:
+                    stopping = self._stopping
+                if stopping or attempt == self.retries:
+                    break
+                with self._cond:
+                    self._cond.wait_for(lambda: self._stopping, delay)
+                delay = min(delay * 2, self.max_backoff_secs)
+                continue
+            self.sent += len(batch)
+            self.batches += 1
+            self._last_error = None
+            _SENT.inc(len(batch))
+            return
+        self.dropped += len(batch)
+        _DROPPED.inc(len(batch))
+        print(f"Warning: dropped {len(batch)} alerts after failed deliveries "
+              f"({self._last_error})")
+
+    def stats(self):
+        with self._cond:
+            queued = len(self._queue)
+        return {
+            "queued": queued,
+            "sent": self.sent,
+            "batches": self.batches,
+            "failures": self.failures,
+            "dropped": self.dropped,
+            "last_error": self._last_error,
+        }
+
+
+class AlertRuleStore:
+    """The alert rules, persisted as JSON at ``path``."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.rules = self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path) as f:
+                return parse_rules(json.load(f)["rules"])
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            print(f"Warning: ignoring alert rules in {self.path} ({exc})")
+            return []
+
+    def set(self, rules):
+        """Validate and save ``rules``; returns them parsed or raises ValueError."""
+        new = parse_rules(rules)
+        with self._lock:
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"rules": new}, f, indent=2)
+            os.replace(tmp, self.path)
+            self.rules = new
+        return new
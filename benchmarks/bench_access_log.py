@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Benchmark the SQLite access log store against the old JSON file.
+
+Builds a legacy ``access_log.json`` with ``--entries`` entries, times the
+one-time migration into AccessLogStore, then compares per-event append and
+per-request listing cost: the JSON approach re-reads (and for appends
+re-writes) the whole file, the store touches only the rows it needs.
+
+Usage:
+    python3 benchmarks/bench_access_log.py [--entries 100000] [--ops 50]
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from access_log import TIMESTAMP_FORMAT, AccessLogStore  # noqa: E402
+
+_LABEL_SETS = [["person"], ["Face"], ["person", "Face"]]
+
+
+def _entry(when, rng):
+    entry_id = uuid.UUID(int=rng.getrandbits(128)).hex[:12]
+    labels = rng.choice(_LABEL_SETS)
+    return {
+        "id": entry_id,
+        "timestamp": when.strftime(TIMESTAMP_FORMAT),
+        "labels": labels,
+        "count": len(labels),
+        "image": f"{entry_id}.jpg",
+        "tracks": [rng.randrange(1, 10**6)],
+    }
+
+
+def _legacy_entries(n, seed=0):
+    """Newest-first entries spread over the last 90 days."""
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+    step = timedelta(days=90) / n
+    return [_entry(now - step * i, rng) for i in range(n)]
+
+
+def _time(fn, ops):
+    latencies = []
+    for i in range(ops):
+        t0 = time.perf_counter()
+        fn(i)
+        latencies.append((time.perf_counter() - t0) * 1e3)
+    return np.percentile(latencies, [50, 95])
+
+
+def _row(name, p50_p95):
+    p50, p95 = p50_p95
+    print(f"{name:<34} {p50:>9.2f} {p95:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--ops", type=int, default=50, help="timed operations per row")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    entries = _legacy_entries(args.entries)
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "access_log.json")
+        with open(json_path, "w") as f:
+            json.dump(entries, f, indent=2)
+        print(f"{args.entries} entries, legacy JSON {os.path.getsize(json_path) / 1e6:.1f} MB")
+        legacy_copy = json_path + ".bench"
+        shutil.copy(json_path, legacy_copy)
+
+        store = AccessLogStore(os.path.join(tmp, "access_log.db"))
+        t0 = time.perf_counter()
+        store.migrate_json(json_path)
+        print(f"migration: {time.perf_counter() - t0:.2f} s, {store.count()} entries\n")
+
+        print(f"{'operation':<34} {'p50 ms':>9} {'p95 ms':>9}")
+        now = datetime.now()
+
+        def json_append(_):
+            with open(legacy_copy) as f:
+                log = json.load(f)
+            log.insert(0, _entry(now, rng))
+            with open(legacy_copy, "w") as f:
+                json.dump(log, f, indent=2)
+
+        def json_list(_):
+            with open(legacy_copy) as f:
+                json.load(f)[:100]
+
+        # The JSON rows rewrite tens of MB per op; a few are enough
+        json_ops = max(3, args.ops // 10)
+        _row("json: append", _time(json_append, json_ops))
+        _row("json: list 100", _time(json_list, json_ops))
+
+        _row("store: append", _time(lambda _: store.append(_entry(now, rng)), args.ops))
+        _row("store: list 100 (first page)", _time(lambda _: store.page(100), args.ops))
+
+        # Walk pages from the start; time each hop
+        state = {"cursor": None}
+
+        def next_page(_):
+            state["cursor"] = store.page(100, state["cursor"])[1]
+
+        _row("store: list 100 (next page)", _time(next_page, args.ops))
+        deep = store.page(1, str(store.count() // 2))[1]
+        _row("store: list 100 (page at 50%)", _time(lambda _: store.page(100, deep), args.ops))
+        _row("store: label=Face, 100",
+             _time(lambda _: store.page(100, label="Face"), args.ops))
+        day = (now - timedelta(days=45)).timestamp()
+        _row("store: one day 45 days ago, 100",
+             _time(lambda _: store.page(100, since=day, until=day + 86400), args.ops))
+        _row("store: one day + label=person",
+             _time(lambda _: store.page(100, since=day, until=day + 86400, label="person"),
+                   args.ops))
+        ids = [e["id"] for e in entries[: args.ops]]
+        _row("store: delete by id", _time(lambda i: store.delete(ids[i]), args.ops))
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""Benchmark: alert rule evaluation cost per sample, and batched webhook delivery.
+
+evaluation - for each ``--rules`` count, a mix of last/avg/min/max/rate
+             rules with 2.5 min to 24 h windows over temperature, humidity
+             and people is fed ``--hours`` of synthetic samples (a sensor
+             reading every 3 s, a detection pass every second). Reports
+             the cost per sample in each quarter of the run and per
+             rule-sample in the last: flat once the windows are full,
+             however much history has gone by and however long the
+             windows are
+rescan     - the same rules evaluated by rescanning each window on every
+             sample, over the last ``--rescan-samples`` sensor readings,
+             for comparison
+delivery   - ``--alerts`` alerts from flapping rules go through an
+             AlertDispatcher to the local webhook stand-in, which fails
+             ``--fail-rate`` of requests; reports batches, retries and
+             whether every alert arrived exactly once
+
+Usage:
+    python3 benchmarks/bench_alerts.py [--rules 100 500] [--hours 48]
+        [--alerts 1000] [--fail-rate 0.3]
+"""
+
+import argparse
+import bisect
+import math
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from alerts import (  # noqa: E402
+    OPERATORS, AlertDispatcher, AlertEngine, WebhookSink, parse_rules,
+)
+from webhook_standin import WebhookStandin  # noqa: E402
+
+_WINDOWS = (300, 3600, 6 * 3600, 86400)
+_SENSOR_SECS = 3
+_START = 1_700_000_000.0
+
+
+def _rules(count, rng):
+    specs = []
+    for i in range(count):
+        signal = ("temperature", "humidity", "people")[i % 3]
+        aggregate = ("last", "avg", "min", "max", "rate")[(i // 3) % 5]
+        if signal == "people":
+            aggregate = ("last", "avg", "max")[(i // 3) % 3]
+            value = float(rng.choice([0, 0.5]))
+        elif aggregate == "rate":
+            value = float(rng.uniform(1, 10))
+        else:
+            value = float(rng.uniform(20, 28) if signal == "temperature" else rng.uniform(40, 55))
+        specs.append({
+            "name": f"rule-{i}",
+            "signal": signal,
+            "aggregate": aggregate,
+            # Nearly all distinct, so few rules share a window
+            "window_secs": 0 if aggregate == "last" else int(
+                rng.choice(_WINDOWS) * rng.uniform(0.5, 1.0)),
+            "op": str(rng.choice([">", "<"])),
+            "value": value,
+            "for_secs": int(rng.choice([0, 60, 300])),
+        })
+    return parse_rules(specs)
+
+
+def _samples(hours, rng):
+    """``[(t, signal, value)]`` in time order."""
+    samples = []
+    people = 0
+    for s in range(int(hours * 3600)):
+        t = _START + s
+        if s % _SENSOR_SECS == 0:
+            phase = 2 * math.pi * s / 86400
+            samples.append((t, "temperature", 24 + 4 * math.sin(phase) + rng.normal(0, 0.2)))
+            samples.append((t, "humidity", 47 + 8 * math.cos(phase) + rng.normal(0, 0.5)))
+        if rng.random() < 0.01:
+            people = 0 if people else int(rng.integers(1, 3))
+        samples.append((t, "people", people))
+    return samples
+
+
+def _evaluation(count, samples, rng):
+    fired = []
+    engine = AlertEngine(_rules(count, rng), dispatcher=SimpleNamespace(submit=fired.append))
+    quarter = len(samples) // 4
+    costs = []
+    for start in range(0, 4 * quarter, quarter):
+        chunk = samples[start:start + quarter]
+        t0 = time.perf_counter()
+        for t, signal, value in chunk:
+            engine.observe(signal, value, t)
+        costs.append((time.perf_counter() - t0) / len(chunk) * 1e6)
+    per_signal = count / 3  # rules a sample passes through
+    windows = sum(len(w) for w in engine._windows.values())
+    print(f"{count:>6} {windows:>7} " + " ".join(f"{c:>7.1f}" for c in costs)
+          + f" {costs[-1] / per_signal * 1e3:>8.0f} {len(fired):>7}")
+
+
+def _aggregate(aggregate, window):
+    if not window:
+        return None
+    values = [v for _, v in window]
+    if aggregate == "last":
+        return values[-1]
+    if aggregate == "avg":
+        return sum(values) / len(values)
+    if aggregate == "min":
+        return min(values)
+    if aggregate == "max":
+        return max(values)
+    if len(window) < 3:
+        return None
+    return np.polyfit([t for t, _ in window], values, 1)[0] * 3600
+
+
+def _rescan(count, samples, last, rng):
+    rules = [r for r in _rules(count, rng) if r["signal"] in ("temperature", "humidity")]
+    history = {"temperature": [], "humidity": []}
+    sensor = [s for s in samples if s[1] != "people"]
+    for t, signal, value in sensor[:-last]:
+        history[signal].append((t, value))
+    t0 = time.perf_counter()
+    for t, signal, value in sensor[-last:]:
+        series = history[signal]
+        series.append((t, value))
+        times = None
+        for rule in rules:
+            if rule["signal"] != signal:
+                continue
+            if times is None:
+                times = [x for x, _ in series]
+            start = bisect.bisect_left(times, t - rule["window_secs"])
+            value = _aggregate(rule["aggregate"], series[start:])
+            if value is not None:
+                OPERATORS[rule["op"]](value, rule["value"])
+    cost = (time.perf_counter() - t0) / last * 1e6
+    print(f"rescan: {count} rules, {cost:,.0f} us per sensor sample with "
+          f"{len(history['temperature']):,} samples of history")
+
+
+def _delivery(alerts, fail_rate):
+    standin = WebhookStandin(fail_rate=fail_rate, seed=1).start()
+    dispatcher = AlertDispatcher(WebhookSink(standin.url), batch_size=50, linger_secs=0.05,
+                                 retries=10, backoff_secs=0.02, max_backoff_secs=0.5)
+    dispatcher.start()
+    engine = AlertEngine(parse_rules([
+        {"name": f"flap-{i}", "signal": "temperature", "op": ">", "value": 25}
+        for i in range(10)
+    ]), dispatcher=dispatcher)
+    t0 = time.perf_counter()
+    for i in range(alerts // 10):
+        engine.observe("temperature", 30 if i % 2 == 0 else 20, _START + i)
+    while dispatcher.stats()["queued"] or dispatcher.sent + dispatcher.dropped < alerts:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - t0
+    dispatcher.stop()
+    standin.stop()
+    received = standin.alerts()
+    keys = {(a["rule"], a["timestamp"], a["state"]) for a in received}
+    exact = len(received) == alerts and len(keys) == alerts
+    stats = dispatcher.stats()
+    print(f"delivery: {alerts} alerts in {stats['batches']} batches over {elapsed:.2f} s, "
+          f"{stats['failures']} failed attempts retried ({fail_rate:.0%} of requests "
+          f"rejected), {stats['dropped']} dropped; "
+          f"{'every alert arrived once' if exact else f'{len(received)} received'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rules", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--hours", type=float, default=48.0, help="simulated hours of samples")
+    parser.add_argument("--rescan-samples", type=int, default=200)
+    parser.add_argument("--alerts", type=int, default=1000)
+    parser.add_argument("--fail-rate", type=float, default=0.3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    samples = _samples(args.hours, rng)
+    print(f"{len(samples):,} samples over {args.hours:g} h; windows up to "
+          f"{max(_WINDOWS) // 3600} h")
+    print("us per sample in each quarter of the run; ns per rule-sample in the last")
+    print(f"{'rules':>6} {'windows':>7} {'Q1':>7} {'Q2':>7} {'Q3':>7} {'Q4':>7} "
+          f"{'ns/rule':>8} {'alerts':>7}")
+    for count in args.rules:
+        _evaluation(count, samples, np.random.default_rng(count))
+    _rescan(min(args.rules), samples, args.rescan_samples, np.random.default_rng(min(args.rules)))
+    _delivery(args.alerts, args.fail_rate)
+
+
+if __name__ == "__main__":
+    main()
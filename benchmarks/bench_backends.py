@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Benchmark every detector backend over a folder of sample images.
+
+For each backend the script prints per-frame latency percentiles and how
+well its detections agree with the baseline backend of the same kind (the
+first one listed): a detection matches when a baseline detection has the
+same label and IoU >= 0.5. Precision/recall are relative to the baseline,
+not to ground truth.
+
+Usage:
+    python3 benchmarks/bench_backends.py IMAGE_DIR \\
+        [--faces haar haar-fast] \\
+        [--objects yolov4-tiny yolov4-tiny-320 yolov4-tiny-256 yolov5n-onnx]
+
+Backends whose model files are missing are reported and skipped.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detection import (  # noqa: E402
+    FACE_BACKENDS, OBJECT_BACKENDS, FaceDetector, ObjectDetector, _iou_matrix,
+)
+
+_IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def _load_images(folder):
+    paths = sorted(
+        os.path.join(folder, f) for f in os.listdir(folder)
+        if f.lower().endswith(_IMAGE_EXTS)
+    )
+    images = [(p, cv2.imread(p)) for p in paths]
+    return [(p, img) for p, img in images if img is not None]
+
+
+def _agreement(baseline, results, iou_threshold=0.5):
+    """Return (matched, total_results, total_baseline) summed over images."""
+    matched = n_res = n_base = 0
+    for base, res in zip(baseline, results):
+        n_res += len(res)
+        n_base += len(base)
+        if not base or not res:
+            continue
+        iou = _iou_matrix([d["box"] for d in res], [d["box"] for d in base])
+        used = set()
+        for ri, det in enumerate(res):
+            for bi in np.argsort(-iou[ri]):
+                if iou[ri, bi] < iou_threshold:
+                    break
+                if bi not in used and base[bi]["label"] == det["label"]:
+                    used.add(bi)
+                    matched += 1
+                    break
+    return matched, n_res, n_base
+
+
+def _run_backend(detector, images, warmup=2):
+    for _, img in images[:warmup]:
+        detector.detect(img)
+    latencies, results = [], []
+    for _, img in images:
+        t0 = time.perf_counter()
+        results.append(detector.detect(img))
+        latencies.append((time.perf_counter() - t0) * 1e3)
+    return latencies, results
+
+
+def _report(kind, names, factory, images):
+    baseline = None
+    for name in names:
+        try:
+            detector = factory(name)
+        except Exception as exc:
+            print(f"{kind:<7} {name:<18} skipped: {exc}")
+            continue
+        latencies, results = _run_backend(detector, images)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        if baseline is None:
+            baseline = results
+            agree = "baseline"
+        else:
+            matched, n_res, n_base = _agreement(baseline, results)
+            precision = matched / n_res if n_res else 1.0
+            recall = matched / n_base if n_base else 1.0
+            agree = f"P {precision:.2f} / R {recall:.2f}"
+        count = sum(len(r) for r in results)
+        print(f"{kind:<7} {name:<18} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f} "
+              f"{count:>6}  {agree}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("images", help="folder of sample images")
+    parser.add_argument("--faces", nargs="*", default=list(FACE_BACKENDS),
+                        help="face backends, baseline first")
+    parser.add_argument("--objects", nargs="*", default=list(OBJECT_BACKENDS),
+                        help="object backends, baseline first")
+    args = parser.parse_args()
+
+    images = _load_images(args.images)
+    if not images:
+        sys.exit(f"No images found in {args.images}")
+    print(f"{len(images)} images from {args.images}\n")
+    print(f"{'kind':<7} {'backend':<18} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'dets':>6}  agreement")
+    _report("faces", args.faces, lambda n: FaceDetector(backend=n), images)
+    _report("objects", args.objects, lambda n: ObjectDetector(backend=n), images)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Benchmark: allocations and CPU per frame of the capture -> stream path.
+
+Drives a real Monitor's capture loop body (capture, publish to the
+detection bus, overlay, encode every due stream profile, one detection-
+loop pass with the detectors unloaded) for ``--frames`` frames, stamped
+at 30 fps, with a viewer on each profile of the stream set. For each
+``--pool-sizes`` value (0: a new array per captured frame, like
+``Picamera2.capture_array``; N: a FramePool of N buffers filled through
+``capture_into``) it reports per frame:
+
+  cpu ms       - process CPU time, median of ``--runs`` (all threads, so on the Pi it includes
+                 Picamera2's and the hardware encoder's threads)
+  peak MB      - the most memory allocated at once within a frame, above
+                 what was allocated before it (tracemalloc, separate pass);
+                 a new frame-sized array shows up as 2.8 MB at 720p
+
+and the CPU a stream profile adds over capturing with no viewers. The
+default camera is the fake one, unpaced; on a Pi pass ``--camera
+picamera`` or ``--camera picamera-hw`` (lores capture, full-size stream
+JPEG-encoded by the VideoCore).
+
+Usage:
+    python3 benchmarks/bench_capture.py [--camera synthetic] [--frames 300]
+        [--pool-sizes 0 4]
+"""
+
+import argparse
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from hardware import FakeCamera  # noqa: E402
+from monitor import Monitor  # noqa: E402
+from streaming import DEFAULT_PROFILES  # noqa: E402
+
+_FPS = 30.0
+
+
+def _monitor(data_dir, camera, pool_size):
+    return Monitor(
+        os.path.join(data_dir, "snapshots"), os.path.join(data_dir, "access_log.db"),
+        os.path.join(data_dir, "history.db"), os.path.join(data_dir, "regions.json"),
+        camera_source=camera, sensor_source="synthetic", clip_profile="",
+        frame_pool_size=pool_size,
+    )
+
+
+def _run(camera, pool_size, profiles, frames, trace):
+    data_dir = tempfile.mkdtemp(prefix="bench_capture_")
+    if camera == "synthetic":
+        camera = FakeCamera(fps=0)
+    monitor = _monitor(data_dir, camera, pool_size)
+    with contextlib.redirect_stdout(sys.stderr):
+        monitor.start(pipeline=False)
+    viewers = [monitor.streams[name].broadcaster.open_viewer() for name in profiles]
+    state = {"faces": True, "objects": True}
+    base = time.monotonic()
+    out_buf = None
+    peaks = []
+    try:
+        for i in range(-10, frames):  # the first 10 warm up the buffers
+            if i == 0:
+                cpu0 = time.process_time()
+            if trace:
+                start = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+            now = base + (i + 10) / _FPS
+            frame = monitor._capture_frame()
+            out_buf = monitor._publish_frame(frame, now, out_buf)
+            monitor._detect_frame(frame, state, now)
+            del frame
+            if trace and i >= 0:
+                peaks.append(tracemalloc.get_traced_memory()[1] - start)
+        cpu = time.process_time() - cpu0
+    finally:
+        for viewer in viewers:
+            viewer.close()
+        with contextlib.redirect_stdout(sys.stderr):
+            monitor.stop()
+        shutil.rmtree(data_dir, ignore_errors=True)
+    misses = monitor.frame_pool.misses if monitor.frame_pool is not None else None
+    return cpu * 1e3 / frames, max(peaks, default=0) / 1e6, misses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--camera", default="synthetic",
+                        help="synthetic, picamera or picamera-hw")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[0, 4])
+    parser.add_argument("--runs", type=int, default=3, help="CPU is the median of these")
+    args = parser.parse_args()
+
+    sets = [("none", [])] + [(name, [name]) for name in DEFAULT_PROFILES]
+    sets.append(("all", list(DEFAULT_PROFILES)))
+    print(f"{args.frames} frames from {args.camera}, stamped at {_FPS:.0f} fps")
+    print(f"{'pool':>4} {'streams':<10} {'cpu ms':>7} {'+stream':>8} {'peak MB':>8}")
+    for pool_size in args.pool_sizes:
+        idle = None
+        for label, profiles in sets:
+            runs = [_run(args.camera, pool_size, profiles, args.frames, False)
+                    for _ in range(args.runs)]
+            cpu, misses = float(np.median([r[0] for r in runs])), runs[-1][2]
+            tracemalloc.start()
+            try:
+                _, peak, _ = _run(args.camera, pool_size, profiles, args.frames // 3, True)
+            finally:
+                tracemalloc.stop()
+            idle = cpu if idle is None else idle
+            extra = f"{cpu - idle:+8.2f}" if profiles else f"{'':>8}"
+            note = f"  ({misses} pool misses)" if misses else ""
+            print(f"{pool_size:>4} {label:<10} {cpu:>7.2f} {extra} {peak:>8.2f}{note}")
+
+
+if __name__ == "__main__":
+    main()
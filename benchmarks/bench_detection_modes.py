@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""Benchmark: threaded vs. worker-process detection.
+
+Builds the server's pipeline around a synthetic frame source: a capture
+thread encodes every frame for the ``full`` stream profile, a detection
+thread runs the detectors (in-process, or through DetectionWorker), and a
+small Flask app answers ``/health`` while a client polls it. For each mode
+the script reports stream FPS, detection FPS and HTTP latency percentiles.
+
+The process is pinned to 4 CPUs when more are available, to match a Pi 4.
+
+Usage:
+    python3 benchmarks/bench_detection_modes.py [--seconds 15] [--no-yolo]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+import urllib.request
+
+import cv2
+import numpy as np
+from flask import Flask, jsonify
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detection import FaceDetector, ObjectDetector  # noqa: E402
+from detection_worker import DetectionWorker  # noqa: E402
+from streaming import DEFAULT_PROFILES, FrameBus, ProfileStream  # noqa: E402
+
+W, H, FPS = 1280, 720, 30
+
+
+def _synthetic_frames(count=60, seed=0):
+    """A short loop of noisy frames with moving bright blocks."""
+    rng = np.random.default_rng(seed)
+    base = cv2.GaussianBlur(
+        rng.integers(0, 256, (H, W, 3), dtype=np.uint8), (21, 21), 0,
+    )
+    frames = []
+    for i in range(count):
+        f = base.copy()
+        x = (i * 17) % (W - 200)
+        cv2.rectangle(f, (x, 200), (x + 160, 520), (230, 230, 230), -1)
+        cv2.circle(f, (x + 80, 160), 50, (180, 190, 220), -1)
+        frames.append(f)
+    return frames
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if values else float("nan")
+
+
+def _run(mode, seconds, use_yolo):
+    frames = _synthetic_frames()
+    bus = FrameBus()
+    stream = ProfileStream(DEFAULT_PROFILES["full"])
+    viewer = stream.broadcaster.open_viewer()  # keeps the profile encoding
+    stop = threading.Event()
+    counts = {"encoded": 0, "detected": 0}
+
+    worker = None
+    face = obj = None
+    if mode == "process":
+        worker = DetectionWorker(frame_shape=(H, W, 3), objects=use_yolo)
+    else:
+        face = FaceDetector()
+        obj = ObjectDetector() if use_yolo else None
+
+    def capture():
+        i = 0
+        interval = 1.0 / FPS
+        next_t = time.perf_counter()
+        while not stop.is_set():
+            frame = frames[i % len(frames)]
+            i += 1
+            bus.publish(frame)
+            stream.publish(frame)
+            counts["encoded"] += 1
+            next_t += interval
+            time.sleep(max(0.0, next_t - time.perf_counter()))
+
+    def detect():
+        seq = 0
+        while not stop.is_set():
+            item = bus.wait(seq, timeout=0.5)
+            if item is None:
+                continue
+            seq, frame = item
+            if worker is not None:
+                worker.detect(frame, faces=True, objects=use_yolo)
+            else:
+                face.detect(frame)
+                if obj is not None:
+                    obj.detect(frame)
+            counts["detected"] += 1
+
+    app = Flask(__name__)
+    app.add_url_rule("/health", "health", lambda: jsonify({"status": "ok"}))
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    url = f"http://127.0.0.1:{server.server_port}/health"
+    latencies = []
+
+    def poll():
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            urllib.request.urlopen(url).read()
+            latencies.append(time.perf_counter() - t0)
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=fn, daemon=True)
+               for fn in (capture, detect, poll, server.serve_forever)]
+    for t in threads:
+        t.start()
+    time.sleep(2)  # warm-up
+    counts.update(encoded=0, detected=0)
+    latencies.clear()
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    time.sleep(seconds)
+    wall = time.perf_counter() - wall0
+    cpu = time.process_time() - cpu0
+
+    result = {
+        "stream_fps": counts["encoded"] / wall,
+        "detect_fps": counts["detected"] / wall,
+        "http_p50_ms": 1e3 * _percentile(latencies, 50),
+        "http_p95_ms": 1e3 * _percentile(latencies, 95),
+        "http_p99_ms": 1e3 * _percentile(latencies, 99),
+        "main_cpu_pct": 100 * cpu / wall,
+    }
+    stop.set()
+    server.shutdown()
+    viewer.close()
+    if worker is not None:
+        worker.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=15.0)
+    parser.add_argument("--no-yolo", action="store_true",
+                        help="only run the Haar face detector")
+    args = parser.parse_args()
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    cpus = sorted(os.sched_getaffinity(0))
+    if len(cpus) > 4:
+        os.sched_setaffinity(0, cpus[:4])
+    print(f"CPUs: {len(os.sched_getaffinity(0))}  yolo: {not args.no_yolo}")
+
+    print(f"{'mode':<8} {'stream fps':>10} {'detect fps':>10} {'http p50':>9} "
+          f"{'p95':>7} {'p99':>7} {'main cpu %':>10}")
+    for mode in ("thread", "process"):
+        r = _run(mode, args.seconds, not args.no_yolo)
+        print(f"{mode:<8} {r['stream_fps']:>10.1f} {r['detect_fps']:>10.1f} "
+              f"{r['http_p50_ms']:>9.2f} {r['http_p95_ms']:>7.2f} "
+              f"{r['http_p99_ms']:>7.2f} {r['main_cpu_pct']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
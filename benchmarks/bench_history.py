@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Benchmark sensor history range queries over a year of synthetic data.
+
+Fills a temporary SensorHistory with one sample every ``--interval``
+seconds for ``--days`` days (a daily and a slow seasonal cycle plus noise),
+going through the same ``append`` path the server uses, then times random
+range queries of several spans at ``auto`` and at each fixed resolution.
+
+Usage:
+    python3 benchmarks/bench_history.py [--days 365] [--interval 2] [--queries 50]
+
+Filling a year of 2 s samples takes a minute or two; use --days for a
+quicker run.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history import SensorHistory  # noqa: E402
+
+SPANS = {"1h": 3600, "1d": 86400, "1w": 7 * 86400, "30d": 30 * 86400, "1y": 365 * 86400}
+
+
+def _fill(history, start, days, interval, seed=0):
+    rng = np.random.default_rng(seed)
+    ts = np.arange(start, start + days * 86400, interval, dtype=np.int64)
+    phase = (ts - start) / 86400.0
+    temperature = (23 + 1.5 * np.sin(2 * np.pi * phase)
+                   + 3 * np.sin(2 * np.pi * phase / 365) + rng.normal(0, 0.1, ts.size))
+    humidity = 45 + 5 * np.cos(2 * np.pi * phase) + rng.normal(0, 0.3, ts.size)
+    for t, temp, hum in zip(ts.tolist(), temperature.tolist(), humidity.tolist()):
+        history.append(t, temp, hum)
+    history.flush()
+    return ts.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--interval", type=int, default=2, help="seconds between samples")
+    parser.add_argument("--queries", type=int, default=50, help="queries per span/resolution")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.db")
+        # Flush hourly while filling so the fill is not dominated by commits;
+        # the server flushes every minute
+        history = SensorHistory(path, flush_interval=3600)
+        end = int(time.time()) // 86400 * 86400
+        start = end - args.days * 86400
+
+        t0 = time.perf_counter()
+        samples = _fill(history, start, args.days, args.interval)
+        fill_secs = time.perf_counter() - t0
+        stats = history.stats()
+        print(f"filled {samples} samples in {fill_secs:.1f} s "
+              f"({samples / fill_secs / 1e3:.0f}k samples/s)")
+        print(f"stored: {stats['samples']} raw samples, {stats['rollups']} rollup rows, "
+              f"{stats['bytes'] / 1e6:.1f} MB\n")
+
+        rng = np.random.default_rng(1)
+        print(f"{'span':<5} {'resolution':<10} {'points':>7} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+        for span_name, span in SPANS.items():
+            if span > args.days * 86400:
+                continue
+            for resolution in ("auto", "raw", "1m", "1h", "1d"):
+                # Raw queries only make sense inside the raw retention window
+                if resolution == "raw" and span > 86400:
+                    continue
+                if resolution == "1m" and span > 30 * 86400:
+                    continue
+                lo = end - min(history.raw_retention, args.days * 86400)
+                if resolution != "raw":
+                    lo = start
+                latencies, points = [], 0
+                for _ in range(args.queries):
+                    q_start = int(rng.integers(lo, end - span + 1))
+                    q0 = time.perf_counter()
+                    result = history.query(q_start, q_start + span, resolution)
+                    latencies.append((time.perf_counter() - q0) * 1e3)
+                    points = len(result["points"])
+                    shown = result["resolution"]
+                p50, p95 = np.percentile(latencies, [50, 95])
+                label = resolution if resolution != "auto" else f"auto={shown}"
+                print(f"{span_name:<5} {label:<10} {points:>7} {p50:>8.2f} {p95:>8.2f} "
+                      f"{max(latencies):>8.2f}")
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
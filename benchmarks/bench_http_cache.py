@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Benchmark: bytes and latency of a dashboard refresh, with and without HTTP caching.
+
+Starts one stand-in monitor (see standin_nodes.py) whose access log holds
+``--entries`` events with 1280x720 snapshots, then replays what an open
+dashboard does every refresh for ``--refreshes`` refreshes: fetch the
+newest ``--visible`` log entries, load each one's preview image and poll
+/snapshot ``--snapshot-polls`` times (several open tabs). The clients:
+
+  plain       - the old view: full-size images, no validators, every
+                refresh downloads everything again
+  revalidate  - 320 px variants (?w=320) and If-None-Match with the ETags
+                it was given, like a browser with a no-cache entry
+  cached      - honours Cache-Control as a browser does: immutable images
+                are not requested again at all; /snapshot is revalidated
+
+For each it reports the bytes of response bodies, how many of the
+requests were answered 304, and the refresh latency. The first refresh
+of the resized clients also makes the variants; it is reported apart.
+
+Usage:
+    python3 benchmarks/bench_http_cache.py [--entries 200] [--visible 20]
+        [--refreshes 20] [--snapshot-polls 3]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from standin_nodes import start_nodes, stop_nodes  # noqa: E402
+
+_IMMUTABLE = "immutable"
+
+
+class _Client:
+    def __init__(self, port, mode):
+        self.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        self.mode = mode
+        self.etags = {}  # path -> ETag
+        self.cache = set()  # paths held as immutable
+        self.bytes = 0
+        self.requests = 0
+        self.not_modified = 0
+
+    def get(self, path):
+        if path in self.cache:
+            return None
+        headers = {}
+        if self.mode != "plain" and path in self.etags:
+            headers["If-None-Match"] = self.etags[path]
+        self.conn.request("GET", path, headers=headers)
+        response = self.conn.getresponse()
+        body = response.read()
+        self.requests += 1
+        self.bytes += len(body)
+        if response.status == 304:
+            self.not_modified += 1
+        elif response.status != 200:
+            raise RuntimeError(f"{path}: HTTP {response.status} {body[:200]}")
+        if self.mode != "plain" and response.headers.get("ETag"):
+            self.etags[path] = response.headers["ETag"]
+        if self.mode == "cached" and _IMMUTABLE in response.headers.get("Cache-Control", ""):
+            self.cache.add(path)
+        return body
+
+    def refresh(self, visible, snapshot_polls):
+        entries = json.loads(self.get(f"/access-logs?limit={visible}"))
+        for entry in entries:
+            if self.mode == "plain":
+                self.get(f"/access-logs/{entry['id']}/image")
+            else:
+                self.get(f"/access-logs/{entry['id']}/image?w=320")
+        for _ in range(snapshot_polls):
+            self.get("/snapshot?profile=medium")
+
+
+def _run(port, mode, args):
+    client = _Client(port, mode)
+    t0 = time.perf_counter()
+    client.refresh(args.visible, args.snapshot_polls)
+    first_ms = (time.perf_counter() - t0) * 1e3
+    first_bytes = client.bytes
+    latencies = []
+    for _ in range(args.refreshes):
+        time.sleep(args.interval)
+        t0 = time.perf_counter()
+        client.refresh(args.visible, args.snapshot_polls)
+        latencies.append((time.perf_counter() - t0) * 1e3)
+    client.conn.close()
+    repeat_bytes = (client.bytes - first_bytes) / args.refreshes
+    p50, p95 = np.percentile(latencies, [50, 95])
+    print(f"{mode:<11} {first_ms:>8.1f} {first_bytes / 1e3:>9.1f} {repeat_bytes / 1e3:>9.1f} "
+          f"{client.requests:>5} {client.not_modified:>5} {p50:>7.1f} {p95:>7.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=200)
+    parser.add_argument("--visible", type=int, default=20, help="log entries on screen")
+    parser.add_argument("--refreshes", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.2,
+                        help="seconds between refreshes")
+    parser.add_argument("--snapshot-polls", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"starting a stand-in node with {args.entries} entries...")
+    nodes = start_nodes(1, entries=args.entries, image_size=(1280, 720))
+    port = nodes[0][1]
+    try:
+        print(f"{args.visible} entries on screen, {args.refreshes} refreshes after the first")
+        print(f"{'client':<11} {'first ms':>8} {'first kB':>9} {'kB/refr':>9} "
+              f"{'reqs':>5} {'304s':>5} {'p50 ms':>7} {'p95 ms':>7}")
+        for mode in ("plain", "revalidate", "cached"):
+            _run(port, mode, args)
+    finally:
+        stop_nodes(nodes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Benchmark: how often the motion gate lets inference run on a static scene.
+
+Feeds ``--minutes`` of an unchanging frame at ``--fps`` through a real
+Monitor's detection pass (``_detect_frame``), each frame stamped with its
+simulated time. The detectors are replaced by a script that reports the
+same boxes on every run, for each scene:
+
+  empty         - nothing in view
+  static-object - a chair, a tv and a laptop that never move
+  still-person  - a person sitting still (and their face)
+
+With nothing moving the gate should go idle and run one keep-alive pass
+every ``keepalive_secs`` for the first two scenes, and stay active (every
+frame through the tracker) while a confirmed person is in view.
+
+Usage:
+    python3 benchmarks/bench_motion_gate.py [--minutes 5] [--fps 10]
+"""
+
+import argparse
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from hardware import FakeCamera  # noqa: E402
+from monitor import Monitor  # noqa: E402
+from sensor import FakeDHT22  # noqa: E402
+
+W, H = 1280, 720
+
+
+def _box(label, box):
+    return {"label": label, "confidence": 0.9, "box": box, "color": (0, 255, 0)}
+
+
+SCENES = {
+    "empty": [],
+    "static-object": [
+        _box("chair", (200, 380, 420, 700)),
+        _box("tv", (700, 120, 1100, 380)),
+        _box("laptop", (760, 420, 960, 540)),
+    ],
+    "still-person": [
+        _box("person", (500, 150, 760, 700)),
+        {**_box("Face", (580, 170, 680, 290)), "confidence": 1.0},
+    ],
+}
+
+
+def _run(scene, frames, fps, data_dir):
+    monitor = Monitor(
+        os.path.join(data_dir, "snapshots"), os.path.join(data_dir, "access_log.db"),
+        os.path.join(data_dir, "sensor_history.db"),
+        os.path.join(data_dir, "detection_regions.json"),
+        camera_source=FakeCamera(size=(W, H), fps=0, frames=1),
+        sensor_source=FakeDHT22(read_time=0.0, seed=0), clip_profile="",
+    )
+    runs = []
+    monitor._run_detectors = lambda frame, state: runs.append(1) or list(SCENES[scene])
+    frame = np.full((H, W, 3), 60, dtype=np.uint8)
+    state = {"faces": True, "objects": True}
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            monitor.start(pipeline=False)
+        gate = monitor.motion_gate
+        base = time.monotonic()
+        passed = 0
+        idle_at = None
+        for i in range(frames):
+            now = base + i / fps
+            if monitor._detect_frame(frame, state, now) is not None:
+                passed += 1
+            if idle_at is None and now - gate._last_motion >= gate._hold:
+                idle_at = now - base
+        idle = "never" if idle_at is None else f"{idle_at:.1f} s"
+        minutes = frames / fps / 60
+        print(f"{scene:<14} {passed:>7} {len(runs):>8} {len(runs) / minutes:>8.1f} {idle:>10}")
+    finally:
+        with contextlib.redirect_stdout(sys.stderr):
+            monitor.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=float, default=5.0)
+    parser.add_argument("--fps", type=float, default=10.0)
+    args = parser.parse_args()
+
+    frames = int(args.minutes * 60 * args.fps)
+    print(f"{frames} static frames at {args.fps:g} fps ({args.minutes:g} min)")
+    print(f"{'scene':<14} {'passed':>7} {'detector':>8} {'runs/min':>8} {'idle after':>10}")
+    for scene in SCENES:
+        data_dir = tempfile.mkdtemp(prefix="bench_gate_")
+        try:
+            _run(scene, frames, args.fps, data_dir)
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
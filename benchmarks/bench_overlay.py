@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""Benchmark: capture-loop render + encode with and without the overlay cache.
+
+Simulates the body of ``_camera_capture_loop`` on synthetic 1280x720 frames
+with 0, 5 and 20 detections. Detections change every ``--update-every``
+frames, like the slower detection thread does on the Pi.
+
+  redraw - old path: ``frame.copy()`` + ``draw_detections`` every frame
+  cached - DetectionOverlay: rasterize once per update, masked composite
+
+Both paths are checked to produce identical pixels, including for labels with
+descenders pushed down from the top edge of the frame.
+
+Usage:
+    python3 benchmarks/bench_overlay.py [--frames 150] [--update-every 10]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detection import _PALETTE, DetectionOverlay, draw_detections  # noqa: E402
+
+W, H = 1280, 720
+
+
+def _frames(count, seed=0):
+    rng = np.random.default_rng(seed)
+    base = cv2.GaussianBlur(
+        rng.integers(0, 256, (H, W, 3), dtype=np.uint8), (31, 31), 0,
+    )
+    return [np.roll(base, i * 4, axis=1) for i in range(count)]
+
+
+def _detections(n, seed):
+    rng = np.random.default_rng(seed)
+    dets = []
+    for i in range(n):
+        x1, y1 = int(rng.integers(0, W - 200)), int(rng.integers(0, H - 200))
+        dets.append({
+            "label": "person" if i % 2 else "chair",
+            "confidence": float(rng.uniform(0.5, 0.99)),
+            "box": (x1, y1, x1 + int(rng.integers(60, 200)), y1 + int(rng.integers(60, 200))),
+            "color": _PALETTE[i % len(_PALETTE)],
+        })
+    return dets
+
+
+def _descender_detections():
+    """Labels with descenders at the top edge, where the label is pushed down."""
+    return [
+        {"label": label, "confidence": 1.0, "box": (40 + 200 * i, y1, 180 + 200 * i, y1 + 120),
+         "color": _PALETTE[i % len(_PALETTE)]}
+        for i, (label, y1) in enumerate([("gyp", 0), ("jqy", 0), ("gyp", 5), ("jqy", 5)])
+    ]
+
+
+def _redraw(frame, dets, _state):
+    if not dets:
+        return frame
+    out = frame.copy()
+    draw_detections(out, dets)
+    return out
+
+
+def _cached(frame, dets, state):
+    buf = state.get("buf")
+    if buf is None:
+        buf = state["buf"] = np.empty_like(frame)
+    return state["overlay"].composite(frame, dets, buf)
+
+
+def _run(render, frames, n_dets, update_every):
+    state = {"overlay": DetectionOverlay()}
+    updates = [_detections(n_dets, i) for i in range(0, len(frames), update_every)]
+    render_time = 0.0
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    for i, frame in enumerate(frames):
+        if i % update_every == 0:
+            dets = updates[i // update_every]
+        t0 = time.perf_counter()
+        output = render(frame, dets, state)
+        render_time += time.perf_counter() - t0
+        cv2.imencode(".jpg", output, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    wall = time.perf_counter() - wall0
+    cpu = time.process_time() - cpu0
+    n = len(frames)
+    return n / wall, 1e3 * cpu / n, 1e3 * render_time / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=150)
+    parser.add_argument("--update-every", type=int, default=10,
+                        help="frames between detection updates")
+    args = parser.parse_args()
+
+    frames = _frames(args.frames)
+    cv2.setNumThreads(1)
+
+    for name, dets in (("5 detections", _detections(5, 1)),
+                       ("20 detections", _detections(20, 1)),
+                       ("descender labels", _descender_detections())):
+        expected = frames[0].copy()
+        draw_detections(expected, dets)
+        actual = DetectionOverlay().composite(frames[0], dets)
+        if not np.array_equal(expected, actual):
+            sys.exit(f"MISMATCH: cached overlay differs with {name}")
+
+    print(f"{'detections':>10} {'path':>7} {'fps':>8} {'cpu ms/frame':>13} "
+          f"{'overlay ms/frame':>17}")
+    for n in (0, 5, 20):
+        for name, render in (("redraw", _redraw), ("cached", _cached)):
+            fps, cpu_ms, render_ms = _run(render, frames, n, args.update_every)
+            print(f"{n:>10} {name:>7} {fps:>8.1f} {cpu_ms:>13.2f} {render_ms:>17.3f}")
+
+
+if __name__ == "__main__":
+    main()
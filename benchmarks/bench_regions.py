@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Benchmark: detection latency on the full frame vs. regions vs. downscaled.
+
+Runs each detector over a set of recorded frames (a folder of images, or
+the fake camera's synthetic frames when none is given) in four variants:
+
+  full        - the whole frame at full resolution (the default before ROIs)
+  roi         - only the regions (``--regions``, default: a door and an aisle)
+  downscaled  - the whole frame at the working resolution
+  roi+down    - both
+
+and prints per-frame latency percentiles, detection counts and how many of
+the full-frame detections inside the regions each variant still finds
+(same label, IoU >= 0.5). The working resolution is ``--face-width`` for
+Haar and ``--object-size`` for YOLO; object variants are skipped when the
+YOLO files are not in models/.
+
+Usage:
+    python3 benchmarks/bench_regions.py [IMAGE_DIR] [--regions FILE.json]
+        [--face-width 640] [--object-size 256]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detection import FaceDetector, ObjectDetector, _iou_matrix  # noqa: E402
+from hardware import FakeCamera  # noqa: E402
+from regions import Regions  # noqa: E402
+
+_IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+# Left-hand door and a rack aisle, roughly a third of a 16:9 frame
+_DEFAULT_REGIONS = [
+    {"name": "door", "rect": [0.0, 0.1, 0.22, 1.0]},
+    {"name": "aisle", "polygon": [[0.45, 0.25], [0.6, 0.25], [0.72, 1.0], [0.38, 1.0]]},
+]
+
+
+def _load_frames(folder):
+    if folder is None:
+        return FakeCamera(frames=60)._frames
+    paths = sorted(
+        os.path.join(folder, f) for f in os.listdir(folder)
+        if f.lower().endswith(_IMAGE_EXTS)
+    )
+    return [img for img in (cv2.imread(p) for p in paths) if img is not None]
+
+
+def _coverage(regions, width, height):
+    crops = regions.crops(width, height)
+    return sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in crops) / (width * height)
+
+
+def _found(baseline, results, iou_threshold=0.5):
+    """How many baseline detections have a same-label match in ``results``."""
+    found = 0
+    for base, res in zip(baseline, results):
+        if not base or not res:
+            continue
+        iou = _iou_matrix([d["box"] for d in base], [d["box"] for d in res])
+        for bi, det in enumerate(base):
+            if any(iou[bi, ri] >= iou_threshold and res[ri]["label"] == det["label"]
+                   for ri in range(len(res))):
+                found += 1
+    return found
+
+
+def _run(detector, frames, regions):
+    detector.detect(frames[0], regions)  # warm up
+    latencies, results = [], []
+    for frame in frames:
+        t0 = time.perf_counter()
+        results.append(detector.detect(frame, regions))
+        latencies.append((time.perf_counter() - t0) * 1e3)
+    return latencies, results
+
+
+def _report(kind, factory, frames, regions):
+    h, w = frames[0].shape[:2]
+    try:
+        full, down = factory(False), factory(True)
+    except Exception as exc:
+        print(f"{kind:<7} skipped: {exc}")
+        return
+    baseline = None
+    for name, detector, variant_regions in (
+        ("full", full, None), ("roi", full, regions),
+        ("downscaled", down, None), ("roi+down", down, regions),
+    ):
+        latencies, results = _run(detector, frames, variant_regions)
+        if baseline is None:
+            # Full-frame detections a region-limited run should still find
+            baseline = [[d for d in r if regions.contains(d["box"], w, h)] for r in results]
+            expected = sum(len(b) for b in baseline)
+        p50, p95 = np.percentile(latencies, [50, 95])
+        count = sum(len(r) for r in results)
+        found = f"{_found(baseline, results)}/{expected}" if expected else "-"
+        print(f"{kind:<7} {name:<11} {p50:>8.1f} {p95:>8.1f} {count:>6} {found:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("images", nargs="?", help="folder of recorded frames")
+    parser.add_argument("--regions", help="JSON file with a regions list "
+                        "(same format as PUT /detection/regions)")
+    parser.add_argument("--face-width", type=int, default=640,
+                        help="Haar working width for the downscaled variants")
+    parser.add_argument("--object-size", type=int, default=256,
+                        help="YOLO input size for the downscaled variants")
+    args = parser.parse_args()
+
+    frames = _load_frames(args.images)
+    if not frames:
+        sys.exit(f"No images found in {args.images}")
+    if args.regions:
+        with open(args.regions) as f:
+            data = json.load(f)
+        regions = Regions(data["regions"] if isinstance(data, dict) else data)
+    else:
+        regions = Regions(_DEFAULT_REGIONS)
+    h, w = frames[0].shape[:2]
+    source = args.images or "the fake camera (no faces or objects)"
+    print(f"{len(frames)} frames ({w}x{h}) from {source}")
+    print(f"regions cover {_coverage(regions, w, h):.0%} of the frame\n")
+    print(f"{'kind':<7} {'variant':<11} {'p50 ms':>8} {'p95 ms':>8} {'dets':>6} {'found':>8}")
+    _report("faces", lambda down: FaceDetector(work_width=args.face_width if down else 0),
+            frames, regions)
+    _report("objects", lambda down: ObjectDetector(input_size=args.object_size if down else None),
+            frames, regions)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Benchmark: time from launch to first /health response and first detection.
+
+Starts ``dht22_api.py --fake`` (data in a temporary directory) once per
+``--runs`` for each detection mode, polls /health every 10 ms and reports,
+from the moment the process is spawned:
+
+  health     - first 200 from /health
+  loaded     - /health reports the detectors loaded and warmed up
+  detection  - the first detector pass has completed
+
+Object detection needs the YOLO files under models/; without them (and
+without network access to download them) only the face detector loads
+and the objects column reads "unavailable". Run once first so the model
+downloads are not timed.
+
+Usage:
+    python3 benchmarks/bench_startup.py [--modes thread process] [--runs 3]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _health(port):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+    try:
+        conn.request("GET", "/health")
+        response = conn.getresponse()
+        if response.status != 200:
+            return None
+        return json.loads(response.read())
+    finally:
+        conn.close()
+
+
+def _run_once(mode, server, timeout):
+    port = _free_port()
+    data_dir = tempfile.mkdtemp(prefix="bench_startup_")
+    env = dict(os.environ, DATA_DIR=data_dir, CLIP_PROFILE="", DETECTION_MODE=mode)
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "dht22_api.py"), "--fake",
+         "--server", server, "--host", "127.0.0.1", "--port", str(port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    times = {}
+    health = None
+    try:
+        deadline = t0 + timeout
+        while time.perf_counter() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError("server exited during startup")
+            try:
+                health = _health(port)
+            except OSError:
+                health = None
+            now = time.perf_counter() - t0
+            if health is not None:
+                times.setdefault("health", now)
+                if health["ready"]:
+                    times.setdefault("loaded", now)
+                if health["first_detection_secs"] is not None:
+                    times["detection"] = now
+                    break
+            time.sleep(0.01)
+        else:
+            raise RuntimeError("no detection before the timeout")
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return times, health
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=["thread", "process"],
+                        choices=["thread", "process"])
+    parser.add_argument("--server", default="gevent", choices=["dev", "gevent"])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    print(f"{args.runs} runs per mode, median seconds from spawn")
+    print(f"{'mode':<8} {'health':>8} {'loaded':>8} {'detection':>10}  detectors")
+    for mode in args.modes:
+        runs = [_run_once(mode, args.server, args.timeout) for _ in range(args.runs)]
+        med = {key: float(np.median([t[key] for t, _ in runs]))
+               for key in ("health", "loaded", "detection")}
+        detectors = runs[-1][1]["detectors"]
+        print(f"{mode:<8} {med['health']:>8.2f} {med['loaded']:>8.2f} "
+              f"{med['detection']:>10.2f}  "
+              f"faces {detectors['faces']}, objects {detectors['objects']}")
+
+
+if __name__ == "__main__":
+    main()
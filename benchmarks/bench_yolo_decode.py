@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: per-row YOLO decode loop vs. the batched NumPy decode.
+
+Runs both decoders over the same output tensors, checks that they produce
+identical boxes/confidences/class ids, and prints the per-call timings.
+
+Usage:
+    python3 benchmarks/bench_yolo_decode.py [outputs.npz ...]
+
+Each .npz holds the list returned by ``net.forward(out_layers)`` for one
+frame, recorded on the Pi with ``np.savez(path, *outputs)``. Without
+arguments, synthetic YOLOv4-tiny shaped tensors (507 + 2028 rows x 85) are
+generated from a fixed seed. Every sample also gets a head of boundary
+rows: coordinates that are float32 roundings of whole pixels (where float32
+and float64 scaling truncate differently), 0 and 1, confidences exactly at
+the threshold and tied class scores.
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detection import _decode_yolo_outputs  # noqa: E402
+
+FRAME_W, FRAME_H = 1280, 720
+CONF_THRESHOLD = 0.45
+
+
+def _decode_loop(outputs, w, h, conf_threshold):
+    """The original per-row decode from ObjectDetector.detect."""
+    boxes, confs, cids = [], [], []
+    for out in outputs:
+        for row in out:
+            scores = row[5:]
+            cid = int(np.argmax(scores))
+            conf = float(scores[cid])
+            if conf < conf_threshold:
+                continue
+            cx = int(row[0] * w)
+            cy = int(row[1] * h)
+            bw = int(row[2] * w)
+            bh = int(row[3] * h)
+            boxes.append([cx - bw // 2, cy - bh // 2, bw, bh])
+            confs.append(conf)
+            cids.append(cid)
+    return boxes, confs, cids
+
+
+def _synthetic_outputs(seed, hits=12):
+    """Two YOLOv4-tiny heads with mostly background rows and a few hits."""
+    rng = np.random.default_rng(seed)
+    outputs = []
+    for n in (507, 2028):
+        out = np.empty((n, 85), dtype=np.float32)
+        out[:, :4] = rng.random((n, 4), dtype=np.float32)
+        out[:, 4] = rng.random(n, dtype=np.float32)
+        out[:, 5:] = rng.random((n, 80), dtype=np.float32) * 0.1
+        idx = rng.choice(n, size=hits, replace=False)
+        out[idx, 5 + rng.integers(0, 80, size=hits)] = rng.uniform(
+            0.3, 0.99, size=hits,
+        ).astype(np.float32)
+        outputs.append(out)
+    return outputs
+
+
+def _boundary_rows(seed, n=256):
+    """Rows on the edges where a decode can round or compare differently."""
+    rng = np.random.default_rng(seed)
+    out = np.zeros((n, 85), dtype=np.float32)
+    # x, w as fractions of FRAME_W and y, h of FRAME_H at (or next to) whole pixels
+    for col, size in ((0, FRAME_W), (1, FRAME_H), (2, FRAME_W), (3, FRAME_H)):
+        px = rng.integers(0, size + 1, size=n) + rng.choice([-1e-4, 0.0, 1e-4], size=n)
+        out[:, col] = np.clip(px / size, 0.0, 1.0)
+    out[:4, :4] = [[0.0, 0.0, 0.0, 0.0], [1.0, 1.0, 1.0, 1.0],
+                   [0.465625, 0.67777777, 0.28984374, 0.5611111], [0.5, 0.5, 1.0, 1.0]]
+    out[:, 4] = 1.0
+    cids = rng.integers(0, 80, size=n)
+    out[np.arange(n), 5 + cids] = rng.choice(
+        [CONF_THRESHOLD, np.nextafter(np.float32(CONF_THRESHOLD), 0), 0.9], size=n,
+    )
+    tied = np.arange(0, n, 7)
+    out[tied, 5 + (cids[tied] + 1) % 80] = out[tied, 5 + cids[tied]]
+    return out
+
+
+def _load_outputs(path):
+    with np.load(path) as data:
+        return [data[k] for k in sorted(data.files, key=lambda k: int(k.split("_")[-1]))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("recordings", nargs="*", help="recorded .npz outputs")
+    parser.add_argument("--frames", type=int, default=20,
+                        help="synthetic frames when no recordings are given")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.recordings:
+        samples = [_load_outputs(p) for p in args.recordings]
+    else:
+        samples = [_synthetic_outputs(seed) for seed in range(args.frames)]
+    samples = [outputs + [_boundary_rows(i)] for i, outputs in enumerate(samples)]
+
+    for outputs in samples:
+        expected = _decode_loop(outputs, FRAME_W, FRAME_H, CONF_THRESHOLD)
+        actual = _decode_yolo_outputs(outputs, FRAME_W, FRAME_H, CONF_THRESHOLD)
+        if expected != actual:
+            sys.exit("MISMATCH: batched decode differs from the per-row loop")
+
+    def run(fn):
+        for outputs in samples:
+            fn(outputs, FRAME_W, FRAME_H, CONF_THRESHOLD)
+
+    calls = len(samples) * args.repeat
+    t_loop = timeit.timeit(lambda: run(_decode_loop), number=args.repeat) / calls
+    t_vec = timeit.timeit(lambda: run(_decode_yolo_outputs), number=args.repeat) / calls
+
+    rows = sum(len(o) for o in samples[0])
+    print(f"frames: {len(samples)}  rows/frame: {rows}  results: identical")
+    print(f"  per-row loop : {t_loop * 1e3:8.3f} ms/frame")
+    print(f"  batched numpy: {t_vec * 1e3:8.3f} ms/frame")
+    print(f"  speedup      : {t_loop / t_vec:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Load test: the aggregator in front of several stand-in nodes.
+
+Starts ``--nodes`` stand-in monitors (see standin_nodes.py, each seeded
+with ``--entries`` access log entries) and an aggregator over them, then:
+
+  paging   - walks the merged /access-logs ``--page-size`` entries at a
+             time, twice, checking every entry comes back exactly once and
+             newest first, and reports page latency and how many node
+             connections the pool opened vs. reused
+  images   - fetches snapshot images through the aggregator
+  readings - /reading latency (served from the cached event feed)
+  viewers  - ``--viewers`` clients watch one node's stream through the
+             aggregator; reports their frame rate and how many connections
+             the node itself sees for that stream (should be 1)
+
+Usage:
+    python3 benchmarks/load_aggregator.py [--nodes 3] [--entries 500]
+        [--page-size 50] [--viewers 50] [--seconds 10] [--server gevent]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from aggregator import _read_part  # noqa: E402
+from standin_nodes import _free_port, start_nodes, stop_nodes, wait_ready  # noqa: E402
+
+
+def _get(port, path, conn=None):
+    """GET ``path``; returns (status, headers, body, ms). Reuses ``conn`` if given."""
+    own = conn is None
+    conn = conn or http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    t0 = time.perf_counter()
+    try:
+        conn.request("GET", path)
+        response = conn.getresponse()
+        body = response.read()
+        return response.status, response.headers, body, (time.perf_counter() - t0) * 1e3
+    finally:
+        if own:
+            conn.close()
+
+
+def _pct(values):
+    p50, p95 = np.percentile(values, [50, 95])
+    return f"p50 {p50:6.1f} ms  p95 {p95:6.1f} ms"
+
+
+def _walk(port, page_size):
+    """Page through the merged access log; returns (entries, page latencies)."""
+    entries, latencies, cursor = [], [], None
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    while True:
+        path = f"/access-logs?limit={page_size}"
+        if cursor:
+            path += f"&cursor={cursor}"
+        status, headers, body, ms = _get(port, path, conn)
+        if status != 200:
+            raise RuntimeError(f"/access-logs: HTTP {status} {body[:200]}")
+        if headers.get("X-Unavailable-Nodes"):
+            raise RuntimeError(f"nodes unavailable: {headers['X-Unavailable-Nodes']}")
+        entries.extend(json.loads(body))
+        latencies.append(ms)
+        cursor = headers.get("X-Next-Cursor")
+        if not cursor:
+            conn.close()
+            return entries, latencies
+
+
+class _Viewer(threading.Thread):
+    def __init__(self, port, path, stop):
+        super().__init__(daemon=True)
+        self.port, self.path, self.stop = port, path, stop
+        self.frames = 0
+        self.error = None
+
+    def run(self):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+        try:
+            conn.request("GET", self.path)
+            response = conn.getresponse()
+            if response.status != 200:
+                raise RuntimeError(f"HTTP {response.status}")
+            while not self.stop.is_set():
+                if _read_part(response) is None:
+                    raise RuntimeError("stream ended")
+                self.frames += 1
+        except Exception as exc:
+            self.error = str(exc)
+        finally:
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--entries", type=int, default=500)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--viewers", type=int, default=50)
+    parser.add_argument("--profile", default="thumbnail")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--server", default="gevent", choices=["dev", "gevent"])
+    args = parser.parse_args()
+
+    print(f"starting {args.nodes} stand-in nodes with {args.entries} entries each...")
+    nodes = start_nodes(args.nodes, entries=args.entries)
+    port = _free_port()
+    aggregator = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "dht22_api.py"), "--server", args.server,
+         "--host", "127.0.0.1", "--port", str(port), "--nodes",
+         *(f"{name}=http://127.0.0.1:{node_port}" for name, node_port, _, _ in nodes)],
+        env=dict(os.environ, MAX_STREAM_VIEWERS=str(args.viewers)),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(port)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            online = json.loads(_get(port, "/health")[2])["online"]
+            if all(online.values()):
+                break
+            time.sleep(0.2)
+        else:
+            raise RuntimeError(f"nodes not online: {online}")
+
+        expected = args.nodes * args.entries
+        for attempt in ("cold", "warm"):
+            entries, latencies = _walk(port, args.page_size)
+            ids = [(e["node"], e["id"]) for e in entries]
+            times = [e["timestamp"] for e in entries]
+            ok = (len(ids) == expected and len(set(ids)) == expected
+                  and times == sorted(times, reverse=True))
+            print(f"paging {attempt}: {len(latencies)} pages, {len(entries)}/{expected} "
+                  f"entries, {'in order, no duplicates' if ok else 'MISMATCH'}  "
+                  f"{_pct(latencies)}")
+        pool = json.loads(_get(port, "/nodes")[2])["pool"]
+        print(f"node connections: {pool['opened']} opened, {pool['reused']} reused")
+
+        images = [e for e in entries[:20]]
+        latencies = []
+        for entry in images:
+            status, _, body, ms = _get(port, f"/nodes/{entry['node']}/access-logs/"
+                                             f"{entry['id']}/image")
+            if status != 200 or not body.startswith(b"\xff\xd8"):
+                raise RuntimeError(f"image {entry['id']}: HTTP {status}")
+            latencies.append(ms)
+        print(f"images:   {len(latencies)} fetched  {_pct(latencies)}")
+
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        latencies = [_get(port, "/reading", conn)[3] for _ in range(200)]
+        conn.close()
+        print(f"readings: 200 requests  {_pct(latencies)}")
+
+        name, node_port = nodes[0][0], nodes[0][1]
+        stop = threading.Event()
+        viewers = [_Viewer(port, f"/nodes/{name}/video_feed?profile={args.profile}", stop)
+                   for _ in range(args.viewers)]
+        for viewer in viewers:
+            viewer.start()
+        time.sleep(1.0)  # let the relay connect
+        start = [v.frames for v in viewers]
+        time.sleep(args.seconds)
+        fps = [(v.frames - s) / args.seconds for v, s in zip(viewers, start)]
+        upstream = json.loads(_get(node_port, "/stream/profiles")[2])[args.profile]["viewers"]
+        relay = json.loads(_get(port, "/nodes")[2])["nodes"][0]["streams"][args.profile]
+        stop.set()
+        errors = [v.error for v in viewers if v.error]
+        print(f"viewers:  {args.viewers} on {name}/{args.profile}, fps median "
+              f"{np.median(fps):.1f} min {min(fps):.1f}; node sees {upstream} "
+              f"connection(s), relay connected {relay['upstream_connects']} time(s)"
+              + (f"; {len(errors)} errors, e.g. {errors[0]}" if errors else ""))
+    finally:
+        aggregator.terminate()
+        try:
+            aggregator.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            aggregator.kill()
+        stop_nodes(nodes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""Load test: many concurrent /events (SSE) subscribers.
+
+Serves an ``/events`` route built like the server's (EventHub plus the
+initial state messages) from a Werkzeug server, fed by a SensorSampler on
+a FakeDHT22 and a simulated camera that publishes a detection summary
+``--rate`` times a second. ``--clients`` subscribers stay connected for
+the whole run while another client polls ``/health``. Reports per-event
+delivery latency, events lost per subscriber and the HTTP latency seen by
+the poller, and fails if any subscriber missed an event.
+
+Usage:
+    python3 benchmarks/load_events.py [--clients 50] [--seconds 15] [--rate 5]
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+from flask import Flask, Response, jsonify, request
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from events import EventHub, SubscriberLimitError, format_event  # noqa: E402
+from sensor import FakeDHT22, SensorSampler  # noqa: E402
+
+
+def _build_app(hub, sampler):
+    app = Flask(__name__)
+
+    @app.route("/events")
+    def events():
+        last_id = request.headers.get("Last-Event-ID", type=int)
+        try:
+            subscriber = hub.subscribe(last_id)
+        except SubscriberLimitError as exc:
+            return jsonify({"error": str(exc)}), 503
+        initial = [format_event("sensor", sampler.reading())]
+        response = Response(subscriber.stream(initial), mimetype="text/event-stream")
+        response.call_on_close(subscriber.close)
+        return response
+
+    app.add_url_rule("/health", "health", lambda: jsonify({"status": "ok"}))
+    return app
+
+
+class _Subscriber(threading.Thread):
+    """Reads one SSE stream and records event ids and delivery latency."""
+
+    def __init__(self, port):
+        super().__init__(daemon=True)
+        self.port = port
+        self.connected = threading.Event()
+        self.ids = []
+        self.latencies = []
+        self.counts = {}
+
+    def run(self):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+        conn.request("GET", "/events")
+        resp = conn.getresponse()
+        if resp.status != 200:
+            print(f"subscriber refused: {resp.status}")
+            return
+        self.connected.set()
+        event, data, event_id = None, None, None
+        while True:
+            line = resp.fp.readline()
+            if not line:
+                break
+            line = line.decode().rstrip("\n")
+            if line.startswith("id: "):
+                event_id = int(line[4:])
+            elif line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: "):
+                data = line[6:]
+            elif line == "" and event is not None:
+                now = time.time()
+                self.counts[event] = self.counts.get(event, 0) + 1
+                if event_id is not None:
+                    self.ids.append(event_id)
+                payload = json.loads(data)
+                if event == "detections":
+                    self.latencies.append(now - payload["sent_at"])
+                elif event == "stop":
+                    break
+                event, data, event_id = None, None, None
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=15.0)
+    parser.add_argument("--rate", type=float, default=5.0,
+                        help="simulated detection summaries per second")
+    args = parser.parse_args()
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    hub = EventHub(max_subscribers=args.clients)
+    sampler = SensorSampler(FakeDHT22(failure_rate=0.1, seed=1), interval=2.0)
+    sampler.add_listener(lambda *_: hub.publish("sensor", sampler.reading()))
+    sampler.start()
+
+    server = make_server("127.0.0.1", 0, _build_app(hub, sampler), threaded=True)
+    port = server.server_port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    stop = threading.Event()
+    subscribers = [_Subscriber(port) for _ in range(args.clients)]
+    for sub in subscribers:
+        sub.start()
+    connected = sum(sub.connected.wait(10) for sub in subscribers)
+
+    def camera():
+        rng = np.random.default_rng(0)
+        while not stop.is_set():
+            people = int(rng.integers(0, 3))
+            hub.publish("detections", {"count": people, "labels": {"person": people},
+                                       "sent_at": time.time()})
+            time.sleep(1.0 / args.rate)
+
+    http_latencies = []
+
+    def poll():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            conn.request("GET", "/health")
+            conn.getresponse().read()
+            http_latencies.append(time.perf_counter() - t0)
+            time.sleep(0.05)
+        conn.close()
+
+    workers = [threading.Thread(target=fn, daemon=True) for fn in (camera, poll)]
+    first_id = hub.publish("start", {})
+    for t in workers:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    last_id = hub.publish("stop", {})  # subscribers read up to this, then exit
+    for t in workers:
+        t.join()
+    for sub in subscribers:
+        sub.join(timeout=5)
+    sampler.stop()
+    server.shutdown()
+
+    expected = last_id - first_id + 1
+    lost = [expected - len({i for i in sub.ids if first_id <= i <= last_id})
+            for sub in subscribers]
+    lat = np.concatenate([np.asarray(s.latencies) for s in subscribers]) * 1e3
+    counts = {}
+    for sub in subscribers:
+        for name, n in sub.counts.items():
+            counts[name] = counts.get(name, 0) + n
+
+    print(f"subscribers: {connected}/{args.clients} connected, {args.seconds:.0f} s, "
+          f"{expected} events published")
+    print(f"  events received  : {sum(counts.values())} "
+          f"({', '.join(f'{k} {v}' for k, v in sorted(counts.items()))})")
+    print(f"  lost per client  : max {max(lost)}, total {sum(lost)}")
+    if lat.size:
+        p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+        print(f"  delivery ms      : p50 {p50:.2f}  p95 {p95:.2f}  p99 {p99:.2f}")
+    if http_latencies:
+        h50, h95 = np.percentile(np.asarray(http_latencies) * 1e3, [50, 95])
+        print(f"  /health ms       : p50 {h50:.2f}  p95 {h95:.2f}")
+    if connected < args.clients or sum(lost):
+        sys.exit("FAIL: not every subscriber received every event")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Load test: MJPEG fan-out with many simulated fast and slow viewers.
+
+A publisher thread pushes synthetic JPEG-sized frames at a fixed rate while
+N viewer threads consume the stream; half of them are "slow" and stall for
+a while after every chunk. For each client count the script reports process
+CPU usage, resident memory and how many frames fast/slow viewers received.
+
+Two modes are measured:
+  broadcast - streaming.MjpegBroadcaster (one shared chunk per frame)
+  legacy    - the old per-viewer ``header + frame + trailer`` concatenation
+
+Usage:
+    python3 benchmarks/load_mjpeg.py [--clients 1 10 50 100] [--seconds 5]
+"""
+
+import argparse
+import gc
+import os
+import resource
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from streaming import FrameBus, MjpegBroadcaster  # noqa: E402
+
+
+def _rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _legacy_stream(bus, stop):
+    seq = 0
+    while not stop.is_set():
+        item = bus.wait(seq, timeout=0.5)
+        if item is None:
+            continue
+        seq, frame = item
+        yield (
+            b"--frame\r\n"
+            b"Content-Type: image/jpeg\r\n\r\n" + frame + b"\r\n"
+        )
+
+
+def _run(mode, clients, seconds, fps, frame_kb, slow_delay):
+    stop = threading.Event()
+    jpeg = os.urandom(frame_kb * 1024)
+    received = [0] * clients
+
+    if mode == "broadcast":
+        broadcaster = MjpegBroadcaster()
+        publish = broadcaster.publish
+        viewers = [broadcaster.open_viewer() for _ in range(clients)]
+        streams = [v.stream(timeout=0.5) for v in viewers]
+    else:
+        bus = FrameBus()
+        publish = bus.publish
+        viewers = []
+        streams = [_legacy_stream(bus, stop) for _ in range(clients)]
+
+    def consume(i, stream, delay):
+        sink = 0
+        for chunk in stream:
+            sink += len(chunk)  # stands in for the socket write
+            received[i] += 1
+            if delay:
+                time.sleep(delay)
+            if stop.is_set():
+                break
+
+    def produce():
+        interval = 1.0 / fps
+        while not stop.is_set():
+            publish(jpeg)
+            time.sleep(interval)
+
+    threads = [
+        threading.Thread(
+            target=consume, args=(i, s, slow_delay if i % 2 else 0), daemon=True,
+        )
+        for i, s in enumerate(streams)
+    ]
+    gc.collect()
+    rss_before = _rss_mb()
+    cpu_before, wall_before = time.process_time(), time.perf_counter()
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    for t in threads:
+        t.start()
+
+    rss_peak = rss_before
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        time.sleep(0.1)
+        rss_peak = max(rss_peak, _rss_mb())
+
+    stop.set()
+    cpu = time.process_time() - cpu_before
+    wall = time.perf_counter() - wall_before
+    producer.join()
+    for v in viewers:
+        v.close()
+    for t in threads:
+        t.join(timeout=2)
+
+    fast = received[0::2]
+    slow = received[1::2] or [0]
+    return {
+        "cpu_pct": 100 * cpu / wall,
+        "rss_delta_mb": rss_peak - rss_before,
+        "fast_fps": sum(fast) / len(fast) / wall,
+        "slow_fps": sum(slow) / len(slow) / wall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--fps", type=float, default=25.0)
+    parser.add_argument("--frame-kb", type=int, default=120)
+    parser.add_argument("--slow-delay", type=float, default=0.25,
+                        help="seconds a slow viewer stalls after each chunk")
+    args = parser.parse_args()
+
+    print(f"{'mode':<10} {'clients':>7} {'cpu %':>7} {'rss +MB':>8} "
+          f"{'fast fps':>9} {'slow fps':>9}")
+    for clients in args.clients:
+        for mode in ("broadcast", "legacy"):
+            r = _run(mode, clients, args.seconds, args.fps, args.frame_kb,
+                     args.slow_delay)
+            print(f"{mode:<10} {clients:>7} {r['cpu_pct']:>7.1f} "
+                  f"{r['rss_delta_mb']:>8.1f} {r['fast_fps']:>9.1f} "
+                  f"{r['slow_fps']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
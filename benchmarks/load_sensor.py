@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Load test: many concurrent readers against the background sensor sampler.
+
+A SensorSampler polls a FakeDHT22 (slow, occasionally failing reads) while
+``--clients`` threads call ``reading()`` as fast as they can, like request
+handlers for /temperature, /humidity and /reading. Reports reader
+throughput and latency, and checks the sampler never read the sensor
+faster than its 2 s minimum.
+
+Usage:
+    python3 benchmarks/load_sensor.py [--clients 50] [--seconds 10]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sensor import MIN_READ_INTERVAL, FakeDHT22, SensorSampler  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--interval", type=float, default=2.0)
+    parser.add_argument("--failure-rate", type=float, default=0.2)
+    parser.add_argument("--think-ms", type=float, default=1.0,
+                        help="pause between a client's calls")
+    args = parser.parse_args()
+
+    device = FakeDHT22(failure_rate=args.failure_rate, seed=1)
+    sampler = SensorSampler(device, interval=args.interval)
+    sampler.start()
+    while not sampler.reading()["success"]:
+        time.sleep(0.05)
+
+    stop = threading.Event()
+    latencies = [[] for _ in range(args.clients)]
+    failed = [0] * args.clients
+
+    think = args.think_ms / 1e3
+
+    def client(i):
+        out = latencies[i]
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            data = sampler.reading()
+            out.append(time.perf_counter() - t0)
+            if not data["success"]:
+                failed[i] += 1
+            time.sleep(think)
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True)
+               for i in range(args.clients)]
+    reads0 = sampler.reads
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    sampler.stop()
+
+    all_lat = np.concatenate([np.asarray(v) for v in latencies]) * 1e6
+    reads = sampler.reads - reads0
+    # +2: a read may straddle each end of the measurement window
+    max_allowed = int(args.seconds / MIN_READ_INTERVAL) + 2
+    print(f"clients: {args.clients}  duration: {args.seconds:.0f} s")
+    print(f"  readings served : {len(all_lat)} ({len(all_lat) / args.seconds:,.0f}/s), "
+          f"failed: {sum(failed)}")
+    p50, p99, pmax = np.percentile(all_lat, [50, 99, 100])
+    print(f"  reading() us    : p50 {p50:.1f}  p99 {p99:.1f}  max {pmax:.1f}")
+    print(f"  sensor reads    : {reads} (limit {max_allowed}), "
+          f"failures: {sampler.failures}")
+    if reads > max_allowed:
+        sys.exit("FAIL: sensor was read faster than its minimum interval")
+
+
+if __name__ == "__main__":
+    main()
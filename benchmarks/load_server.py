@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""Load test: how many concurrent MJPEG streams the server sustains.
+
+Starts ``dht22_api.py --fake`` (fake camera and DHT22, data in a temporary
+directory) with each ``--servers`` mode and opens /video_feed streams in
+steps of ``--step``. All streams are read by one selector loop, so the
+client side stays cheap. Meanwhile one client polls ``/health`` and others
+page through ``/access-logs`` (seeded with ``--entries`` entries) and query
+``/history``, which wait on SQLite. A step passes while every stream
+connects, the median stream keeps at least 90% of the frame rate a single
+viewer gets (the first step), the slowest keeps half of it and both the
+/health p95 and the p95 of the SQLite-backed requests stay under
+``--max-latency-ms``. Reports, per mode, each step's frame rates, request
+latencies and the server's thread count and memory, then the largest
+passing step.
+
+Usage:
+    python3 benchmarks/load_server.py [--servers dev gevent] [--profile medium]
+        [--step 25] [--max-streams 400] [--seconds 5] [--entries 20000]
+"""
+
+import argparse
+import http.client
+import os
+import selectors
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from access_log import AccessLogStore  # noqa: E402
+from streaming import DEFAULT_PROFILES  # noqa: E402
+
+_BOUNDARY = b"--frame\r\n"
+# Requests that wait on SQLite, polled alongside /health
+_API_PATHS = ("/access-logs?limit=100", "/access-logs?limit=100&label=person",
+              "/history?resolution=raw")
+
+
+def _seed_access_log(path, count):
+    """Fill a new access log with ``count`` entries, one a minute up to now."""
+    store = AccessLogStore(path)
+    now = time.time()
+    entries = []
+    for i in range(count):
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now - (count - i) * 60))
+        entries.append({"id": f"{i:012x}", "timestamp": stamp,
+                        "labels": ["person"] if i % 3 else ["Face", "person"],
+                        "count": 1, "image": f"{i:012x}.jpg"})
+    store.append_many(entries)
+    store.close()
+
+
+def _proc_status(pid):
+    status = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            status[key] = value.split()[0] if value.split() else ""
+    return int(status["Threads"]), int(status["VmRSS"]) / 1024
+
+
+class _StreamReader(threading.Thread):
+    """Reads many MJPEG streams from one selector loop and counts frames."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.selector = selectors.DefaultSelector()
+        self.frames = {}
+        self.closed = set()
+        self._tails = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def add(self, sock):
+        sock.setblocking(False)
+        with self._lock:
+            self.frames[sock] = 0
+            self._tails[sock] = b""
+            self.selector.register(sock, selectors.EVENT_READ)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.frames)
+
+    def run(self):
+        while not self._stopping.is_set():
+            with self._lock:
+                if not self.selector.get_map():
+                    ready = []
+                else:
+                    ready = self.selector.select(timeout=0.05)
+                for key, _ in ready:
+                    sock = key.fileobj
+                    try:
+                        data = sock.recv(262144)
+                    except BlockingIOError:
+                        continue
+                    except OSError:
+                        data = b""
+                    if not data:
+                        self.selector.unregister(sock)
+                        self.closed.add(sock)
+                        continue
+                    # Keep a tail so a boundary split across reads still counts
+                    buf = self._tails[sock] + data
+                    self.frames[sock] += buf.count(_BOUNDARY)
+                    self._tails[sock] = buf[-(len(_BOUNDARY) - 1):]
+            if not ready:
+                time.sleep(0.01)
+
+    def stop(self):
+        self._stopping.set()
+        self.join(timeout=2)
+        for sock in list(self.frames):
+            sock.close()
+
+
+def _open_stream(port, profile):
+    """Open /video_feed and consume the response headers; returns the socket or None."""
+    sock = socket.create_connection(("127.0.0.1", port), timeout=10)
+    sock.sendall(f"GET /video_feed?profile={profile} HTTP/1.1\r\n"
+                 f"Host: 127.0.0.1\r\n\r\n".encode())
+    head = b""
+    while b"\r\n\r\n" not in head:
+        data = sock.recv(4096)
+        if not data:
+            sock.close()
+            return None
+        head += data
+    if not head.startswith((b"HTTP/1.1 200", b"HTTP/1.0 200")):
+        sock.close()
+        return None
+    return sock
+
+
+def _wait_ready(port, proc, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                conn.close()
+                return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError("server did not become ready")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _run(server, args):
+    port = _free_port()
+    data_dir = tempfile.mkdtemp(prefix="load_server_")
+    _seed_access_log(os.path.join(data_dir, "access_log.db"), args.entries)
+    env = dict(
+        os.environ, DATA_DIR=data_dir, CLIP_PROFILE="",
+        MAX_STREAM_VIEWERS=str(args.max_streams + 10),
+    )
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "dht22_api.py"), "--fake",
+         "--server", server, "--host", "127.0.0.1", "--port", str(port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    reader = _StreamReader()
+    results = []
+    try:
+        _wait_ready(port, proc)
+        if not args.detection:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            conn.request("POST", "/detection/toggle", body='{"faces": false, "objects": false}')
+            conn.getresponse().read()
+            conn.close()
+        reader.start()
+
+        streams = []
+        baseline = None
+        while len(streams) < args.max_streams:
+            target = min(len(streams) + args.step, args.max_streams) if streams else 1
+            refused = 0
+            while len(streams) < target:
+                try:
+                    sock = _open_stream(port, args.profile)
+                except OSError:
+                    sock = None
+                if sock is None:
+                    refused += 1
+                    break
+                reader.add(sock)
+                streams.append(sock)
+            time.sleep(1.0)  # let new viewers reach steady state
+
+            latencies, api_latencies = [], []
+            stop = threading.Event()
+
+            def poll(path, out):
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                while not stop.is_set():
+                    t0 = time.perf_counter()
+                    conn.request("GET", path)
+                    conn.getresponse().read()
+                    out.append((time.perf_counter() - t0) * 1e3)
+                    time.sleep(0.05)
+                conn.close()
+
+            pollers = [threading.Thread(target=poll, args=("/health", latencies), daemon=True)]
+            pollers += [threading.Thread(target=poll, args=(path, api_latencies), daemon=True)
+                        for path in _API_PATHS]
+            before, t0 = reader.snapshot(), time.perf_counter()
+            for poller in pollers:
+                poller.start()
+            time.sleep(args.seconds)
+            after, elapsed = reader.snapshot(), time.perf_counter() - t0
+            stop.set()
+            for poller in pollers:
+                poller.join()
+
+            rates = np.array([(after[s] - before.get(s, 0)) / elapsed for s in streams])
+            lat = np.array(latencies or [float("nan")])
+            api_lat = np.array(api_latencies or [float("nan")])
+            threads, rss = _proc_status(proc.pid)
+            step = {
+                "streams": len(streams),
+                "refused": refused,
+                "dropped": sum(1 for s in streams if s in reader.closed),
+                "fps_min": float(rates.min()),
+                "fps_p50": float(np.median(rates)),
+                "health_p50": float(np.percentile(lat, 50)),
+                "health_p95": float(np.percentile(lat, 95)),
+                "health_p99": float(np.percentile(lat, 99)),
+                "api_p95": float(np.percentile(api_lat, 95)),
+                "threads": threads,
+                "rss_mb": rss,
+            }
+            baseline = baseline or step["fps_p50"]
+            step["ok"] = (
+                not refused and not step["dropped"]
+                and step["fps_p50"] >= 0.9 * baseline and step["fps_min"] >= 0.5 * baseline
+                and step["health_p95"] <= args.max_latency_ms
+                and step["api_p95"] <= args.max_latency_ms
+            )
+            results.append(step)
+            print(f"{server:<7} {step['streams']:>7} {step['fps_p50']:>8.1f} "
+                  f"{step['fps_min']:>8.1f} {step['health_p50']:>8.1f} "
+                  f"{step['health_p95']:>8.1f} {step['health_p99']:>8.1f} "
+                  f"{step['api_p95']:>8.1f} {step['threads']:>7} {step['rss_mb']:>7.0f}  "
+                  f"{'ok' if step['ok'] else 'FAIL'}")
+            if not step["ok"]:
+                break
+    finally:
+        reader.stop()
+        proc.terminate()
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    passing = [r["streams"] for r in results if r["ok"]]
+    return max(passing) if passing else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--servers", nargs="+", default=["dev", "gevent"],
+                        choices=["dev", "gevent"])
+    parser.add_argument("--profile", default="medium", choices=list(DEFAULT_PROFILES))
+    parser.add_argument("--step", type=int, default=25)
+    parser.add_argument("--max-streams", type=int, default=400)
+    parser.add_argument("--seconds", type=float, default=5.0,
+                        help="measurement time per step")
+    parser.add_argument("--max-latency-ms", type=float, default=250.0,
+                        help="largest acceptable /health and SQLite-backed request p95")
+    parser.add_argument("--entries", type=int, default=20000,
+                        help="access log entries to seed")
+    parser.add_argument("--detection", action="store_true",
+                        help="leave face/object detection running during the test")
+    args = parser.parse_args()
+
+    fps = DEFAULT_PROFILES[args.profile].max_fps
+    print(f"profile {args.profile} ({fps} fps), {args.seconds:.0f} s per step")
+    print(f"{'server':<7} {'streams':>7} {'fps p50':>8} {'fps min':>8} "
+          f"{'/health':>8} {'p95':>8} {'p99 ms':>8} {'api p95':>8} {'threads':>7} "
+          f"{'rss MB':>7}")
+    best = {server: _run(server, args) for server in args.servers}
+    print()
+    for server, streams in best.items():
+        print(f"max concurrent streams ({server}): {streams}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""Record a scene, then replay it through the monitor pipeline off-device.
+
+  record OUT_DIR    capture frames (OUT_DIR/frames/*.jpg) and DHT22 readings
+                    (OUT_DIR/sensor.csv) from a camera and sensor source; run
+                    it on the Pi with the server stopped
+  run RECORDING     replay a recording through capture -> overlay -> encode
+                    -> detect -> event logging, one frame at a time and as
+                    fast as possible, then replay its sensor readings, and
+                    print the results as JSON
+  compare A B       compare two ``run`` results, e.g. from two commits
+
+``run`` drives a real Monitor (data in a temporary directory) with the
+frames preloaded, so decoding is not timed. Each frame is stamped with its
+recorded time (frame number / recorded fps) instead of the wall clock, so
+the motion gate, tracker and stream frame-rate caps behave as they did
+live and detection counts repeat from run to run. Clips are disabled since
+they are cut by wall-clock time. A recording can also be a video file or a
+plain image directory.
+
+Usage:
+    python3 benchmarks/replay.py record OUT_DIR [--camera picamera] [--sensor dht22]
+        [--seconds 60] [--fps 10]
+    python3 benchmarks/replay.py run RECORDING [--frames N] [--mode thread]
+        [--profiles full medium thumbnail] [--regions FILE.json] [--output FILE.json]
+    python3 benchmarks/replay.py compare BASE.json NEW.json
+"""
+
+import argparse
+import contextlib
+import csv
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import cv2
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import hardware  # noqa: E402
+from metrics import registry  # noqa: E402
+from monitor import Monitor  # noqa: E402
+from sensor import MIN_READ_INTERVAL, FakeDHT22, RecordedDHT22  # noqa: E402
+from streaming import DEFAULT_PROFILES  # noqa: E402
+
+_SENSOR_COLUMNS = ["timestamp", "temperature_celsius", "humidity_percent"]
+
+
+# --- record ---
+
+def _record_sensor(device, path, stop):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(_SENSOR_COLUMNS)
+        while not stop.is_set():
+            started = time.monotonic()
+            try:
+                row = [round(device.temperature, 2), round(device.humidity, 2)]
+            except RuntimeError:
+                row = ["", ""]  # replayed as a failed read
+            writer.writerow([time.strftime("%Y-%m-%dT%H:%M:%S")] + row)
+            stop.wait(max(0.0, MIN_READ_INTERVAL - (time.monotonic() - started)))
+
+
+def record(args):
+    frames_dir = os.path.join(args.out, "frames")
+    os.makedirs(frames_dir, exist_ok=True)
+    camera = hardware.open_camera(args.camera)
+    device = hardware.open_dht(args.sensor)
+    stop = threading.Event()
+    sensor_thread = threading.Thread(
+        target=_record_sensor, args=(device, os.path.join(args.out, "sensor.csv"), stop),
+    )
+    camera.start()
+    sensor_thread.start()
+    count, started = 0, time.monotonic()
+    next_frame = started
+    try:
+        while time.monotonic() - started < args.seconds:
+            frame = camera.capture_array()
+            now = time.monotonic()
+            if now < next_frame:
+                continue
+            next_frame = max(next_frame + 1.0 / args.fps, now)
+            cv2.imwrite(os.path.join(frames_dir, f"{count:06d}.jpg"), frame,
+                        [cv2.IMWRITE_JPEG_QUALITY, 95])
+            count += 1
+    finally:
+        elapsed = time.monotonic() - started
+        stop.set()
+        sensor_thread.join()
+        camera.stop()
+        camera.close()
+        device.exit()
+    meta = {
+        "frames": count,
+        "fps": round(count / elapsed, 2),
+        "size": list(hardware.CAMERA_SIZE),
+        "camera": args.camera,
+        "sensor": args.sensor,
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    with open(os.path.join(args.out, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    print(f"Recorded {count} frames ({meta['fps']} fps) to {args.out}")
+
+
+# --- run ---
+
+def _recording_paths(path):
+    """(frames source, sensor CSV or None, recorded fps) for a recording."""
+    fps = 10.0
+    if os.path.isfile(os.path.join(path, "meta.json")):
+        with open(os.path.join(path, "meta.json")) as f:
+            fps = json.load(f).get("fps") or fps
+    frames = os.path.join(path, "frames")
+    if not os.path.isdir(frames):
+        frames = path
+    if os.path.isfile(path):
+        fps = cv2.VideoCapture(path).get(cv2.CAP_PROP_FPS) or fps
+    sensor = os.path.join(path, "sensor.csv") if os.path.isdir(path) else None
+    return frames, sensor if sensor and os.path.isfile(sensor) else None, fps
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "-C", ROOT, "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    # Keep the monitor's progress messages out of the JSON on stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        result = _replay(args)
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        print(f"{result['config']['frames']} frames at "
+              f"{result['throughput']['frames_per_sec']} fps; results in {args.output}")
+    else:
+        print(text)
+
+
+def _replay(args):
+    frames_path, sensor_path, fps = _recording_paths(args.recording)
+    camera = hardware.RecordedCamera(
+        frames_path, fps=0, loop=False, preload=True, max_frames=args.frames,
+    )
+    # Without a recorded sensor: fakes that neither sleep nor vary between runs
+    sensor = (RecordedDHT22(sensor_path) if sensor_path
+              else FakeDHT22(read_time=0.0, seed=0))
+    data_dir = tempfile.mkdtemp(prefix="replay_")
+    regions_file = os.path.join(data_dir, "detection_regions.json")
+    if args.regions:
+        shutil.copyfile(args.regions, regions_file)
+    monitor = Monitor(
+        os.path.join(data_dir, "snapshots"), os.path.join(data_dir, "access_log.db"),
+        os.path.join(data_dir, "sensor_history.db"), regions_file,
+        camera_source=camera, sensor_source=sensor,
+        detection_mode=args.mode, face_backend=args.face_backend,
+        object_backend=args.object_backend, clip_profile="",
+    )
+    capture_stage = registry.stage("capture")
+    try:
+        monitor.start(pipeline=False)
+        monitor._load_detectors()
+        state = monitor.set_detection_state(faces=True, objects=not args.no_objects)
+        viewers = [monitor.streams[name].broadcaster.open_viewer() for name in args.profiles]
+
+        tracks_seen = {}
+        gated = 0
+        out_buf = None
+        base = time.monotonic()
+        started = time.perf_counter()
+        for i in range(len(camera)):
+            now = base + i / fps
+            t0 = registry.clock()
+            frame = camera.capture_array()
+            capture_stage.since(t0)
+            out_buf = monitor._publish_frame(frame, now, out_buf)
+            tracks = monitor._detect_frame(frame, state, now)
+            if tracks is None:
+                gated += 1
+                continue
+            for t in tracks:
+                tracks_seen.setdefault(t["label"], set()).add(t["track_id"])
+        pipeline_secs = time.perf_counter() - started
+
+        # One sampler read per recorded reading, through history and /events
+        readings = len(sensor) if sensor_path else 100
+        t0 = time.perf_counter()
+        for _ in range(readings):
+            monitor.sensor_sampler._sample_once()
+        sensor_secs = time.perf_counter() - t0
+
+        # Flush queued snapshots so every person event is counted
+        monitor.snapshot_writer.stop()
+        for viewer in viewers:
+            viewer.close()
+        metrics = registry.snapshot()
+        result = {
+            "recording": os.path.abspath(args.recording),
+            "commit": _git_commit(),
+            "machine": {
+                "python": platform.python_version(),
+                "opencv": cv2.__version__,
+                "cpus": os.cpu_count(),
+            },
+            "config": {
+                "frames": len(camera),
+                "recorded_fps": fps,
+                "detection_mode": args.mode,
+                "profiles": args.profiles,
+                "detectors": monitor.detector_state,
+                "backends": {"faces": args.face_backend, "objects": args.object_backend},
+                "regions": monitor.region_store.regions.regions,
+            },
+            "throughput": {
+                "pipeline_secs": round(pipeline_secs, 3),
+                "frames_per_sec": round(len(camera) / pipeline_secs, 2),
+                "sensor_reads_per_sec": round(readings / sensor_secs, 1),
+            },
+            "stages_ms": metrics["stages_ms"],
+            "counters": {name: c["total"] for name, c in metrics["counters"].items()},
+            "detections": {
+                "frames_gated": gated,
+                "detector_runs": metrics["counters"].get("detector_runs", {}).get("total", 0),
+                "tracks": {label: len(ids) for label, ids in sorted(tracks_seen.items())},
+                "person_events": monitor.access_log.count(),
+                "snapshot_writer": {
+                    key: value for key, value in monitor.snapshot_writer.stats().items()
+                    if key in ("written", "dropped", "coalesced", "failed")
+                },
+            },
+            "sensor": {
+                "reads": monitor.sensor_sampler.reads,
+                "failures": monitor.sensor_sampler.failures,
+            },
+        }
+    finally:
+        monitor.stop()
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return result
+
+
+# --- compare ---
+
+def _change(old, new):
+    if old is None or new is None:
+        return ""
+    if not old:
+        return "" if not new else "new"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def compare(args):
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    print(f"base {base.get('commit')}  vs  new {new.get('commit')}\n")
+    old_fps = base["throughput"]["frames_per_sec"]
+    new_fps = new["throughput"]["frames_per_sec"]
+    print(f"{'throughput (fps)':<28} {old_fps:>9} {new_fps:>9} {_change(old_fps, new_fps):>8}")
+
+    print(f"\n{'stage p50 / p95 ms':<28} {'base':>9} {'new':>9} {'change':>8}")
+    for name in sorted(set(base["stages_ms"]) | set(new["stages_ms"])):
+        if not (base["stages_ms"].get(name, {}).get("count")
+                or new["stages_ms"].get(name, {}).get("count")):
+            continue
+        for q in ("p50", "p95"):
+            old = base["stages_ms"].get(name, {}).get(q)
+            cur = new["stages_ms"].get(name, {}).get(q)
+            fmt = lambda v: "-" if v is None else f"{v:.2f}"  # noqa: E731
+            print(f"{name + ' ' + q:<28} {fmt(old):>9} {fmt(cur):>9} {_change(old, cur):>8}")
+
+    print(f"\n{'detections':<28} {'base':>9} {'new':>9}")
+    old_det, new_det = base["detections"], new["detections"]
+    rows = [(key, old_det.get(key), new_det.get(key))
+            for key in ("frames_gated", "detector_runs", "person_events")]
+    for label in sorted(set(old_det["tracks"]) | set(new_det["tracks"])):
+        rows.append((f"tracks {label}", old_det["tracks"].get(label, 0),
+                     new_det["tracks"].get(label, 0)))
+    for key, old, cur in rows:
+        print(f"{key:<28} {old!s:>9} {cur!s:>9}{'' if old == cur else '  differs'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("record", help="record frames and sensor readings")
+    p.add_argument("out", help="output directory")
+    p.add_argument("--camera", default="picamera", help="camera source (see hardware.py)")
+    p.add_argument("--sensor", default="dht22", help="sensor source (see hardware.py)")
+    p.add_argument("--seconds", type=float, default=60.0)
+    p.add_argument("--fps", type=float, default=10.0, help="frames saved per second")
+    p.set_defaults(func=record)
+
+    p = commands.add_parser("run", help="replay a recording and print JSON results")
+    p.add_argument("recording", help="recording directory, video file or image directory")
+    p.add_argument("--frames", type=int, help="replay only the first N frames")
+    p.add_argument("--mode", default="thread", choices=["thread", "process"])
+    p.add_argument("--profiles", nargs="*", default=list(DEFAULT_PROFILES),
+                   choices=list(DEFAULT_PROFILES), help="stream profiles to encode")
+    p.add_argument("--face-backend", default="haar")
+    p.add_argument("--object-backend", default="yolov4-tiny")
+    p.add_argument("--no-objects", action="store_true", help="face detection only")
+    p.add_argument("--regions", help="detection regions JSON ({\"regions\": [...]})")
+    p.add_argument("--output", help="write the JSON here instead of stdout")
+    p.set_defaults(func=run)
+
+    p = commands.add_parser("compare", help="compare two run results")
+    p.add_argument("base")
+    p.add_argument("new")
+    p.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""Stand-in room monitors for trying the aggregator on one Linux box.
+
+Starts ``--count`` copies of ``dht22_api.py`` with the fake camera and
+DHT22 (``--server gevent``, so the aggregator's pooled connections are
+kept alive), each on its own port with its own temporary DATA_DIR. Each
+node's access log is seeded with ``--entries`` synthetic person events
+spread over the last ``--hours`` hours, interleaved between the nodes,
+each with a small snapshot image, so the merged /access-logs view has
+something to page through. Prints the matching aggregator command and
+runs until Ctrl+C.
+
+Usage:
+    python3 benchmarks/standin_nodes.py [--count 3] [--base-port 5101]
+        [--entries 200] [--hours 24]
+"""
+
+import argparse
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from access_log import TIMESTAMP_FORMAT, AccessLogStore  # noqa: E402
+from hardware import FakeCamera  # noqa: E402
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _seed(data_dir, name, entries, hours, seed, image_size=(320, 180)):
+    """Fill a node's access log (and snapshots) with synthetic person events."""
+    if not entries:
+        return
+    rng = np.random.default_rng(seed)
+    now = time.time()
+    times = np.sort(now - rng.uniform(0, hours * 3600, entries))
+    snapshots_dir = os.path.join(data_dir, "snapshots")
+    os.makedirs(snapshots_dir, exist_ok=True)
+    frame = cv2.resize(FakeCamera(frames=2, seed=seed)._frames[0], image_size)
+    ok, jpeg = cv2.imencode(".jpg", frame)
+    log = []
+    for i, ts in enumerate(times):
+        entry_id = f"{name}-{i:06d}"
+        log.append({
+            "id": entry_id,
+            "timestamp": datetime.fromtimestamp(ts).strftime(TIMESTAMP_FORMAT),
+            "labels": ["person"],
+            "count": 1,
+            "image": f"{entry_id}.jpg",
+            "tracks": [i],
+        })
+        with open(os.path.join(snapshots_dir, f"{entry_id}.jpg"), "wb") as f:
+            f.write(jpeg.tobytes())
+    store = AccessLogStore(os.path.join(data_dir, "access_log.db"))
+    store.append_many(log)  # oldest first, like live appends
+    store.close()
+
+
+def wait_ready(port, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=2):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Node on port {port} did not start")
+
+
+def start_nodes(count, base_port=None, entries=200, hours=24.0, quiet=True,
+                image_size=(320, 180)):
+    """Start the stand-in nodes; returns ``[(name, port, process, data_dir)]``.
+
+    ``image_size`` is the (width, height) of the seeded snapshots.
+    """
+    nodes = []
+    try:
+        for i in range(count):
+            name = f"room{i + 1}"
+            port = base_port + i if base_port else _free_port()
+            data_dir = tempfile.mkdtemp(prefix=f"standin_{name}_")
+            _seed(data_dir, name, entries, hours, seed=i, image_size=image_size)
+            env = dict(os.environ, DATA_DIR=data_dir, CLIP_PROFILE="",
+                       SENSOR_INTERVAL_SECS="2")
+            out = subprocess.DEVNULL if quiet else None
+            proc = subprocess.Popen(
+                [sys.executable, os.path.join(ROOT, "dht22_api.py"), "--fake",
+                 "--server", "gevent", "--host", "127.0.0.1", "--port", str(port)],
+                env=env, stdout=out, stderr=out,
+            )
+            nodes.append((name, port, proc, data_dir))
+        for _, port, _, _ in nodes:
+            wait_ready(port)
+    except BaseException:
+        stop_nodes(nodes)
+        raise
+    return nodes
+
+
+def stop_nodes(nodes):
+    for _, _, proc, _ in nodes:
+        proc.terminate()
+    for _, _, proc, data_dir in nodes:
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=3)
+    parser.add_argument("--base-port", type=int, default=5101)
+    parser.add_argument("--entries", type=int, default=200,
+                        help="synthetic access log entries per node")
+    parser.add_argument("--hours", type=float, default=24.0,
+                        help="time span the entries are spread over")
+    args = parser.parse_args()
+
+    nodes = start_nodes(args.count, args.base_port, args.entries, args.hours)
+    specs = " ".join(f"{name}=http://127.0.0.1:{port}" for name, port, _, _ in nodes)
+    for name, port, proc, data_dir in nodes:
+        print(f"{name}: http://127.0.0.1:{port} (pid {proc.pid}, data in {data_dir})")
+    print(f"\nAggregate them with:\n  python3 dht22_api.py --server gevent --port 5100 "
+          f"--nodes {specs}\n\nPress Ctrl+C to stop the nodes")
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        while all(proc.poll() is None for _, _, proc, _ in nodes):
+            time.sleep(1)
+        print("A node exited; stopping the others")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_nodes(nodes)
+
+
+if __name__ == "__main__":
+    main()
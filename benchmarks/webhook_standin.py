@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Local stand-in for an alert webhook receiver.
+
+Accepts the JSON batches an AlertDispatcher POSTs and keeps them in
+memory. ``--fail-rate`` answers that share of requests with HTTP 503
+(before recording them) so retries can be tried out. Run it and point
+the monitor at it:
+
+    python3 benchmarks/webhook_standin.py --port 5200
+    ALERT_WEBHOOK_URL=http://127.0.0.1:5200/alerts python3 dht22_api.py --fake
+
+Usage:
+    python3 benchmarks/webhook_standin.py [--port 5200] [--fail-rate 0.0]
+"""
+
+import argparse
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class WebhookStandin:
+    """A webhook receiver on a background thread; ``url`` is where to POST."""
+
+    def __init__(self, port=0, fail_rate=0.0, seed=None, quiet=True):
+        self.fail_rate = fail_rate
+        self.quiet = quiet
+        self.batches = []  # the "alerts" list of every accepted request
+        self.rejected = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with standin._lock:
+                    failed = standin._random.random() < standin.fail_rate
+                    if failed:
+                        standin.rejected += 1
+                    else:
+                        alerts = json.loads(body)["alerts"]
+                        standin.batches.append(alerts)
+                self.send_response(503 if failed else 204)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                if not failed and not standin.quiet:
+                    for alert in alerts:
+                        print(f"{alert['timestamp']}  {alert['state']:<8} {alert['rule']} "
+                              f"({alert['signal']} {alert['aggregate']} = {alert['value']})")
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/alerts"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def alerts(self):
+        with self._lock:
+            return [alert for batch in self.batches for alert in batch]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=5200)
+    parser.add_argument("--fail-rate", type=float, default=0.0,
+                        help="share of requests answered with HTTP 503")
+    args = parser.parse_args()
+    standin = WebhookStandin(args.port, args.fail_rate, quiet=False)
+    print(f"Receiving alerts at {standin.url} (Ctrl+C to stop)")
+    try:
+        standin._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        standin._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
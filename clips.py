@@ -0,0 +1,227 @@
+"""Short video clips around person events, from already-encoded frames.
+
+A ClipRecorder taps a stream profile's broadcaster and keeps the JPEG
+frames it publishes in a ring buffer capped in bytes. When an event is
+triggered, the frames from ``pre_secs`` before it to ``post_secs`` after
+it are written as an MJPEG AVI: the JPEG bytes go into the file as they
+are, so nothing is decoded or re-encoded.
+"""
+
+import collections
+import os
+import queue
+import shutil
+import struct
+import threading
+import time
+
+CLIP_SUFFIX = "_clip.avi"
+
+
+def _chunk(fourcc, data):
+    pad = b"\0" if len(data) % 2 else b""
+    return fourcc + struct.pack("<I", len(data)) + data + pad
+
+
+def _list(list_type, *chunks):
+    body = list_type + b"".join(chunks)
+    return b"LIST" + struct.pack("<I", len(body)) + body
+
+
+def write_mjpeg_avi(path, jpegs, width, height, fps):
+    """Write JPEG frames (bytes-like) to ``path`` as a Motion-JPEG AVI.
+
+    Frames are written straight from the given buffers; only the headers
+    and the index are built in memory.
+    """
+    fps = max(1, round(fps))
+    sizes = [len(j) for j in jpegs]
+    max_frame = max(sizes, default=0)
+
+    index, offset = [], 4  # idx1 offsets count from the 'movi' list type
+    for size in sizes:
+        index.append(struct.pack("<4sIII", b"00dc", 0x10, offset, size))
+        offset += 8 + size + size % 2
+    movi_size = offset  # 'movi' + frame chunks
+
+    avih = struct.pack(
+        "<IIIIIIIIII16x",
+        1_000_000 // fps, max_frame * fps, 0, 0x10, len(sizes), 0, 1,
+        max_frame, width, height,
+    )
+    strh = struct.pack(
+        "<4s4sIHHIIIIIIIIhhhh",
+        b"vids", b"MJPG", 0, 0, 0, 0, 1, fps, 0, len(sizes), max_frame,
+        0xFFFFFFFF, 0, 0, 0, width, height,
+    )
+    strf = struct.pack(
+        "<IiiHH4sIiiII",
+        40, width, height, 1, 24, b"MJPG", width * height * 3, 0, 0, 0, 0,
+    )
+    hdrl = _list(b"hdrl", _chunk(b"avih", avih),
+                 _list(b"strl", _chunk(b"strh", strh), _chunk(b"strf", strf)))
+    idx1 = _chunk(b"idx1", b"".join(index))
+    riff_size = 4 + len(hdrl) + 8 + movi_size + len(idx1)
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(b"RIFF" + struct.pack("<I", riff_size) + b"AVI " + hdrl)
+        f.write(b"LIST" + struct.pack("<I", movi_size) + b"movi")
+        for jpeg, size in zip(jpegs, sizes):
+            f.write(b"00dc" + struct.pack("<I", size))
+            f.write(jpeg)
+            if size % 2:
+                f.write(b"\0")
+        f.write(idx1)
+    os.replace(tmp, path)
+
+
+class ClipRecorder:
+    """Byte-capped ring buffer of a stream's JPEG frames, cut into clips.
+
+    ``stream`` is a ProfileStream. The recorder is a tap on its
+    broadcaster: it keeps the profile encoding, sharing each frame with the
+    viewers, but takes no viewer slot and is not counted as a viewer. The
+    ring never holds more than ``max_bytes`` of JPEG data: beyond that the
+    oldest frames are dropped even if a pending clip wanted them. At most
+    ``max_queued`` finished clips wait for the writer thread; further clips
+    are dropped. Listeners learn what became of every clip.
+    """
+
+    def __init__(self, stream, clips_dir, pre_secs=5.0, post_secs=10.0,
+                 max_bytes=32 * 1024 * 1024, max_clip_secs=60.0, max_queued=1):
+        self._stream = stream
+        self.clips_dir = clips_dir
+        self.pre_secs = pre_secs
+        self.post_secs = post_secs
+        self.max_bytes = max_bytes
+        self.max_clip_secs = max_clip_secs
+        self._ring = collections.deque()  # (wall time, jpeg memoryview)
+        self._ring_bytes = 0
+        self._pending = None  # {"entries", "start", "end"}
+        self._lock = threading.Lock()
+        self._jobs = queue.Queue(maxsize=max_queued)
+        self._listeners = []
+        self._stop = threading.Event()
+        self.clips_written = 0
+        self.clips_dropped = 0
+        self.frames_evicted = 0  # frames a pending clip lost to the byte cap
+
+    def add_listener(self, callback):
+        """Call ``callback(entry_ids, written)`` once a clip is written or dropped.
+
+        Each entry's clip is ``<entry id>_clip.avi``.
+        """
+        self._listeners.append(callback)
+
+    def start(self):
+        self._stream.broadcaster.add_tap(self._on_frame)
+        threading.Thread(target=self._write, name="clip-writer", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        self._stream.broadcaster.remove_tap(self._on_frame)
+
+    def trigger(self, entry_id, now=None):
+        """Start a clip for an event.
+
+        If a clip is still collecting its post-event frames, it is extended
+        (up to ``max_clip_secs``) and ``entry_id`` shares it instead.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            if self._pending is not None:
+                self._pending["end"] = min(now + self.post_secs,
+                                           self._pending["start"] + self.max_clip_secs)
+                self._pending["entries"].append(entry_id)
+                return
+            self._pending = {"entries": [entry_id], "start": now - self.pre_secs,
+                             "end": now + self.post_secs}
+
+    def _on_frame(self, jpeg, _captured):
+        # Runs in the capture thread, so it only appends a reference
+        self._add(time.time(), jpeg)
+
+    def _add(self, now, jpeg):
+        with self._lock:
+            if jpeg is not None:
+                self._ring.append((now, jpeg))
+                self._ring_bytes += jpeg.nbytes
+            pending = self._pending
+            keep_from = now - self.pre_secs
+            if pending is not None:
+                keep_from = min(keep_from, pending["start"])
+            while self._ring and (self._ring[0][0] < keep_from
+                                  or self._ring_bytes > self.max_bytes):
+                t, old = self._ring.popleft()
+                self._ring_bytes -= old.nbytes
+                if pending is not None and t >= pending["start"]:
+                    self.frames_evicted += 1
+            if pending is None or now < pending["end"]:
+                return
+            frames = [(t, j) for t, j in self._ring if t >= pending["start"]]
+            self._pending = None
+        try:
+            self._jobs.put_nowait((pending["entries"], frames))
+        except queue.Full:
+            self.clips_dropped += 1
+            self._notify(pending["entries"], False)
+
+    def _notify(self, entry_ids, written):
+        for callback in self._listeners:
+            try:
+                callback(entry_ids, written)
+            except Exception as exc:
+                print(f"Warning: clip listener failed ({exc})")
+
+    def _write(self):
+        p = self._stream.profile
+        while not self._stop.is_set():
+            try:
+                entry_ids, frames = self._jobs.get(timeout=1.0)
+            except queue.Empty:
+                # Without frames (camera stalled) a due clip is still finished
+                self._add(time.time(), None)
+                continue
+            written = False
+            if frames:
+                span = frames[-1][0] - frames[0][0]
+                fps = (len(frames) - 1) / span if span > 0 else p.max_fps
+                try:
+                    path = os.path.join(self.clips_dir, f"{entry_ids[0]}{CLIP_SUFFIX}")
+                    write_mjpeg_avi(path, [j for _, j in frames], p.width, p.height, fps)
+                    # Entries sharing the clip each get their own name for it, so
+                    # deleting one entry (or its retention) leaves the others' clip
+                    for entry_id in entry_ids[1:]:
+                        _link(path, os.path.join(self.clips_dir, f"{entry_id}{CLIP_SUFFIX}"))
+                    written = True
+                    self.clips_written += 1
+                except OSError as exc:
+                    print(f"Warning: could not write clip for {entry_ids[0]} ({exc})")
+            else:
+                self.clips_dropped += 1
+            self._notify(entry_ids, written)
+
+    def stats(self):
+        return {
+            "profile": self._stream.profile.name,
+            "buffered_frames": len(self._ring),
+            "buffered_bytes": self._ring_bytes,
+            "max_bytes": self.max_bytes,
+            "recording": self._pending is not None,
+            "clips_written": self.clips_written,
+            "clips_dropped": self.clips_dropped,
+            "frames_evicted": self.frames_evicted,
+        }
+
+
+def _link(src, dst):
+    """Hard-link ``dst`` to ``src``, or copy it where links are not supported."""
+    try:
+        os.remove(dst)
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
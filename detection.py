@@ -1,15 +1,21 @@
 """Object and face detection for the Pi camera stream.
 
 Face detection: OpenCV Haar cascades (built-in, no extra downloads).
-Object detection: YOLOv4-tiny on COCO (auto-downloaded ~23 MB on first run).
+Object detection: YOLOv4-tiny on COCO (auto-downloaded ~23 MB on first run),
+or another backend from OBJECT_BACKENDS.
 """
 
 import os
+import threading
+import time
 import urllib.request
+from collections import deque
 
 import cv2
 import numpy as np
 
+from metrics import registry
+
 MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
 
 _YOLO_WEIGHTS_URL = (
@@ -21,6 +27,9 @@ _YOLO_CFG_URL = (
 _COCO_NAMES_URL = (
     "https://raw.githubusercontent.com/pjreddie/darknet/master/data/coco.names"
 )
+_YOLOV5N_ONNX_URL = (
+    "https://github.com/ultralytics/yolov5/releases/download/v7.0/yolov5n.onnx"
+)
 
 # BGR colours matching the dashboard accent palette
 _FACE_COLOR = (255, 224, 74)  # cyan (#4ae0ff)
@@ -39,12 +48,23 @@ _PALETTE = [
 
 
 def _download(url, dest):
-    """Download a file if it doesn't already exist."""
+    """Download a file if it doesn't already exist.
+
+    The file only appears under its final name once complete, so an
+    interrupted download is retried on the next start instead of leaving
+    a truncated model behind.
+    """
     if os.path.exists(dest):
         return
     os.makedirs(os.path.dirname(dest), exist_ok=True)
     print(f"  Downloading {os.path.basename(dest)} ...")
-    urllib.request.urlretrieve(url, dest)
+    tmp = f"{dest}.part"
+    try:
+        urllib.request.urlretrieve(url, tmp)
+        os.replace(tmp, dest)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
     print(f"  Done: {os.path.basename(dest)}")
 
 
@@ -80,19 +100,108 @@ def _find_or_download_cascade():
     return local
 
 
+class LatencyWindow:
+    """Rolling window of per-frame latencies, in milliseconds."""
+
+    def __init__(self, size=100):
+        self._samples = deque(maxlen=size)
+
+    def add(self, ms):
+        self._samples.append(ms)
+
+    def summary(self):
+        """Return ``{"last", "p50", "p95", "samples"}``; values are None until measured."""
+        if not self._samples:
+            return {"last": None, "p50": None, "p95": None, "samples": 0}
+        p50, p95 = np.percentile(self._samples, [50, 95])
+        return {
+            "last": round(self._samples[-1], 2),
+            "p50": round(float(p50), 2),
+            "p95": round(float(p95), 2),
+            "samples": len(self._samples),
+        }
+
+
+def _detect_crops(detect_image, frame_bgr, regions=None, work_width=0):
+    """Run ``detect_image`` on the regions of ``frame_bgr``, at most ``work_width`` wide.
+
+    ``detect_image`` returns detections in the coordinates of the image it
+    is given; they are mapped back to frame coordinates here. With
+    ``regions`` (a regions.Regions) only their crops are searched and only
+    detections centred inside a region are kept.
+    """
+    h, w = frame_bgr.shape[:2]
+    crops = regions.crops(w, h) if regions else [(0, 0, w, h)]
+    results = []
+    for x1, y1, x2, y2 in crops:
+        image = frame_bgr[y1:y2, x1:x2]
+        scale = 1.0
+        if work_width and x2 - x1 > work_width:
+            scale = (x2 - x1) / work_width
+            image = cv2.resize(
+                image, (work_width, max(1, round((y2 - y1) / scale))),
+                interpolation=cv2.INTER_AREA,
+            )
+        for det in detect_image(image):
+            bx1, by1, bx2, by2 = det["box"]
+            det["box"] = (max(x1, x1 + round(bx1 * scale)), max(y1, y1 + round(by1 * scale)),
+                          min(x2, x1 + round(bx2 * scale)), min(y2, y1 + round(by2 * scale)))
+            results.append(det)
+    if regions:
+        results = [d for d in results if regions.contains(d["box"], w, h)]
+    return results
+
+
+_HAAR = registry.stage("haar")
+_YOLO_PREPROCESS = registry.stage("yolo_preprocess")
+_YOLO_FORWARD = registry.stage("yolo_forward")
+_YOLO_DECODE = registry.stage("yolo_decode")
+_NMS = registry.stage("nms")
+
+
+# Face detector backends: Haar cascade parameters
+FACE_BACKENDS = {
+    "haar": {"scale_factor": 1.15, "min_neighbors": 5, "min_size": 40},
+    # Coarser scale pyramid and larger minimum face: a few times faster
+    "haar-fast": {"scale_factor": 1.3, "min_neighbors": 5, "min_size": 60},
+}
+
+
 class FaceDetector:
-    """Haar-cascade frontal-face detector."""
+    """Haar-cascade frontal-face detector.
 
-    def __init__(self):
+    ``work_width`` (0 for none) downscales wider frames or regions before
+    the cascade runs; boxes are returned in frame coordinates either way.
+    """
+
+    def __init__(self, backend="haar", work_width=0):
+        if backend not in FACE_BACKENDS:
+            raise ValueError(
+                f"Unknown face backend '{backend}' (choose from {', '.join(FACE_BACKENDS)})"
+            )
+        self.backend = backend
+        self._params = FACE_BACKENDS[backend]
+        self.work_width = work_width
+        self.latency = LatencyWindow()
         path = _find_or_download_cascade()
         self._cascade = cv2.CascadeClassifier(path)
         if self._cascade.empty():
             raise FileNotFoundError(f"Failed to load Haar cascade from {path}")
 
-    def detect(self, frame_bgr):
-        gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+    def detect(self, frame_bgr, regions=None):
+        t0 = time.perf_counter()
+        results = _detect_crops(self._detect_image, frame_bgr, regions, self.work_width)
+        ms = (time.perf_counter() - t0) * 1e3
+        self.latency.add(ms)
+        _HAAR.observe(ms)
+        return results
+
+    def _detect_image(self, image_bgr):
+        p = self._params
+        gray = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY)
         rects = self._cascade.detectMultiScale(
-            gray, scaleFactor=1.15, minNeighbors=5, minSize=(40, 40),
+            gray, scaleFactor=p["scale_factor"], minNeighbors=p["min_neighbors"],
+            minSize=(p["min_size"], p["min_size"]),
         )
         return [
             {
@@ -104,32 +213,122 @@ class FaceDetector:
             for (x, y, w, h) in rects
         ]
 
+    def warm_up(self, frame_shape=(720, 1280, 3)):
+        """Run the cascade once on a blank frame so the first real pass is not slower."""
+        _detect_crops(self._detect_image, np.zeros(frame_shape, dtype=np.uint8),
+                      work_width=self.work_width)
+
+
+def _decode_yolo_outputs(outputs, w, h, conf_threshold):
+    """Turn raw YOLO output rows into pixel boxes, confidences and class ids.
+
+    All rows are decoded in one batch: argmax and the confidence mask run
+    over the concatenated outputs, and only the surviving rows are converted
+    to ``[x, y, w, h]`` boxes. Results are plain lists, ready for NMSBoxes.
+    """
+    rows = np.concatenate([o.reshape(-1, o.shape[-1]) for o in outputs])
+    scores = rows[:, 5:]
+    cids = np.argmax(scores, axis=1)
+    confs = scores[np.arange(len(rows)), cids].astype(np.float64)
+    keep = confs >= conf_threshold
+    if not keep.any():
+        return [], [], []
+
+    # Scale in float64, as float32 scalar * int did in the per-row loop;
+    # float32 rounds some products up to the next integer before truncation
+    xywh = rows[keep, :4].astype(np.float64)
+    cids, confs = cids[keep], confs[keep]
+    cx = (xywh[:, 0] * w).astype(np.int64)
+    cy = (xywh[:, 1] * h).astype(np.int64)
+    bw = (xywh[:, 2] * w).astype(np.int64)
+    bh = (xywh[:, 3] * h).astype(np.int64)
+    boxes = np.stack([cx - bw // 2, cy - bh // 2, bw, bh], axis=1)
+    return boxes.tolist(), confs.tolist(), cids.tolist()
+
+
+# Object detector backends. "darknet" models are the auto-downloaded
+# YOLOv4-tiny files at different input sizes; "onnx" models take
+# YOLOv5-style output (cx, cy, w, h in input pixels, objectness, class
+# scores). Files without a URL must be placed in MODELS_DIR by hand.
+OBJECT_BACKENDS = {
+    "yolov4-tiny": {"format": "darknet", "input_size": 416},
+    "yolov4-tiny-320": {"format": "darknet", "input_size": 320},
+    "yolov4-tiny-256": {"format": "darknet", "input_size": 256},
+    "yolov5n-onnx": {
+        "format": "onnx", "input_size": 640, "model": "yolov5n.onnx",
+        "url": _YOLOV5N_ONNX_URL,
+    },
+    # int8 quantized export of the same network (e.g. via onnxruntime's
+    # quantize_static); OpenCV's DNN module runs QDQ/QLinear models directly
+    "yolov5n-int8": {"format": "onnx", "input_size": 640, "model": "yolov5n-int8.onnx"},
+}
+
+
+def _normalize_yolov5_outputs(outputs, input_size):
+    """Convert YOLOv5 ONNX rows to the Darknet layout ``_decode_yolo_outputs`` expects.
+
+    Boxes become fractions of the input and class scores are multiplied by
+    objectness.
+    """
+    rows = np.concatenate([o.reshape(-1, o.shape[-1]) for o in outputs])
+    rows[:, :4] /= input_size
+    rows[:, 5:] *= rows[:, 4:5]
+    return [rows]
+
 
 class ObjectDetector:
-    """YOLOv4-tiny object detector (80 COCO classes).
+    """YOLO object detector (80 COCO classes).
 
-    Model files are auto-downloaded to ./models/ on first instantiation.
+    The model is picked from OBJECT_BACKENDS. Darknet model files are
+    auto-downloaded to ./models/ on first instantiation. ``input_size``
+    overrides the backend's network resolution (Darknet models only, a
+    multiple of 32).
     """
 
-    def __init__(self, conf_threshold=0.45, nms_threshold=0.4):
+    def __init__(self, conf_threshold=0.45, nms_threshold=0.4, backend="yolov4-tiny",
+                 input_size=None):
+        if backend not in OBJECT_BACKENDS:
+            raise ValueError(
+                f"Unknown object backend '{backend}' (choose from {', '.join(OBJECT_BACKENDS)})"
+            )
+        self.backend = backend
+        self._spec = OBJECT_BACKENDS[backend]
+        if input_size:
+            if self._spec["format"] != "darknet" or input_size % 32:
+                raise ValueError(
+                    f"Input size {input_size} not supported by {backend} "
+                    "(Darknet backends only, multiple of 32)"
+                )
+            self._input_size = input_size
+        else:
+            self._input_size = self._spec["input_size"]
         self._conf = conf_threshold
         self._nms = nms_threshold
         self._net = None
         self._labels = []
         self._out_layers = []
+        self.latency = LatencyWindow()
         self._load()
 
     def _load(self):
-        weights = os.path.join(MODELS_DIR, "yolov4-tiny.weights")
-        cfg = os.path.join(MODELS_DIR, "yolov4-tiny.cfg")
         names = os.path.join(MODELS_DIR, "coco.names")
 
-        print("Loading YOLOv4-tiny model ...")
-        _download(_YOLO_WEIGHTS_URL, weights)
-        _download(_YOLO_CFG_URL, cfg)
+        print(f"Loading {self.backend} model ...")
         _download(_COCO_NAMES_URL, names)
+        if self._spec["format"] == "onnx":
+            model = os.path.join(MODELS_DIR, self._spec["model"])
+            if "url" in self._spec:
+                _download(self._spec["url"], model)
+            if not os.path.isfile(model):
+                raise FileNotFoundError(f"Model file not found: {model}")
+            self._net = cv2.dnn.readNetFromONNX(model)
+        else:
+            weights = os.path.join(MODELS_DIR, "yolov4-tiny.weights")
+            cfg = os.path.join(MODELS_DIR, "yolov4-tiny.cfg")
+            _download(_YOLO_WEIGHTS_URL, weights)
+            _download(_YOLO_CFG_URL, cfg)
+            self._net = cv2.dnn.readNetFromDarknet(cfg, weights)
 
-        self._net = cv2.dnn.readNetFromDarknet(cfg, weights)
         self._net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
         self._net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
         self._out_layers = self._net.getUnconnectedOutLayersNames()
@@ -138,31 +337,44 @@ class ObjectDetector:
             self._labels = [line.strip() for line in f if line.strip()]
         print(f"  Model ready — {len(self._labels)} COCO classes")
 
-    def detect(self, frame_bgr):
-        h, w = frame_bgr.shape[:2]
+    def warm_up(self):
+        """Run one forward pass on a blank input.
+
+        OpenCV allocates the network's buffers and prepares its layers on
+        the first forward, which makes it several times slower than the
+        rest; doing it here keeps that out of the first real detection.
+        """
+        size = self._input_size
+        self._net.setInput(np.zeros((1, 3, size, size), dtype=np.float32))
+        self._net.forward(self._out_layers)
+
+    def detect(self, frame_bgr, regions=None):
+        t0 = time.perf_counter()
+        results = _detect_crops(self._detect_image, frame_bgr, regions)
+        self.latency.add((time.perf_counter() - t0) * 1e3)
+        return results
+
+    def _detect_image(self, image_bgr):
+        h, w = image_bgr.shape[:2]
+        size = self._input_size
+        t = registry.clock()
         blob = cv2.dnn.blobFromImage(
-            frame_bgr, 1 / 255.0, (416, 416), swapRB=True, crop=False,
+            image_bgr, 1 / 255.0, (size, size), swapRB=True, crop=False,
         )
         self._net.setInput(blob)
+        _YOLO_PREPROCESS.since(t)
+        t = registry.clock()
         outputs = self._net.forward(self._out_layers)
-
-        boxes, confs, cids = [], [], []
-        for out in outputs:
-            for row in out:
-                scores = row[5:]
-                cid = int(np.argmax(scores))
-                conf = float(scores[cid])
-                if conf < self._conf:
-                    continue
-                cx = int(row[0] * w)
-                cy = int(row[1] * h)
-                bw = int(row[2] * w)
-                bh = int(row[3] * h)
-                boxes.append([cx - bw // 2, cy - bh // 2, bw, bh])
-                confs.append(conf)
-                cids.append(cid)
-
+        _YOLO_FORWARD.since(t)
+        t = registry.clock()
+        if self._spec["format"] == "onnx":
+            outputs = _normalize_yolov5_outputs(outputs, size)
+
+        boxes, confs, cids = _decode_yolo_outputs(outputs, w, h, self._conf)
+        _YOLO_DECODE.since(t)
+        t = registry.clock()
         indices = cv2.dnn.NMSBoxes(boxes, confs, self._conf, self._nms)
+        _NMS.since(t)
         results = []
         if len(indices) > 0:
             for i in indices.flatten():
@@ -178,39 +390,308 @@ class ObjectDetector:
         return results
 
 
+def _draw_detection_shapes(image, det, color):
+    """Draw one detection's box, corner accents and label background.
+
+    Returns the label text and its origin. The text itself always lands
+    inside the label background, so these shapes cover every pixel that
+    ``draw_detections`` touches.
+    """
+    fh, fw = image.shape[:2]
+    x1, y1, x2, y2 = det["box"]
+    x1, y1 = max(0, x1), max(0, y1)
+    x2, y2 = min(fw - 1, x2), min(fh - 1, y2)
+
+    cv2.rectangle(image, (x1, y1), (x2, y2), color, 2)
+
+    # Corner accents for a modern look
+    cl = min(18, abs(x2 - x1) // 4, abs(y2 - y1) // 4)
+    if cl > 4:
+        for cx, cy, dx, dy in [
+            (x1, y1, 1, 1), (x2, y1, -1, 1),
+            (x1, y2, 1, -1), (x2, y2, -1, -1),
+        ]:
+            cv2.line(image, (cx, cy), (cx + dx * cl, cy), color, 3)
+            cv2.line(image, (cx, cy), (cx, cy + dy * cl), color, 3)
+
+    # Label text
+    conf = det["confidence"]
+    text = f"{det['label']} {conf:.0%}" if conf < 1.0 else det["label"]
+    (tw, th), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.55, 1)
+
+    # Keep label inside the frame
+    ly = max(y1, th + 10)
+    # Descenders reach ``baseline`` below the text origin, plus 1 px of
+    # anti-aliasing
+    bottom = max(ly, ly - 4 + baseline + 1)
+    cv2.rectangle(image, (x1, ly - th - 8), (x1 + tw + 10, bottom), color, -1)
+    return text, (x1 + 5, ly - 4)
+
+
 def draw_detections(frame_bgr, detections):
     """Overlay bounding boxes with labels onto the frame (in-place)."""
-    fh, fw = frame_bgr.shape[:2]
-
     for det in detections:
-        x1, y1, x2, y2 = det["box"]
-        x1, y1 = max(0, x1), max(0, y1)
-        x2, y2 = min(fw - 1, x2), min(fh - 1, y2)
-        color = det["color"]
-
-        cv2.rectangle(frame_bgr, (x1, y1), (x2, y2), color, 2)
-
-        # Corner accents for a modern look
-        cl = min(18, abs(x2 - x1) // 4, abs(y2 - y1) // 4)
-        if cl > 4:
-            for cx, cy, dx, dy in [
-                (x1, y1, 1, 1), (x2, y1, -1, 1),
-                (x1, y2, 1, -1), (x2, y2, -1, -1),
-            ]:
-                cv2.line(frame_bgr, (cx, cy), (cx + dx * cl, cy), color, 3)
-                cv2.line(frame_bgr, (cx, cy), (cx, cy + dy * cl), color, 3)
-
-        # Label text
-        conf = det["confidence"]
-        text = f"{det['label']} {conf:.0%}" if conf < 1.0 else det["label"]
-        (tw, th), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.55, 1)
-
-        # Keep label inside the frame
-        ly = max(y1, th + 10)
-        cv2.rectangle(
-            frame_bgr, (x1, ly - th - 8), (x1 + tw + 10, ly), color, -1,
-        )
+        text, origin = _draw_detection_shapes(frame_bgr, det, det["color"])
         cv2.putText(
-            frame_bgr, text, (x1 + 5, ly - 4),
+            frame_bgr, text, origin,
             cv2.FONT_HERSHEY_SIMPLEX, 0.55, (0, 0, 0), 1, cv2.LINE_AA,
         )
+
+
+def draw_detections_luma(luma, detections, scale=1.0):
+    """Overlay detections onto the Y plane of a YUV frame (in-place).
+
+    For frames that never exist in BGR, such as the camera's main stream on
+    its way to the hardware encoder. Boxes are multiplied by ``scale`` and
+    each colour becomes its brightness.
+    """
+    for det in detections:
+        b, g, r = det["color"]
+        box = [int(round(v * scale)) for v in det["box"]]
+        text, origin = _draw_detection_shapes(
+            luma, dict(det, box=box), int(0.114 * b + 0.587 * g + 0.299 * r),
+        )
+        cv2.putText(luma, text, origin, cv2.FONT_HERSHEY_SIMPLEX, 0.55, 0, 1, cv2.LINE_AA)
+
+
+class DetectionOverlay:
+    """Cached raster of ``draw_detections`` output for a set of detections.
+
+    The boxes and labels are drawn once per detection update onto an
+    off-screen layer, along with a mask of the pixels they cover. Each frame
+    then only needs a masked copy instead of a full redraw. Output is
+    pixel-identical to calling ``draw_detections``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dets = None
+        self._shape = None
+        self._layer = None
+        self._mask = None
+
+    def _rasterize(self, shape, detections):
+        # The canvases are reused across updates to avoid page-faulting a
+        # fresh frame-sized buffer each time.
+        if shape != self._shape:
+            self._layer = np.empty(shape, dtype=np.uint8)
+            self._mask = np.empty(shape[:2], dtype=np.uint8)
+            self._shape = shape
+        self._layer.fill(0)
+        self._mask.fill(0)
+        draw_detections(self._layer, detections)
+        for det in detections:
+            _draw_detection_shapes(self._mask, det, 255)
+        self._dets = detections
+
+    def composite(self, frame_bgr, detections, out=None):
+        """Return ``frame_bgr`` with ``detections`` drawn on it.
+
+        The input frame is never modified. With no detections the frame is
+        returned as-is; otherwise the result is written to ``out`` (a
+        reusable buffer of the same shape) or to a new array.
+
+        The frame is copied to ``out`` whole. Every call gets a new capture
+        whose pixels all differ from the one ``out`` holds, and the capture
+        is shared read-only through the raw frame bus (detection, clips and
+        snapshots read it concurrently), so it can't be drawn on in place.
+        """
+        if not detections:
+            return frame_bgr
+        if out is None:
+            out = np.empty_like(frame_bgr)
+        np.copyto(out, frame_bgr)
+        with self._lock:
+            if detections is not self._dets or frame_bgr.shape != self._shape:
+                self._rasterize(frame_bgr.shape, detections)
+            return cv2.copyTo(self._layer, self._mask, out)
+
+
+class MotionGate:
+    """Cheap motion pre-filter that decides when the detectors should run.
+
+    Each frame is downscaled to a small grayscale image and compared against
+    a running-average background. While motion was seen within the last
+    ``hold_secs`` the gate is ``active`` and every frame is let through;
+    otherwise it is ``idle`` and only one keep-alive frame passes every
+    ``keepalive_secs``.
+    """
+
+    def __init__(self, size=(160, 90), threshold=25, min_area=0.002,
+                 hold_secs=10.0, keepalive_secs=5.0, learning_rate=0.05):
+        self._size = size
+        self._threshold = threshold
+        self._min_pixels = max(1, int(min_area * size[0] * size[1]))
+        self._hold = hold_secs
+        self._keepalive = keepalive_secs
+        self._alpha = learning_rate
+        self._background = None
+        self._last_motion = float("-inf")
+        self._last_run = float("-inf")
+        self.motion_pixels = 0
+        self.skipped = 0
+
+    @property
+    def mode(self):
+        return "active" if time.monotonic() - self._last_motion < self._hold else "idle"
+
+    def hold(self, now=None):
+        """Stay active as if motion was just seen (e.g. a person is in view)."""
+        self._last_motion = time.monotonic() if now is None else now
+
+    def _detect_motion(self, frame_bgr):
+        small = cv2.resize(frame_bgr, self._size, interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        if self._background is None:
+            self._background = gray.astype(np.float32)
+            return True
+
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self._background))
+        _, moving = cv2.threshold(diff, self._threshold, 255, cv2.THRESH_BINARY)
+        self.motion_pixels = cv2.countNonZero(moving)
+        cv2.accumulateWeighted(gray, self._background, self._alpha)
+        return self.motion_pixels >= self._min_pixels
+
+    def should_detect(self, frame_bgr, now=None):
+        """Return True if the detectors should run on this frame."""
+        now = time.monotonic() if now is None else now
+        if self._detect_motion(frame_bgr):
+            self._last_motion = now
+        if now - self._last_motion < self._hold or now - self._last_run >= self._keepalive:
+            self._last_run = now
+            return True
+        self.skipped += 1
+        return False
+
+
+def _iou_matrix(a, b):
+    """Pairwise IoU between two (N, 4) and (M, 4) arrays of x1, y1, x2, y2 boxes."""
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 4)
+    ix1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    iy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    ix2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    iy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+class _Track:
+    __slots__ = ("id", "det", "box", "velocity", "updated", "hits", "misses")
+
+    def __init__(self, track_id, det, now):
+        self.id = track_id
+        self.det = det
+        self.box = np.array(det["box"], dtype=np.float64)
+        self.velocity = np.zeros(4)
+        self.updated = now
+        self.hits = 1
+        self.misses = 0
+
+    def predict(self, now, max_predict):
+        return self.box + self.velocity * min(now - self.updated, max_predict)
+
+
+class DetectionTracker:
+    """Carries detections across frames so the detectors can run less often.
+
+    Detector results are associated with existing tracks by IoU (per label).
+    Matched tracks snap to the detected box and update a constant-velocity
+    estimate, which is used to move the boxes on the frames in between
+    detector passes. Every track keeps a stable ``track_id``.
+    """
+
+    def __init__(self, detect_every=5, iou_threshold=0.3, max_age_secs=1.5,
+                 min_hits=2, smoothing=0.5, max_predict_secs=0.5):
+        self.detect_every = detect_every
+        self._iou = iou_threshold
+        self._max_age = max_age_secs
+        self._min_hits = min_hits
+        self._smoothing = smoothing
+        self._max_predict = max_predict_secs
+        self._tracks = []
+        self._next_id = 1
+        self._frames_since_detect = 0
+        self._last_output = []
+
+    def needs_detection(self):
+        """True if the next frame should go through the real detectors.
+
+        That is every ``detect_every`` frames, and on every frame while there
+        is nothing to track or some track is unconfirmed or was just missed.
+        """
+        self._frames_since_detect += 1
+        if self._frames_since_detect >= self.detect_every or not self._tracks:
+            return True
+        return any(t.misses or t.hits < self._min_hits for t in self._tracks)
+
+    def is_confirmed(self, det):
+        """True once a track has been matched in ``min_hits`` detector passes."""
+        return det.get("hits", 0) >= self._min_hits
+
+    def update(self, detections, now=None):
+        """Fold in a detector pass and return the current tracked detections."""
+        now = time.monotonic() if now is None else now
+        self._frames_since_detect = 0
+
+        unmatched = set(range(len(detections)))
+        matched = set()
+        if self._tracks and detections:
+            predicted = [t.predict(now, self._max_predict) for t in self._tracks]
+            iou = _iou_matrix(predicted, [d["box"] for d in detections])
+            for ti, t in enumerate(self._tracks):
+                for di, d in enumerate(detections):
+                    if d["label"] != t.det["label"]:
+                        iou[ti, di] = 0.0
+            for ti, di in zip(*np.unravel_index(np.argsort(-iou, axis=None), iou.shape)):
+                if iou[ti, di] < self._iou:
+                    break
+                if di not in unmatched or ti in matched:
+                    continue
+                self._match(self._tracks[ti], detections[di], now)
+                unmatched.discard(di)
+                matched.add(ti)
+
+        for ti, t in enumerate(self._tracks):
+            if ti not in matched:
+                t.misses += 1
+        self._tracks = [t for t in self._tracks if now - t.updated <= self._max_age]
+
+        for di in sorted(unmatched):
+            self._tracks.append(_Track(self._next_id, detections[di], now))
+            self._next_id += 1
+        return self._output(now)
+
+    def predict(self, now=None):
+        """Return the tracked detections moved to their predicted position."""
+        return self._output(time.monotonic() if now is None else now)
+
+    def _match(self, track, det, now):
+        box = np.array(det["box"], dtype=np.float64)
+        dt = now - track.updated
+        if dt > 0:
+            measured = (box - track.box) / dt
+            if track.hits == 1:
+                track.velocity = measured
+            else:
+                track.velocity += self._smoothing * (measured - track.velocity)
+        track.box = box
+        track.det = det
+        track.updated = now
+        track.hits += 1
+        track.misses = 0
+
+    def _output(self, now):
+        out = []
+        for t in self._tracks:
+            box = tuple(int(round(v)) for v in t.predict(now, self._max_predict))
+            out.append({**t.det, "box": box, "track_id": t.id, "hits": t.hits})
+        # Hand back the previous list when nothing moved, so consumers that
+        # cache by identity (DetectionOverlay) don't redraw
+        if out == self._last_output:
+            return self._last_output
+        self._last_output = out
+        return out
@@ -0,0 +1,200 @@
+"""Run the face/object detectors in a separate worker process.
+
+Capture, JPEG encoding and Flask all share one interpreter; running the
+detectors in their own process keeps YOLO inference and its Python
+post-processing off that GIL. Frames are handed over through a ring of
+``multiprocessing.shared_memory`` slots rather than being pickled, and only
+the (small) detection lists come back over a queue.
+"""
+
+import itertools
+import multiprocessing as mp
+import queue
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from detection import FaceDetector, LatencyWindow, ObjectDetector
+from metrics import registry
+
+# fork: the first worker starts before the server opens the camera or starts
+# any thread, so it inherits nothing it should not hold and is ready at once
+_ctx = mp.get_context("fork")
+# A restart happens while the capture, server and storage threads run; a
+# forked child could inherit locks they hold and the camera's handles, so the
+# replacement starts from a fresh interpreter instead
+_restart_ctx = mp.get_context("spawn")
+
+
+def _worker_main(shm, slot_bytes, requests, results, face_backend, object_backend,
+                 face_work_width, object_input_size, load_objects):
+    """Worker process entry point: load the detectors, then serve requests."""
+    # Stage timings go back with each result instead of into this copy
+    registry.buffer()
+    face_detector = None
+    try:
+        face_detector = FaceDetector(backend=face_backend, work_width=face_work_width)
+        face_detector.warm_up()
+    except Exception as exc:
+        print(f"Warning: face detection unavailable ({exc})")
+    object_detector = None
+    if load_objects:
+        try:
+            object_detector = ObjectDetector(backend=object_backend, input_size=object_input_size)
+            object_detector.warm_up()
+        except Exception as exc:
+            print(f"Warning: object detection unavailable ({exc})")
+            object_detector = None
+    results.put(("ready", {"faces": face_detector is not None,
+                           "objects": object_detector is not None}))
+
+    while True:
+        req = requests.get()
+        if req is None:
+            break
+        ticket, slot, shape, faces, objects, regions = req
+        frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf,
+                           offset=slot * slot_bytes)
+        dets = []
+        latency = {}
+        try:
+            if faces and face_detector is not None:
+                t0 = time.perf_counter()
+                dets.extend(face_detector.detect(frame, regions))
+                latency["faces"] = (time.perf_counter() - t0) * 1e3
+            if objects and object_detector is not None:
+                t0 = time.perf_counter()
+                dets.extend(object_detector.detect(frame, regions))
+                latency["objects"] = (time.perf_counter() - t0) * 1e3
+        except Exception as exc:
+            print(f"Warning: detection failed in worker ({exc})")
+        results.put((ticket, dets, latency, registry.drain()))
+    shm.close()
+
+
+class DetectionWorker:
+    """Face/object detection served by a child process.
+
+    ``detect`` has the same contract as calling the detectors directly; the
+    calling thread just blocks (without holding the GIL) while the worker
+    runs. ``slots`` frames can be in flight at once via ``submit``/``result``.
+
+    The constructor only forks the worker; it loads its models in the
+    background. ``wait_ready`` blocks until they are loaded, and the first
+    ``submit`` waits for it. With ``objects=False`` the object model is
+    never loaded (nor downloaded).
+    """
+
+    def __init__(self, frame_shape=(720, 1280, 3), slots=2, ready_timeout=300,
+                 face_backend="haar", object_backend="yolov4-tiny",
+                 face_work_width=0, object_input_size=None, objects=True):
+        self._slot_bytes = int(np.prod(frame_shape))
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=self._slot_bytes * slots,
+        )
+        self._slot_iter = itertools.cycle(range(slots))
+        self._tickets = itertools.count(1)
+        self._ready_timeout = ready_timeout
+        self.face_backend = face_backend
+        self.object_backend = object_backend
+        self.face_work_width = face_work_width
+        self.object_input_size = object_input_size
+        self.load_objects = objects
+        self.latency = {"faces": LatencyWindow(), "objects": LatencyWindow()}
+        self._process = None
+        self._pending = {}
+        self._abandoned = set()  # tickets whose result() timed out
+        self.ready = False
+        self.faces_available = False
+        self.objects_available = False
+        self._start()
+
+    def _start(self, ctx=_ctx):
+        self._requests = ctx.Queue()
+        self._results = ctx.Queue()
+        self._pending.clear()
+        self._abandoned.clear()
+        self._process = ctx.Process(
+            target=_worker_main,
+            args=(self._shm, self._slot_bytes, self._requests, self._results,
+                  self.face_backend, self.object_backend,
+                  self.face_work_width, self.object_input_size, self.load_objects),
+            name="detection-worker",
+            daemon=True,
+        )
+        self._process.start()
+        self.ready = False
+
+    def wait_ready(self, timeout=None):
+        """Wait until the worker has loaded its models; returns False on timeout."""
+        if not self.ready:
+            try:
+                _, info = self._results.get(
+                    timeout=self._ready_timeout if timeout is None else timeout,
+                )
+            except queue.Empty:
+                return False
+            self.faces_available = info["faces"]
+            self.objects_available = info["objects"]
+            self.ready = True
+        return True
+
+    def submit(self, frame_bgr, faces=True, objects=True, regions=None):
+        """Copy a frame into the next shared-memory slot and queue it.
+
+        Returns a ticket for ``result``. The slot is reused after ``slots``
+        more submissions, so collect results before then.
+        """
+        if frame_bgr.nbytes > self._slot_bytes:
+            raise ValueError(
+                f"Frame of {frame_bgr.nbytes} bytes exceeds the "
+                f"{self._slot_bytes}-byte shared-memory slot"
+            )
+        if not self._process.is_alive():
+            print("Warning: detection worker died, restarting it")
+            self._start(_restart_ctx)
+        if not self.wait_ready():
+            raise TimeoutError("Detection worker did not finish loading its models")
+        slot = next(self._slot_iter)
+        view = np.ndarray(frame_bgr.shape, dtype=np.uint8, buffer=self._shm.buf,
+                          offset=slot * self._slot_bytes)
+        np.copyto(view, frame_bgr)
+        ticket = next(self._tickets)
+        self._requests.put((ticket, slot, frame_bgr.shape, faces, objects, regions))
+        return ticket
+
+    def result(self, ticket, timeout=30.0):
+        """Wait for the detections of a submitted frame.
+
+        On timeout the ticket is given up: its result is discarded if it
+        arrives later.
+        """
+        while ticket not in self._pending:
+            try:
+                got, dets, latency, stages = self._results.get(timeout=timeout)
+            except queue.Empty:
+                self._abandoned.add(ticket)
+                raise TimeoutError("Detection worker did not respond") from None
+            for name, ms in latency.items():
+                self.latency[name].add(ms)
+            registry.replay(stages)
+            if got in self._abandoned:
+                self._abandoned.discard(got)
+            else:
+                self._pending[got] = dets
+        return self._pending.pop(ticket)
+
+    def detect(self, frame_bgr, faces=True, objects=True, regions=None):
+        """Run the enabled detectors on one frame in the worker process."""
+        return self.result(self.submit(frame_bgr, faces, objects, regions))
+
+    def close(self):
+        """Stop the worker and release the shared memory."""
+        if self._process is not None and self._process.is_alive():
+            self._requests.put(None)
+            self._process.join(timeout=5)
+            if self._process.is_alive():
+                self._process.terminate()
+        self._shm.close()
+        self._shm.unlink()
@@ -6,237 +6,198 @@ Streams video from a connected Raspberry Pi camera via MJPEG with
 optional face/object detection overlays.
 """
 
-import json
+import argparse
 import os
 import time
+import urllib.parse
 import uuid
-import threading
 from datetime import datetime
 
-import cv2
-import board
-import adafruit_dht
-from flask import Flask, jsonify, request, Response, send_from_directory
-from picamera2 import Picamera2
-
-from detection import FaceDetector, ObjectDetector, draw_detections
-
-dht_device = adafruit_dht.DHT22(board.D17)
-
-FRONTEND_DIR = os.path.join(os.path.dirname(__file__), "frontend", "dist")
-SNAPSHOTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots")
-ACCESS_LOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "access_log.json")
-
-os.makedirs(SNAPSHOTS_DIR, exist_ok=True)
-
-app = Flask(__name__, static_folder=FRONTEND_DIR, static_url_path="")
-
-# --- Camera streaming setup ---
-
-camera = Picamera2()
-camera_config = camera.create_video_configuration(
-    main={"size": (1280, 720), "format": "RGB888"},
+from flask import (
+    Blueprint, Flask, Response, copy_current_request_context, current_app, jsonify,
+    request, send_from_directory,
 )
-camera.configure(camera_config)
-camera.start()
+from werkzeug.exceptions import NotFound
 
-# --- Detection setup ---
+from aggregator import Aggregator, NodeError
+from events import SubscriberLimitError, format_event
+from hardware import CAMERA_SIZE
+from image_cache import MAX_WIDTH as MAX_IMAGE_WIDTH, MIN_WIDTH as MIN_IMAGE_WIDTH
+from metrics import registry as metrics_registry
+from monitor import Monitor
+from snapshot_writer import THUMBNAIL_SUFFIX
+from streaming import ViewerLimitError
 
-face_detector = FaceDetector()
-try:
-    object_detector = ObjectDetector()
-except Exception as exc:
-    print(f"Warning: object detection unavailable ({exc})")
-    object_detector = None
-
-# Shared state — reference swaps are atomic under the GIL
-_latest_frame = None   # JPEG bytes (for streaming)
-_raw_frame = None      # BGR numpy array (for detection thread)
-_latest_detections = []
-_detection_state = {"faces": True, "objects": True}
+FRONTEND_DIR = os.path.join(os.path.dirname(__file__), "frontend", "dist")
+# Where snapshots and databases go; defaults to this directory
+DATA_DIR = os.environ.get("DATA_DIR", os.path.dirname(os.path.abspath(__file__)))
+SNAPSHOTS_DIR = os.path.join(DATA_DIR, "snapshots")
+ACCESS_LOG_FILE = os.path.join(DATA_DIR, "access_log.db")
+# Pre-SQLite access log, imported into ACCESS_LOG_FILE once on startup
+LEGACY_ACCESS_LOG_FILE = os.path.join(DATA_DIR, "access_log.json")
+HISTORY_DB_FILE = os.path.join(DATA_DIR, "sensor_history.db")
+# Detection regions of interest, set through /detection/regions
+REGIONS_FILE = os.path.join(DATA_DIR, "detection_regions.json")
+# Alert rules, set through /alerts/rules
+ALERT_RULES_FILE = os.path.join(DATA_DIR, "alert_rules.json")
+# Alerts are POSTed here in JSON batches; empty only publishes them on /events
+ALERT_WEBHOOK_URL = os.environ.get("ALERT_WEBHOOK_URL", "")
+
+# "dev" is Flask's threaded development server; "gevent" serves every
+# client from a greenlet (see gevent_server.py)
+SERVER_MODE = os.environ.get("SERVER_MODE", "dev")
+# "1" replaces the camera and DHT22 with the fakes in hardware.py
+FAKE_HARDWARE = os.environ.get("FAKE_HARDWARE", "0") == "1"
+# Camera and sensor source: the hardware ("picamera", "dht22"; "picamera-hw"
+# JPEG-encodes the full-size stream on the GPU, see hardware.py), the fakes
+# ("synthetic") or the path of a recording to replay (a video file or image
+# directory; a CSV of readings). Empty follows FAKE_HARDWARE
+CAMERA_SOURCE = os.environ.get("CAMERA_SOURCE", "")
+SENSOR_SOURCE = os.environ.get("SENSOR_SOURCE", "")
+
+# Cap on /video_feed viewers per stream profile; with the dev server each
+# one holds a server thread
+MAX_STREAM_VIEWERS = int(os.environ.get("MAX_STREAM_VIEWERS", "10"))
+# Cap on /events subscribers, likewise
+MAX_EVENT_SUBSCRIBERS = int(os.environ.get("MAX_EVENT_SUBSCRIBERS", "64"))
+
+# "thread" runs the detectors in this process; "process" runs them in a
+# worker process so inference does not compete for the GIL
+DETECTION_MODE = os.environ.get("DETECTION_MODE", "thread")
+# Seconds between background DHT22 reads (the sensor needs at least 2)
+SENSOR_INTERVAL_SECS = float(os.environ.get("SENSOR_INTERVAL_SECS", "3"))
+# Days of full-resolution history to keep; rollups are kept forever
+HISTORY_RAW_DAYS = int(os.environ.get("HISTORY_RAW_DAYS", "30"))
+
+# What to do with a person event when the snapshot writer is backed up:
+# "coalesce" folds it into the newest queued event, "drop" discards it
+SNAPSHOT_QUEUE_POLICY = os.environ.get("SNAPSHOT_QUEUE_POLICY", "coalesce")
+
+# Access log retention; 0 disables a limit. Oldest entries (and their
+# snapshots) are removed first
+RETENTION_MAX_AGE_DAYS = float(os.environ.get("RETENTION_MAX_AGE_DAYS", "30"))
+RETENTION_MAX_MB = float(os.environ.get("RETENTION_MAX_MB", "1024"))
+RETENTION_MAX_ENTRIES = int(os.environ.get("RETENTION_MAX_ENTRIES", "0"))
+
+# Person events get a clip of the stream profile's frames from
+# CLIP_PRE_SECS before to CLIP_POST_SECS after; empty CLIP_PROFILE disables
+CLIP_PROFILE = os.environ.get("CLIP_PROFILE", "medium")
+CLIP_PRE_SECS = float(os.environ.get("CLIP_PRE_SECS", "5"))
+CLIP_POST_SECS = float(os.environ.get("CLIP_POST_SECS", "10"))
+CLIP_BUFFER_MB = float(os.environ.get("CLIP_BUFFER_MB", "32"))
+
+# "0" turns off the per-stage timings and counters behind /metrics
+METRICS_ENABLED = os.environ.get("METRICS", "1") == "1"
+
+# Detector backends, see FACE_BACKENDS / OBJECT_BACKENDS in detection.py
+FACE_BACKEND = os.environ.get("FACE_BACKEND", "haar")
+OBJECT_BACKEND = os.environ.get("OBJECT_BACKEND", "yolov4-tiny")
+# Resized snapshot variants (/access-logs/<id>/image?w=) are cached here,
+# least recently served removed first once over IMAGE_CACHE_MB
+IMAGE_CACHE_DIR = os.path.join(DATA_DIR, "image_cache")
+IMAGE_CACHE_MB = float(os.environ.get("IMAGE_CACHE_MB", "64"))
+
+# Per-detector working resolution: faces are searched on frames (or
+# regions) downscaled to at most FACE_WORK_WIDTH pixels wide; YOLO runs at
+# OBJECT_INPUT_SIZE (Darknet backends, multiple of 32). 0 keeps the default
+FACE_WORK_WIDTH = int(os.environ.get("FACE_WORK_WIDTH", "0"))
+OBJECT_INPUT_SIZE = int(os.environ.get("OBJECT_INPUT_SIZE", "0"))
+
+# Aggregator mode: serve one API over these monitors instead of local
+# hardware. Space- or comma-separated NAME=URL (or just URL) entries
+AGGREGATE_NODES = os.environ.get("AGGREGATE_NODES", "")
+# Seconds to wait for a node before reporting it unavailable
+NODE_TIMEOUT_SECS = float(os.environ.get("NODE_TIMEOUT_SECS", "5"))
+
+_DEFAULT_PROFILE = "full"
+# Part of every /snapshot ETag, so tags from before a restart (when frame
+# sequence numbers start over) never match
+_INSTANCE_TAG = uuid.uuid4().hex[:8]
+# Access log files never change once their entry exists
+_IMMUTABLE = "public, max-age=31536000, immutable"
+
+api = Blueprint("api", __name__)
+# Routes of the aggregator mode
+aggregate = Blueprint("aggregate", __name__)
+
+
+def create_monitor(camera_source="picamera", sensor_source="dht22"):
+    """Build (but do not start) a Monitor from the environment configuration."""
+    return Monitor(
+        SNAPSHOTS_DIR, ACCESS_LOG_FILE, HISTORY_DB_FILE, REGIONS_FILE,
+        legacy_access_log_file=LEGACY_ACCESS_LOG_FILE,
+        camera_source=camera_source,
+        sensor_source=sensor_source,
+        detection_mode=DETECTION_MODE,
+        face_backend=FACE_BACKEND,
+        object_backend=OBJECT_BACKEND,
+        face_work_width=FACE_WORK_WIDTH,
+        object_input_size=OBJECT_INPUT_SIZE or None,
+        max_stream_viewers=MAX_STREAM_VIEWERS,
+        max_event_subscribers=MAX_EVENT_SUBSCRIBERS,
+        sensor_interval=SENSOR_INTERVAL_SECS,
+        history_raw_days=HISTORY_RAW_DAYS,
+        snapshot_queue_policy=SNAPSHOT_QUEUE_POLICY,
+        retention_max_age_days=RETENTION_MAX_AGE_DAYS,
+        retention_max_bytes=int(RETENTION_MAX_MB * 1024 * 1024),
+        retention_max_entries=RETENTION_MAX_ENTRIES,
+        clip_profile=CLIP_PROFILE,
+        clip_pre_secs=CLIP_PRE_SECS,
+        clip_post_secs=CLIP_POST_SECS,
+        clip_buffer_bytes=int(CLIP_BUFFER_MB * 1024 * 1024),
+        image_cache_dir=IMAGE_CACHE_DIR,
+        image_cache_bytes=int(IMAGE_CACHE_MB * 1024 * 1024),
+        alert_rules_file=ALERT_RULES_FILE,
+        alert_webhook_url=ALERT_WEBHOOK_URL,
+    )
 
-_frame_lock = threading.Lock()
 
-# --- Access log for person detection ---
+def create_app(monitor):
+    """Flask app serving the dashboard and API from ``monitor``.
 
-_PERSON_LABELS = {"person", "Face"}
-_LOG_COOLDOWN_SECS = 30
-_last_person_log_time = 0.0
-_log_lock = threading.Lock()
+    The app does not start or stop the monitor; its owner does.
+    """
+    app = Flask(__name__, static_folder=FRONTEND_DIR, static_url_path="")
+    app.extensions["monitor"] = monitor
+    app.register_blueprint(api)
+    return app
 
 
-def _load_access_log():
-    """Load access log entries from disk."""
-    if not os.path.isfile(ACCESS_LOG_FILE):
-        return []
-    try:
-        with open(ACCESS_LOG_FILE, "r") as f:
-            return json.load(f)
-    except (json.JSONDecodeError, OSError):
-        return []
+def _monitor():
+    return current_app.extensions["monitor"]
 
 
-def _save_access_log(entries):
-    """Persist access log entries to disk."""
-    with open(ACCESS_LOG_FILE, "w") as f:
-        json.dump(entries, f, indent=2)
+def _blocking(fn, *args):
+    """Call ``fn(*args)`` through the monitor's ``run_blocking``.
 
+    For every handler call that waits on a store, SQLite or the disk, so
+    under the gevent server it runs on the thread pool instead of the hub.
+    """
+    return _monitor().run_blocking(fn, *args)
 
-def _record_person_event(frame_bgr, detections):
-    """Save a snapshot and append a log entry when a person is detected."""
-    global _last_person_log_time
-    now = time.time()
-    if now - _last_person_log_time < _LOG_COOLDOWN_SECS:
-        return
-    _last_person_log_time = now
 
-    person_dets = [d for d in detections if d["label"] in _PERSON_LABELS]
-    if not person_dets:
-        return
-
-    entry_id = uuid.uuid4().hex[:12]
-    filename = f"{entry_id}.jpg"
-    filepath = os.path.join(SNAPSHOTS_DIR, filename)
-
-    annotated = frame_bgr.copy()
-    draw_detections(annotated, person_dets)
-    cv2.imwrite(filepath, annotated, [cv2.IMWRITE_JPEG_QUALITY, 90])
-
-    labels = list({d["label"] for d in person_dets})
-    entry = {
-        "id": entry_id,
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "labels": labels,
-        "count": len(person_dets),
-        "image": filename,
-    }
-
-    with _log_lock:
-        log = _load_access_log()
-        log.insert(0, entry)
-        _save_access_log(log)
-
-
-def _camera_capture_loop():
-    """Capture frames, overlay detections, encode to JPEG."""
-    global _latest_frame, _raw_frame
-    while True:
-        frame_bgr = camera.capture_array()
-        _raw_frame = frame_bgr
-
-        dets = _latest_detections
-        if dets:
-            output = frame_bgr.copy()
-            draw_detections(output, dets)
-        else:
-            output = frame_bgr
-
-        ok, jpeg = cv2.imencode(".jpg", output, [cv2.IMWRITE_JPEG_QUALITY, 85])
-        if ok:
-            with _frame_lock:
-                _latest_frame = jpeg.tobytes()
-
-        time.sleep(0.03)
-
-
-def _detection_loop():
-    """Run face/object detection on the latest frame in a background thread."""
-    global _latest_detections
-    while True:
-        frame = _raw_frame
-        if frame is None:
-            time.sleep(0.2)
-            continue
-
-        state = _detection_state
-        if not state["faces"] and not state["objects"]:
-            _latest_detections = []
-            time.sleep(0.3)
-            continue
-
-        frame = frame.copy()
-        dets = []
-        if state["faces"]:
-            dets.extend(face_detector.detect(frame))
-        if state["objects"] and object_detector is not None:
-            dets.extend(object_detector.detect(frame))
-
-        _latest_detections = dets
-
-        person_dets = [d for d in dets if d["label"] in _PERSON_LABELS]
-        if person_dets:
-            _record_person_event(frame, dets)
-
-        time.sleep(0.05)
-
-
-threading.Thread(target=_camera_capture_loop, daemon=True).start()
-threading.Thread(target=_detection_loop, daemon=True).start()
-
-
-def _generate_mjpeg():
-    """Yield MJPEG frames for the video stream response."""
-    while True:
-        with _frame_lock:
-            frame = _latest_frame
-        if frame is None:
-            time.sleep(0.1)
-            continue
-        yield (
-            b"--frame\r\n"
-            b"Content-Type: image/jpeg\r\n\r\n" + frame + b"\r\n"
-        )
-        time.sleep(0.05)
+def _send_file(directory, filename, **kwargs):
+    """send_from_directory, with the file opened and read through ``_blocking``."""
+    @copy_current_request_context
+    def read():
+        response = send_from_directory(directory, filename, **kwargs)
+        response.make_sequence()  # read here, not while the response is sent
+        return response
+    return _blocking(read)
 
 
 def read_sensor():
-    """
-    Read temperature and humidity from DHT22 sensor.
-    Includes retry logic as DHT sensors can occasionally fail to read.
-    """
-    max_retries = 5
-    retry_delay = 2.0  # DHT22 requires ~2 seconds between reads
-    
-    for attempt in range(max_retries):
-        try:
-            temperature_c = dht_device.temperature
-            humidity = dht_device.humidity
-            
-            if temperature_c is not None and humidity is not None:
-                temperature_f = temperature_c * 9 / 5 + 32
-                return {
-                    "success": True,
-                    "temperature_celsius": round(temperature_c, 1),
-                    "temperature_fahrenheit": round(temperature_f, 1),
-                    "humidity_percent": round(humidity, 1),
-                    "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
-                }
-        except RuntimeError as e:
-            # DHT sensors throw errors fairly often, just retry
-            if attempt < max_retries - 1:
-                time.sleep(retry_delay)
-                continue
-        except Exception as e:
-            return {
-                "success": False,
-                "error": str(e),
-                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
-            }
-    
-    return {
-        "success": False,
-        "error": "Failed to read sensor after multiple attempts",
-        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
-    }
+    """Return the latest cached DHT22 reading (never blocks on the sensor)."""
+    return _monitor().sensor_sampler.reading()
 
 
-@app.route("/")
+@api.route("/")
 def index():
     """Serve the React dashboard."""
-    return send_from_directory(FRONTEND_DIR, "index.html")
+    return _send_file(FRONTEND_DIR, "index.html")
 
 
-@app.route("/api")
+@api.route("/api")
 def api_info():
     """API info endpoint."""
     return jsonify({
@@ -247,19 +208,29 @@ def api_info():
             "/temperature": "Get current temperature reading",
             "/humidity": "Get current humidity reading",
             "/reading": "Get full sensor reading (temperature + humidity)",
-            "/video_feed": "MJPEG video livestream from Pi camera",
-            "/snapshot": "Single JPEG snapshot from Pi camera",
-            "/detection/status": "Current detection toggle state",
+            "/history": "Sensor history (?from=&to=&resolution=auto|raw|1m|1h|1d)",
+            "/video_feed": "MJPEG video livestream from Pi camera (?profile=full|medium|thumbnail)",
+            "/snapshot": "Single JPEG snapshot from Pi camera (?profile=full|medium|thumbnail)",
+            "/stream/profiles": "Available stream profiles and viewer counts",
+            "/detection/status": "Detection toggle state and scheduler mode",
             "/detection/toggle": "POST to toggle face/object detection",
-            "/access-logs": "GET access log entries; DELETE to clear all",
-            "/access-logs/<id>/image": "GET snapshot image for a log entry",
+            "/detection/regions": "GET or PUT the regions of interest the detectors search",
+            "/alerts": "GET the state of every alert rule and of alert delivery",
+            "/alerts/rules": "GET or PUT the alert rules",
+            "/access-logs": "GET access log entries (?limit=&cursor=&from=&to=&label=); DELETE to clear all",
+            "/access-logs/<id>/image": "GET snapshot image for a log entry (?w=WIDTH scales it down)",
+            "/access-logs/<id>/thumbnail": "GET downscaled snapshot for a log entry",
+            "/access-logs/<id>/clip": "GET video clip (MJPEG AVI) around a log entry",
             "/access-logs/<id>": "DELETE a single log entry",
-            "/health": "API health check"
+            "/events": "Server-Sent Events: sensor, detection and access log updates",
+            "/storage": "Snapshot storage usage and retention limits",
+            "/metrics": "Pipeline stage timings, frame rates and counters (Prometheus; ?format=json)",
+            "/health": "API health check and detector readiness"
         }
     })
 
 
-@app.route("/temperature")
+@api.route("/temperature")
 def get_temperature():
     """Get temperature only."""
     data = read_sensor()
@@ -273,7 +244,7 @@ def get_temperature():
     return jsonify(data), 500
 
 
-@app.route("/humidity")
+@api.route("/humidity")
 def get_humidity():
     """Get humidity only."""
     data = read_sensor()
@@ -286,7 +257,7 @@ def get_humidity():
     return jsonify(data), 500
 
 
-@app.route("/reading")
+@api.route("/reading")
 def get_full_reading():
     """Get complete sensor reading."""
     data = read_sensor()
@@ -295,129 +266,679 @@ def get_full_reading():
     return jsonify(data), 500
 
 
-@app.route("/video_feed")
+def _parse_time(value, default):
+    """Accept epoch seconds or an ISO 8601 timestamp (local time if naive)."""
+    if value is None or value == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+@api.route("/history")
+def get_history():
+    """Temperature/humidity history. ?from=&to= (epoch or ISO), ?resolution=auto|raw|1m|1h|1d."""
+    now = time.time()
+    try:
+        end = _parse_time(request.args.get("to"), now)
+        start = _parse_time(request.args.get("from"), end - 86400)
+    except ValueError as exc:
+        return jsonify({"error": f"Invalid time: {exc}"}), 400
+    if start >= end:
+        return jsonify({"error": "'from' must be before 'to'"}), 400
+    try:
+        return jsonify(_blocking(
+            _monitor().sensor_history.query, start, end, request.args.get("resolution", "auto"),
+        ))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+
+def _requested_stream():
+    """Resolve the ``?profile=`` query parameter to a ProfileStream."""
+    name = request.args.get("profile", _DEFAULT_PROFILE)
+    return _monitor().streams.get(name), name
+
+
+def _unknown_profile(name):
+    return jsonify({
+        "error": f"Unknown stream profile '{name}'",
+        "profiles": list(_monitor().streams),
+    }), 400
+
+
+@api.route("/video_feed")
 def video_feed():
-    """MJPEG video stream from the Raspberry Pi camera."""
-    return Response(
-        _generate_mjpeg(),
+    """MJPEG video stream from the Raspberry Pi camera. ?profile=NAME picks a profile."""
+    stream, name = _requested_stream()
+    if stream is None:
+        return _unknown_profile(name)
+    try:
+        viewer = stream.broadcaster.open_viewer()
+    except ViewerLimitError as exc:
+        return jsonify({"error": str(exc)}), 503
+    response = Response(
+        viewer.stream(),
         mimetype="multipart/x-mixed-replace; boundary=frame",
     )
+    # Frees the slot even if the client disconnects before the first frame
+    response.call_on_close(viewer.close)
+    return response
+
+
+def _not_modified(etag, cache_control):
+    """A 304 for ``etag`` if the request's If-None-Match has it, else None."""
+    if not request.if_none_match.contains(etag):
+        return None
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    return response
 
 
-@app.route("/snapshot")
+@api.route("/snapshot")
 def snapshot():
-    """Single JPEG snapshot from the camera."""
-    with _frame_lock:
-        frame = _latest_frame
-    if frame is None:
+    """Single JPEG snapshot from the camera. ?profile=NAME picks a profile.
+
+    The ETag names the frame, so a client polling with If-None-Match gets
+    a 304 until the camera has delivered a new one.
+    """
+    stream, name = _requested_stream()
+    if stream is None:
+        return _unknown_profile(name)
+
+    monitor = _monitor()
+    tag, frame = stream.snapshot(monitor.raw_bus, monitor.render_frame)
+    if tag is None:
         return jsonify({"error": "Camera not ready"}), 503
-    return Response(frame, mimetype="image/jpeg")
+    etag = f"{_INSTANCE_TAG}-{name}-{tag}"
+    not_modified = _not_modified(etag, "no-cache")
+    if not_modified is not None:
+        return not_modified
+    if frame is None:
+        return jsonify({"error": "Failed to encode snapshot"}), 500
+    response = Response(frame.tobytes(), mimetype="image/jpeg")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
 
+@api.route("/stream/profiles")
+def stream_profiles():
+    """Available stream profiles and their current viewer counts."""
+    return jsonify({
+        name: {
+            **stream.profile._asdict(),
+            "viewers": stream.broadcaster.viewer_count,
+        }
+        for name, stream in _monitor().streams.items()
+    })
 
-@app.route("/detection/status")
+
+@api.route("/detection/status")
 def detection_status():
-    """Current detection toggle state."""
-    return jsonify(_detection_state)
+    """Current detection toggle state, scheduler mode, readiness and backend latencies."""
+    monitor = _monitor()
+    clip_recorder = monitor.clip_recorder
+    return jsonify({
+        **monitor.detection_state,
+        **monitor.readiness(),
+        "mode": monitor.motion_gate.mode,
+        "skipped_inferences": monitor.motion_gate.skipped,
+        "backends": monitor.backend_status(),
+        "snapshot_writer": monitor.snapshot_writer.stats(),
+        "clip_recorder": clip_recorder.stats() if clip_recorder is not None else None,
+    })
+
+
+@api.route("/detection/regions", methods=["GET", "PUT"])
+def detection_regions():
+    """Get or replace the regions of interest the detectors search."""
+    monitor = _monitor()
+    if request.method == "PUT":
+        data = request.get_json(force=True, silent=True)
+        if not isinstance(data, dict) or "regions" not in data:
+            return jsonify({"error": "Expected a JSON object with a 'regions' list"}), 400
+        try:
+            regions = _blocking(monitor.set_regions, data["regions"])
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+    else:
+        regions = monitor.region_store.regions.regions
+    return jsonify({
+        "regions": regions,
+        "frame": {"width": CAMERA_SIZE[0], "height": CAMERA_SIZE[1]},
+    })
+
+
+@api.route("/alerts")
+def alerts():
+    """State of every alert rule and of the webhook delivery."""
+    monitor = _monitor()
+    dispatcher = monitor.alert_dispatcher
+    return jsonify({
+        "rules": monitor.alerts.status(),
+        "delivery": dispatcher.stats() if dispatcher is not None else None,
+    })
+
+
+@api.route("/alerts/rules", methods=["GET", "PUT"])
+def alert_rules():
+    """Get or replace the alert rules."""
+    monitor = _monitor()
+    if request.method == "PUT":
+        data = request.get_json(force=True, silent=True)
+        if not isinstance(data, dict) or "rules" not in data:
+            return jsonify({"error": "Expected a JSON object with a 'rules' list"}), 400
+        try:
+            rules = _blocking(monitor.set_alert_rules, data["rules"])
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+    else:
+        rules = monitor.alert_rules.rules if monitor.alert_rules is not None else []
+    return jsonify({"rules": rules})
 
 
-@app.route("/detection/toggle", methods=["POST"])
+@api.route("/detection/toggle", methods=["POST"])
 def detection_toggle():
     """Toggle face and/or object detection on or off."""
-    global _detection_state
     data = request.get_json(force=True)
-    new = dict(_detection_state)
-    if "faces" in data:
-        new["faces"] = bool(data["faces"])
-    if "objects" in data:
-        new["objects"] = bool(data["objects"])
-    _detection_state = new
-    return jsonify(new)
+    return jsonify(_monitor().set_detection_state(
+        faces=data.get("faces"), objects=data.get("objects"),
+    ))
 
 
-@app.route("/access-logs")
+def _access_log_query():
+    """The ?limit=, ?from= and ?to= of an access log page; raises ValueError."""
+    limit = min(max(request.args.get("limit", default=100, type=int), 1), 1000)
+    try:
+        since = _parse_time(request.args.get("from"), None)
+        until = _parse_time(request.args.get("to"), None)
+    except ValueError as exc:
+        raise ValueError(f"Invalid time: {exc}") from None
+    return limit, since, until
+
+
+@api.route("/access-logs")
 def get_access_logs():
-    """Return access log entries, newest first. ?limit=N to cap results."""
-    with _log_lock:
-        log = _load_access_log()
-    limit = request.args.get("limit", default=100, type=int)
-    return jsonify(log[:limit])
+    """Return access log entries, newest first.
 
+    ?limit=N caps the page size, ?cursor= continues from the previous page's
+    ``X-Next-Cursor`` header, ?from=&to= (epoch or ISO) and ?label= filter.
+    ?cursors=1 adds an ``X-Entry-Cursors`` header with the cursor after
+    each entry (used by the aggregator to merge several nodes' logs).
+    """
+    try:
+        limit, since, until = _access_log_query()
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    cursor = request.args.get("cursor")
+    if cursor is not None and not cursor.isdigit():
+        return jsonify({"error": f"Invalid cursor '{cursor}'"}), 400
+    entry_cursors = None
+    args = (limit, cursor, since, until, request.args.get("label"))
+    page = _monitor().access_log.page
+    if request.args.get("cursors") == "1":
+        entries, next_cursor, entry_cursors = _blocking(page, *args, True)
+    else:
+        entries, next_cursor = _blocking(page, *args)
+    response = jsonify(entries)
+    if entry_cursors:
+        response.headers["X-Entry-Cursors"] = ",".join(entry_cursors)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
+
+def _send_immutable(filename, etag, **kwargs):
+    """Serve a file from the snapshots directory as cacheable forever.
+
+    A matching If-None-Match is answered without touching the disk.
+    """
+    not_modified = _not_modified(etag, _IMMUTABLE)
+    if not_modified is not None:
+        return not_modified
+    try:
+        response = _send_file(_monitor().snapshots_dir, filename, etag=etag, **kwargs)
+    except NotFound:
+        return None
+    response.headers["Cache-Control"] = _IMMUTABLE
+    return response
 
-@app.route("/access-logs/<entry_id>/image")
+
+@api.route("/access-logs/<entry_id>/image")
 def get_access_log_image(entry_id):
-    """Serve the snapshot image for a specific log entry."""
-    filename = f"{entry_id}.jpg"
-    filepath = os.path.join(SNAPSHOTS_DIR, filename)
-    if not os.path.isfile(filepath):
-        return jsonify({"error": "Image not found"}), 404
-    return send_from_directory(SNAPSHOTS_DIR, filename, mimetype="image/jpeg")
+    """Serve the snapshot image for a specific log entry.
 
+    ?w=WIDTH serves a copy scaled down to WIDTH pixels wide.
+    """
+    width = request.args.get("w")
+    if width is None:
+        response = _send_immutable(f"{entry_id}.jpg", entry_id, mimetype="image/jpeg")
+        if response is None:
+            return jsonify({"error": "Image not found"}), 404
+        return response
 
-@app.route("/access-logs/<entry_id>", methods=["DELETE"])
+    try:
+        width = int(width)
+    except ValueError:
+        width = 0
+    if not MIN_IMAGE_WIDTH <= width <= MAX_IMAGE_WIDTH:
+        return jsonify({
+            "error": f"w must be between {MIN_IMAGE_WIDTH} and {MAX_IMAGE_WIDTH}",
+        }), 400
+    etag = f"{entry_id}-w{width}"
+    not_modified = _not_modified(etag, _IMMUTABLE)
+    if not_modified is not None:
+        return not_modified
+    monitor = _monitor()
+    source = os.path.join(monitor.snapshots_dir, f"{entry_id}.jpg")
+
+    def resized():
+        # Checked on every request so a deleted entry's variants are never served
+        if not os.path.isfile(source):
+            return None
+        return monitor.image_cache.get(entry_id, source, width)
+
+    data = _blocking(resized)
+    if data is None:
+        return jsonify({"error": "Image not found"}), 404
+    response = Response(data, mimetype="image/jpeg")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = _IMMUTABLE
+    return response
+
+
+@api.route("/access-logs/<entry_id>/thumbnail")
+def get_access_log_thumbnail(entry_id):
+    """Serve the downscaled snapshot for a log entry."""
+    response = _send_immutable(f"{entry_id}{THUMBNAIL_SUFFIX}", f"{entry_id}-thumb",
+                               mimetype="image/jpeg")
+    if response is None:
+        return jsonify({"error": "Thumbnail not found"}), 404
+    return response
+
+
+@api.route("/access-logs/<entry_id>/clip")
+def get_access_log_clip(entry_id):
+    """Download the MJPEG AVI clip recorded around a log entry."""
+    entry = _blocking(_monitor().access_log.get, entry_id)
+    filename = entry.get("clip") if entry else None
+    response = None
+    if filename:
+        response = _send_immutable(filename, f"{entry_id}-clip",
+                                   mimetype="video/x-msvideo", as_attachment=True)
+    if response is None:
+        return jsonify({"error": "Clip not found"}), 404
+    return response
+
+
+@api.route("/access-logs/<entry_id>", methods=["DELETE"])
 def delete_access_log(entry_id):
     """Delete a single access log entry and its snapshot."""
-    with _log_lock:
-        log = _load_access_log()
-        entry = next((e for e in log if e["id"] == entry_id), None)
-        if entry is None:
-            return jsonify({"error": "Entry not found"}), 404
-        log = [e for e in log if e["id"] != entry_id]
-        _save_access_log(log)
-
-    filepath = os.path.join(SNAPSHOTS_DIR, f"{entry_id}.jpg")
-    if os.path.isfile(filepath):
-        os.remove(filepath)
+    if not _blocking(_monitor().delete_access_log_entries, [entry_id]):
+        return jsonify({"error": "Entry not found"}), 404
     return jsonify({"deleted": entry_id})
 
 
-@app.route("/access-logs", methods=["DELETE"])
+@api.route("/access-logs", methods=["DELETE"])
 def clear_access_logs():
     """Delete all access log entries and snapshots."""
-    with _log_lock:
-        log = _load_access_log()
-        _save_access_log([])
-    for entry in log:
-        filepath = os.path.join(SNAPSHOTS_DIR, f"{entry['id']}.jpg")
-        if os.path.isfile(filepath):
-            os.remove(filepath)
-    return jsonify({"cleared": len(log)})
+    return jsonify({"cleared": _blocking(_monitor().clear_access_log)})
+
 
+@api.route("/events")
+def events():
+    """Server-Sent Events push channel for the dashboard.
 
-@app.route("/health")
+    Sends the current sensor reading, detection toggles and detection
+    summary on connect, then ``sensor``, ``detection_status``,
+    ``detections``, ``access_log``, ``access_log_updated``,
+    ``access_log_deleted`` and ``access_log_cleared`` events as they happen. ``resync`` means events
+    were missed and state should be refetched.
+    """
+    monitor = _monitor()
+    last_id = request.headers.get("Last-Event-ID", type=int)
+    try:
+        subscriber = monitor.event_hub.subscribe(last_id)
+    except SubscriberLimitError as exc:
+        return jsonify({"error": str(exc)}), 503
+    initial = [
+        format_event("sensor", read_sensor()),
+        format_event("detection_status", monitor.detection_state),
+        format_event("detections", monitor.detection_summary),
+    ]
+    response = Response(subscriber.stream(initial), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.call_on_close(subscriber.close)
+    return response
+
+
+@api.route("/storage")
+def storage_usage():
+    """Snapshot storage usage, retention limits and the last cleanup pass."""
+    monitor = _monitor()
+    return jsonify(dict(_blocking(monitor.retention.usage),
+                        image_cache=monitor.image_cache.stats()))
+
+
+@api.route("/metrics")
+def metrics():
+    """Performance telemetry in Prometheus text format, or JSON with ?format=json."""
+    if not metrics_registry.enabled:
+        return jsonify({"error": "Metrics are disabled (METRICS=0)"}), 404
+    if request.args.get("format") == "json":
+        return jsonify(metrics_registry.snapshot())
+    return Response(metrics_registry.prometheus(),
+                    mimetype="text/plain; version=0.0.4")
+
+
+@api.route("/health")
 def health_check():
-    """Health check endpoint."""
+    """Health check endpoint; answers while the detectors are still loading."""
     return jsonify({
         "status": "ok",
+        **_monitor().readiness(),
         "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
     })
 
 
-if __name__ == "__main__":
+def create_aggregator_app(aggregator):
+    """Flask app serving the aggregator API from ``aggregator``.
+
+    Like create_app, it does not start or stop the aggregator.
+    """
+    app = Flask(__name__)
+    app.extensions["aggregator"] = aggregator
+    app.register_blueprint(aggregate)
+    return app
+
+
+def _aggregator():
+    return current_app.extensions["aggregator"]
+
+
+def _node(name):
+    """The Node called ``name``, or None."""
+    return _aggregator().nodes.get(name)
+
+
+def _unknown_node(name):
+    return jsonify({
+        "error": f"Unknown node '{name}'", "nodes": list(_aggregator().nodes),
+    }), 404
+
+
+@aggregate.route("/api")
+def aggregate_info():
+    """API info endpoint of the aggregator."""
+    return jsonify({
+        "name": "Server Room Monitor Aggregator",
+        "endpoints": {
+            "/api": "This help message",
+            "/nodes": "Every node with its cached reading, detection state and streams",
+            "/reading": "Latest sensor reading of every node",
+            "/access-logs": "Access logs of all nodes merged newest first (?limit=&cursor=&from=&to=&label=)",
+            "/nodes/<node>/access-logs/<id>/image": "GET snapshot image of a node's log entry",
+            "/nodes/<node>/access-logs/<id>/thumbnail": "GET downscaled snapshot of a node's log entry",
+            "/nodes/<node>/access-logs/<id>/clip": "GET video clip of a node's log entry",
+            "/nodes/<node>/video_feed": "A node's MJPEG stream, relayed (?profile=full|medium|thumbnail)",
+            "/events": "Server-Sent Events of every node, tagged with the node name",
+            "/metrics": "Node request timings and connection counters (Prometheus; ?format=json)",
+            "/health": "Aggregator health check and nodes online",
+        }
+    })
+
+
+@aggregate.route("/nodes")
+def aggregate_nodes():
+    """Every node's cached state, relayed streams and the connection pool."""
+    return jsonify(_aggregator().status())
+
+
+@aggregate.route("/reading")
+def aggregate_readings():
+    """Latest cached sensor reading per node; never waits on a node."""
+    return jsonify(_aggregator().readings())
+
+
+@aggregate.route("/access-logs")
+def aggregate_access_logs():
+    """Access log entries of every node, merged newest first.
+
+    Takes the same parameters as a node's /access-logs. Each entry gains a
+    ``node`` key; nodes that could not be reached are listed in the
+    ``X-Unavailable-Nodes`` header and missing from the page.
+    """
+    try:
+        limit, since, until = _access_log_query()
+        entries, next_cursor, unavailable = _aggregator().page(
+            limit, request.args.get("cursor"), since, until, request.args.get("label"),
+        )
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    response = jsonify(entries)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if unavailable:
+        response.headers["X-Unavailable-Nodes"] = ",".join(unavailable)
+    return response
+
+
+@aggregate.route("/nodes/<name>/access-logs/<entry_id>/<kind>")
+def aggregate_access_log_file(name, entry_id, kind):
+    """Proxy the image, thumbnail or clip of a node's log entry.
+
+    ?w= and If-None-Match are passed through, and the node's caching
+    headers come back with its response.
+    """
+    if kind not in ("image", "thumbnail", "clip"):
+        return jsonify({"error": f"Unknown file '{kind}'"}), 404
+    if _node(name) is None:
+        return _unknown_node(name)
+    path = f"/access-logs/{urllib.parse.quote(entry_id, safe='')}/{kind}"
+    if "w" in request.args:
+        path += "?" + urllib.parse.urlencode({"w": request.args["w"]})
+    headers = {}
+    if "If-None-Match" in request.headers:
+        headers["If-None-Match"] = request.headers["If-None-Match"]
+    try:
+        status, node_headers, body = _aggregator().fetch(name, path, headers)
+    except NodeError as exc:
+        return jsonify({"error": f"Node '{name}' unavailable: {exc}"}), 502
+    response = Response(body, status=status, content_type=node_headers.get("Content-Type"))
+    for header in ("Content-Disposition", "ETag", "Cache-Control", "Last-Modified"):
+        if header in node_headers:
+            response.headers[header] = node_headers[header]
+    return response
+
+
+@aggregate.route("/nodes/<name>/video_feed")
+def aggregate_video_feed(name):
+    """A node's MJPEG stream over one shared upstream connection. ?profile=NAME."""
+    node = _node(name)
+    if node is None:
+        return _unknown_node(name)
+    profile = request.args.get("profile", _DEFAULT_PROFILE)
+    stream = node.streams.get(profile)
+    if stream is None:
+        return jsonify({
+            "error": f"Unknown stream profile '{profile}'", "profiles": list(node.streams),
+        }), 400
+    try:
+        viewer = stream.open_viewer()
+    except ViewerLimitError as exc:
+        return jsonify({"error": str(exc)}), 503
+    response = Response(
+        viewer.stream(),
+        mimetype="multipart/x-mixed-replace; boundary=frame",
+    )
+    response.call_on_close(viewer.close)
+    return response
+
+
+@aggregate.route("/events")
+def aggregate_events():
+    """Server-Sent Events of every node.
+
+    Node events keep their names, with ``{"node": NAME, "data": ...}`` as
+    the payload; ``node_status`` reports a node going on- or offline. On
+    connect each node's status and cached state is sent first.
+    """
+    aggregator = _aggregator()
+    last_id = request.headers.get("Last-Event-ID", type=int)
+    try:
+        subscriber = aggregator.event_hub.subscribe(last_id)
+    except SubscriberLimitError as exc:
+        return jsonify({"error": str(exc)}), 503
+    initial = []
+    for node in aggregator.nodes.values():
+        initial.append(format_event("node_status", {
+            "node": node.name, "online": node.online, "error": node.error,
+        }))
+        initial.extend(
+            format_event(event, {"node": node.name, "data": data})
+            for event, data in node.state.items() if data is not None
+        )
+    response = Response(subscriber.stream(initial), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.call_on_close(subscriber.close)
+    return response
+
+
+@aggregate.route("/health")
+def aggregate_health():
+    """Health check; ``online`` lists which nodes the event feed reaches."""
+    return jsonify({
+        "status": "ok",
+        "online": {name: node.online for name, node in _aggregator().nodes.items()},
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+    })
+
+
+aggregate.add_url_rule("/metrics", view_func=metrics)
+
+
+def serve_aggregator(args):
+    """Run the aggregator over ``args.nodes`` with the chosen server."""
+    aggregator = Aggregator(
+        args.nodes,
+        max_stream_viewers=MAX_STREAM_VIEWERS,
+        max_event_subscribers=MAX_EVENT_SUBSCRIBERS,
+        timeout=NODE_TIMEOUT_SECS,
+    )
+    print("Starting Server Room Monitor aggregator...")
+    for node in aggregator.nodes.values():
+        print(f"  {node.name:<24} {node.url}")
+    print(f"Serving with the {args.server} server")
+    print("\nEndpoints:")
+    print("  GET    /nodes                  - Nodes and their cached state")
+    print("  GET    /reading                - Latest reading of every node")
+    print("  GET    /access-logs            - Merged access logs of all nodes")
+    print("  GET    /nodes/<node>/access-logs/<id>/image - Snapshot (also thumbnail, clip)")
+    print("  GET    /nodes/<node>/video_feed - Relayed MJPEG stream of a node")
+    print("  GET    /events                 - Server-Sent Events of all nodes")
+    print("  GET    /metrics                - Node request telemetry")
+    print("  GET    /health                 - Health check")
+    print("\nPress Ctrl+C to stop the server\n")
+
+    metrics_registry.enabled = METRICS_ENABLED
+    app = create_aggregator_app(aggregator)
+    aggregator.start()
+    try:
+        if args.server == "gevent":
+            import gevent_server
+
+            aggregator.run_blocking = gevent_server.run_in_threadpool
+            gevent_server.serve(app, args.host, args.port, aggregator.client_buses())
+        else:
+            app.run(host=args.host, port=args.port, debug=False, threaded=True)
+    finally:
+        aggregator.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server Room Monitor API")
+    parser.add_argument("--server", choices=("dev", "gevent"), default=SERVER_MODE,
+                        help="dev: Flask threaded server; gevent: one greenlet per client")
+    parser.add_argument("--fake", action="store_true", default=FAKE_HARDWARE,
+                        help="use the fake camera and DHT22 instead of the hardware")
+    parser.add_argument("--camera", default=CAMERA_SOURCE, metavar="SOURCE",
+                        help="picamera, picamera-hw, synthetic, or a video file or "
+                             "image directory to replay")
+    parser.add_argument("--sensor", default=SENSOR_SOURCE, metavar="SOURCE",
+                        help="dht22, synthetic, or a CSV of readings to replay")
+    parser.add_argument("--nodes", nargs="+", metavar="NODE",
+                        default=AGGREGATE_NODES.replace(",", " ").split(),
+                        help="aggregate these monitors (NAME=URL or URL) instead of "
+                             "running one")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+    if args.nodes:
+        serve_aggregator(args)
+        return
+    camera_source = args.camera or ("synthetic" if args.fake else "picamera")
+    sensor_source = args.sensor or ("synthetic" if args.fake else "dht22")
+
     print("Starting Server Room Monitor API...")
-    print("DHT22 sensor configured on GPIO 17")
-    print("Pi Camera streaming enabled (1280x720) with detection")
+    if sensor_source == "dht22":
+        print("DHT22 sensor configured on GPIO 17")
+    else:
+        print(f"Sensor source: {sensor_source}")
+    if camera_source == "picamera":
+        print("Pi Camera streaming enabled (1280x720) with detection")
+    elif camera_source == "picamera-hw":
+        print("Pi Camera streaming enabled (1280x720, hardware JPEG) with detection "
+              "on the lores stream")
+    else:
+        print(f"Camera source: {camera_source}")
     print(f"Snapshots directory: {SNAPSHOTS_DIR}")
-    print("Dashboard available at http://<raspberry-pi-ip>:5000")
+    print(f"Serving with the {args.server} server")
+    print(f"Dashboard available at http://<raspberry-pi-ip>:{args.port}")
     print("\nEndpoints:")
     print("  GET    /                       - Dashboard UI")
     print("  GET    /api                    - API info")
     print("  GET    /temperature            - Temperature reading")
     print("  GET    /humidity               - Humidity reading")
     print("  GET    /reading                - Full sensor reading")
+    print("  GET    /history                - Sensor history with rollups")
     print("  GET    /video_feed             - MJPEG video livestream")
     print("  GET    /snapshot               - Camera snapshot (JPEG)")
-    print("  GET    /detection/status       - Detection toggle state")
+    print("  GET    /stream/profiles        - Stream profiles and viewers")
+    print("  GET    /detection/status       - Detection state and mode")
     print("  POST   /detection/toggle       - Toggle face/object detection")
+    print("  GET    /detection/regions      - Detection regions of interest (PUT to set)")
+    print("  GET    /alerts                 - Alert rule states and delivery")
+    print("  GET    /alerts/rules           - Alert rules (PUT to set)")
     print("  GET    /access-logs            - Person detection access logs")
-    print("  GET    /access-logs/<id>/image - Snapshot for a log entry")
+    print("  GET    /access-logs/<id>/image - Snapshot for a log entry (?w= to resize)")
+    print("  GET    /access-logs/<id>/thumbnail - Snapshot thumbnail")
+    print("  GET    /access-logs/<id>/clip  - Video clip around the event")
     print("  DELETE /access-logs/<id>       - Delete a log entry")
     print("  DELETE /access-logs            - Clear all log entries")
+    print("  GET    /events                 - Server-Sent Events push channel")
+    print("  GET    /storage                - Snapshot storage usage")
+    print("  GET    /metrics                - Performance telemetry")
     print("  GET    /health                 - Health check")
     print("\nPress Ctrl+C to stop the server\n")
-    
+
+    metrics_registry.enabled = METRICS_ENABLED
+    monitor = create_monitor(camera_source, sensor_source)
+    app = create_app(monitor)
+    monitor.start()
     try:
-        app.run(host="0.0.0.0", port=5000, debug=False)
+        if args.server == "gevent":
+            import gevent_server
+
+            monitor.run_blocking = gevent_server.run_in_threadpool
+            gevent_server.serve(app, args.host, args.port, monitor.client_buses())
+        else:
+            app.run(host=args.host, port=args.port, debug=False, threaded=True)
     finally:
-        camera.stop()
-        dht_device.exit()
+        monitor.stop()
 
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Server-Sent Events fan-out for the dashboard.
+
+Each published event is serialized to its ``text/event-stream`` bytes once
+and kept in a short backlog; every subscriber walks that backlog from its
+own position, so publishing costs the same with one dashboard open or
+fifty. A subscriber that falls further behind than the backlog (or
+reconnects with an old ``Last-Event-ID``) gets a ``resync`` event telling
+it to refetch state over REST.
+"""
+
+import collections
+import json
+import threading
+
+from streaming import FrameBus
+
+
+class SubscriberLimitError(RuntimeError):
+    """Raised when the event stream already has its maximum number of subscribers."""
+
+
+def format_event(event, data, event_id=None):
+    """Serialize one SSE message to bytes."""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    body = json.dumps(data, separators=(",", ":"))
+    return f"{head}event: {event}\ndata: {body}\n\n".encode()
+
+
+class EventSubscriber:
+    """One ``/events`` client and its position in the hub's backlog."""
+
+    def __init__(self, hub, last_id):
+        self._hub = hub
+        self.last_id = last_id
+        self.sent = 0
+        self.closed = False
+
+    def stream(self, initial=(), keepalive=15.0):
+        """Yield SSE bytes: ``initial`` messages first, then every new event.
+
+        Events that arrived together are sent as one write. A comment line
+        goes out after ``keepalive`` idle seconds so proxies and the client
+        notice dead connections.
+        """
+        hub = self._hub
+        try:
+            # Ask EventSource to reconnect quickly after a drop
+            yield b"retry: 3000\n\n" + b"".join(initial)
+            while not self.closed:
+                hub.bus.wait(self.last_id, keepalive)
+                with hub._lock:
+                    events = hub._since(self.last_id)
+                    last_id = hub._last_id
+                if events is None:
+                    yield format_event("resync", {"reason": "missed events"}, last_id)
+                    self.last_id = last_id
+                elif events:
+                    self.last_id = last_id
+                    self.sent += len(events)
+                    yield b"".join(events)
+                else:
+                    yield b": keepalive\n\n"
+        finally:
+            self.close()
+
+    def close(self):
+        """Release the subscriber slot. Safe to call more than once."""
+        if not self.closed:
+            self.closed = True
+            self._hub._remove(self)
+
+
+class EventHub:
+    """Publish named JSON events to any number of SSE subscribers.
+
+    Subscribers wait on ``bus``, whose sequence number is the id of the
+    newest event, so the hub can be served by the same waiters as the
+    MJPEG streams.
+    """
+
+    def __init__(self, backlog=256, max_subscribers=None):
+        self.max_subscribers = max_subscribers
+        self._events = collections.deque(maxlen=backlog)  # (id, bytes)
+        self._last_id = 0
+        self._lock = threading.Lock()
+        self._bus = FrameBus()
+        self._subscribers = set()
+        self.published = 0
+
+    @property
+    def bus(self):
+        """FrameBus published once per event; its seq is the newest event id."""
+        return self._bus
+
+    def publish(self, event, data):
+        """Queue an event for all subscribers; returns its id."""
+        with self._lock:
+            self._last_id += 1
+            self._events.append((self._last_id, format_event(event, data, self._last_id)))
+            self.published += 1
+            self._bus.publish(self._last_id)
+            return self._last_id
+
+    def _since(self, last_id):
+        """Events after ``last_id``, or None if some are no longer in the backlog."""
+        if self._last_id <= last_id:
+            return []
+        first = self._events[0][0] if self._events else self._last_id + 1
+        if last_id + 1 < first:
+            return None
+        return [data for event_id, data in self._events if event_id > last_id]
+
+    def subscribe(self, last_event_id=None):
+        """Register a subscriber; raises SubscriberLimitError when full.
+
+        With ``last_event_id`` (the browser's ``Last-Event-ID`` on reconnect)
+        the subscriber resumes after that event, else it starts with the
+        next one.
+        """
+        with self._lock:
+            if self.max_subscribers is not None and len(self._subscribers) >= self.max_subscribers:
+                raise SubscriberLimitError(
+                    f"Event stream is limited to {self.max_subscribers} subscribers"
+                )
+            start = self._last_id
+            if last_event_id is not None and 0 <= last_event_id <= self._last_id:
+                start = last_event_id
+            subscriber = EventSubscriber(self, start)
+            self._subscribers.add(subscriber)
+            return subscriber
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def _remove(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
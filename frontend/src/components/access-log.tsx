@@ -9,7 +9,11 @@ import {
   TooltipTrigger,
 } from "@/components/ui/tooltip"
 import type { AccessLogEntry } from "@/lib/api"
-import { accessLogImageUrl } from "@/lib/api"
+import {
+  accessLogClipUrl,
+  accessLogImageUrl,
+  accessLogThumbnailUrl,
+} from "@/lib/api"
 
 interface AccessLogProps {
   logs: AccessLogEntry[]
@@ -118,6 +122,9 @@ function LogEntry({
   onDelete: () => void
 }) {
   const PersonIcon = entry.count > 1 ? Users : User
+  const previewUrl = entry.thumbnail
+    ? accessLogThumbnailUrl(entry.id)
+    : accessLogImageUrl(entry.id, 320)
 
   return (
     <div className="rounded-lg border border-border/40 bg-background/50 overflow-hidden transition-colors hover:border-border/70">
@@ -156,15 +163,28 @@ function LogEntry({
 
       {expanded && (
         <div className="px-3 pb-3 space-y-2">
-          <div className="relative rounded-md overflow-hidden bg-black/30">
+          <a
+            href={accessLogImageUrl(entry.id)}
+            target="_blank"
+            rel="noreferrer"
+            className="block relative rounded-md overflow-hidden bg-black/30"
+          >
             <img
-              src={accessLogImageUrl(entry.id)}
+              src={previewUrl}
+              srcSet={`${previewUrl} 1x, ${accessLogImageUrl(entry.id, 640)} 2x`}
               alt={`Detection snapshot ${entry.timestamp}`}
               className="w-full object-contain max-h-64"
               loading="lazy"
             />
-          </div>
-          <div className="flex justify-end">
+          </a>
+          <div className="flex justify-end gap-1">
+            {entry.clip && (
+              <Button variant="ghost" size="sm" asChild className="h-7 px-2 text-xs">
+                <a href={accessLogClipUrl(entry.id)} download>
+                  Clip
+                </a>
+              </Button>
+            )}
             <Button
               variant="ghost"
               size="sm"
@@ -5,16 +5,19 @@ import { StreamControls } from "@/components/stream-controls"
 import { SensorCard } from "@/components/sensor-card"
 import { StatusBar } from "@/components/status-bar"
 import { AccessLog } from "@/components/access-log"
+import { PerformancePanel } from "@/components/performance-panel"
 import { useSensorData } from "@/hooks/use-sensor-data"
 import { useDetectionStatus } from "@/hooks/use-detection-status"
 import { useStream } from "@/hooks/use-stream"
 import { useAccessLogs } from "@/hooks/use-access-logs"
+import { useMetrics } from "@/hooks/use-metrics"
 
 export function Dashboard() {
   const { data, error, loading, refresh } = useSensorData()
-  const { status: detection, toggling, toggle } = useDetectionStatus()
+  const { status: detection, live, toggling, toggle } = useDetectionStatus()
   const { playing, streamUrl, toggleStream } = useStream()
   const accessLogs = useAccessLogs()
+  const metrics = useMetrics()
 
   const connectionState = loading && !data
     ? "loading" as const
@@ -42,6 +45,7 @@ export function Dashboard() {
               detectionStatus={detection}
               onToggleDetection={toggle}
               detectionToggling={toggling}
+              liveDetections={live}
             />
           </div>
 
@@ -62,6 +66,7 @@ export function Dashboard() {
               subtitle="Relative humidity"
               accentClass="text-humid"
             />
+            <PerformancePanel metrics={metrics} />
           </div>
         </div>
 
@@ -0,0 +1,100 @@
+import { Gauge } from "lucide-react"
+import { Card, CardContent } from "@/components/ui/card"
+import type { PerformanceMetrics } from "@/lib/api"
+
+interface PerformancePanelProps {
+  metrics: PerformanceMetrics | null
+}
+
+// Stages worth showing on the dashboard, in pipeline order
+const STAGES: [string, string][] = [
+  ["encode.full", "Encode (full)"],
+  ["encode.medium", "Encode (medium)"],
+  ["encode.thumbnail", "Encode (thumb)"],
+  ["motion_gate", "Motion gate"],
+  ["haar", "Haar"],
+  ["yolo_forward", "YOLO forward"],
+  ["yolo_decode", "YOLO decode"],
+  ["nms", "NMS"],
+  ["snapshot_write", "Snapshot write"],
+  ["sensor_read", "Sensor read"],
+  ["frame_age_at_send", "Frame age"],
+]
+
+function ms(value: number | null | undefined): string {
+  if (value == null) return "—"
+  return value < 10 ? value.toFixed(1) : value.toFixed(0)
+}
+
+function sumMatching(
+  values: Record<string, number>,
+  prefix: string,
+): number {
+  return Object.entries(values)
+    .filter(([key]) => key === prefix || key.startsWith(`${prefix}.`))
+    .reduce((total, [, value]) => total + value, 0)
+}
+
+export function PerformancePanel({ metrics }: PerformancePanelProps) {
+  if (!metrics) return null
+
+  const rates = Object.fromEntries(
+    Object.entries(metrics.counters).map(([k, v]) => [k, v.per_sec]),
+  )
+  const totals = Object.fromEntries(
+    Object.entries(metrics.counters).map(([k, v]) => [k, v.total]),
+  )
+  const summary = [
+    ["Camera", `${(rates["frames_captured"] ?? 0).toFixed(1)} fps`],
+    ["Detection", `${(rates["detection_frames"] ?? 0).toFixed(1)} fps`],
+    ["Viewers", String(sumMatching(metrics.gauges, "stream_viewers"))],
+    ["Dropped", String(sumMatching(totals, "frames_dropped"))],
+  ]
+  const stages = STAGES.filter(([key]) => metrics.stages_ms[key]?.count)
+
+  return (
+    <Card className="border-border/50 bg-card/80 backdrop-blur-sm">
+      <CardContent className="p-5 space-y-4">
+        <div className="flex items-center gap-2 text-sm font-medium text-muted-foreground">
+          <Gauge className="w-4 h-4" />
+          Performance
+        </div>
+
+        <div className="grid grid-cols-2 gap-2 text-xs">
+          {summary.map(([label, value]) => (
+            <div key={label} className="flex justify-between">
+              <span className="text-muted-foreground">{label}</span>
+              <span className="font-mono tabular-nums">{value}</span>
+            </div>
+          ))}
+        </div>
+
+        {stages.length > 0 && (
+          <table className="w-full text-xs font-mono tabular-nums">
+            <thead className="text-muted-foreground">
+              <tr>
+                <th className="text-left font-normal">ms</th>
+                <th className="text-right font-normal">p50</th>
+                <th className="text-right font-normal">p95</th>
+                <th className="text-right font-normal">p99</th>
+              </tr>
+            </thead>
+            <tbody>
+              {stages.map(([key, label]) => {
+                const t = metrics.stages_ms[key]
+                return (
+                  <tr key={key}>
+                    <td className="font-sans text-muted-foreground">{label}</td>
+                    <td className="text-right">{ms(t.p50)}</td>
+                    <td className="text-right">{ms(t.p95)}</td>
+                    <td className="text-right">{ms(t.p99)}</td>
+                  </tr>
+                )
+              })}
+            </tbody>
+          </table>
+        )}
+      </CardContent>
+    </Card>
+  )
+}
@@ -14,7 +14,7 @@ import {
   TooltipContent,
   TooltipTrigger,
 } from "@/components/ui/tooltip"
-import type { DetectionStatus } from "@/lib/api"
+import type { DetectionStatus, DetectionSummary } from "@/lib/api"
 import { snapshotUrl, VIDEO_FEED_URL } from "@/lib/api"
 
 interface StreamControlsProps {
@@ -23,6 +23,7 @@ interface StreamControlsProps {
   detectionStatus: DetectionStatus
   onToggleDetection: (key: keyof DetectionStatus) => void
   detectionToggling: boolean
+  liveDetections?: DetectionSummary | null
 }
 
 export function StreamControls({
@@ -31,6 +32,7 @@ export function StreamControls({
   detectionStatus,
   onToggleDetection,
   detectionToggling,
+  liveDetections,
 }: StreamControlsProps) {
   return (
     <Card className="border-border/50 bg-card/80 backdrop-blur-sm">
@@ -130,6 +132,14 @@ export function StreamControls({
             {detectionStatus.objects ? "Disable" : "Enable"} object detection
           </TooltipContent>
         </Tooltip>
+
+        {liveDetections && liveDetections.count > 0 && (
+          <span className="ml-auto text-xs text-muted-foreground font-mono">
+            {Object.entries(liveDetections.labels)
+              .map(([label, n]) => `${n}× ${label}`)
+              .join(" · ")}
+          </span>
+        )}
       </CardContent>
     </Card>
   )
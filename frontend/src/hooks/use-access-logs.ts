@@ -5,7 +5,9 @@ import {
   deleteAccessLog,
   clearAccessLogs,
 } from "@/lib/api"
+import { useServerEvent } from "@/hooks/use-server-event"
 
+// Only used while the /events stream is down
 const POLL_INTERVAL = 5_000
 
 export function useAccessLogs() {
@@ -34,6 +36,20 @@ export function useAccessLogs() {
     setLogs([])
   }, [])
 
+  const live = useServerEvent<AccessLogEntry>("access_log", (entry) => {
+    setLogs((prev) => [entry, ...prev.filter((e) => e.id !== entry.id)])
+  })
+  useServerEvent<AccessLogEntry>("access_log_updated", (entry) => {
+    setLogs((prev) => prev.map((e) => (e.id === entry.id ? entry : e)))
+  })
+  useServerEvent<{ id: string }>("access_log_deleted", ({ id }) => {
+    setLogs((prev) => prev.filter((e) => e.id !== id))
+  })
+  useServerEvent("access_log_cleared", () => setLogs([]))
+  useServerEvent("resync", () => {
+    load()
+  })
+
   const startPolling = useCallback(() => {
     if (intervalRef.current) return
     intervalRef.current = setInterval(load, POLL_INTERVAL)
@@ -48,6 +64,7 @@ export function useAccessLogs() {
 
   useEffect(() => {
     load()
+    if (live) return
     startPolling()
 
     const handleVisibility = () => {
@@ -64,7 +81,7 @@ export function useAccessLogs() {
       stopPolling()
       document.removeEventListener("visibilitychange", handleVisibility)
     }
-  }, [load, startPolling, stopPolling])
+  }, [live, load, startPolling, stopPolling])
 
   return { logs, loading, refresh: load, remove, clearAll }
 }
@@ -1,12 +1,15 @@
 import { useCallback, useEffect, useState } from "react"
 import {
   type DetectionStatus,
+  type DetectionSummary,
   fetchDetectionStatus,
   toggleDetection,
 } from "@/lib/api"
+import { useServerEvent } from "@/hooks/use-server-event"
 
 interface UseDetectionStatusReturn {
   status: DetectionStatus
+  live: DetectionSummary | null
   toggling: boolean
   toggle: (key: keyof DetectionStatus) => void
 }
@@ -17,6 +20,13 @@ export function useDetectionStatus(): UseDetectionStatusReturn {
     objects: false,
   })
   const [toggling, setToggling] = useState(false)
+  const [live, setLive] = useState<DetectionSummary | null>(null)
+
+  // Toggles made from other dashboards, and what is currently in view
+  useServerEvent<DetectionStatus>("detection_status", ({ faces, objects }) =>
+    setStatus({ faces, objects }),
+  )
+  const connected = useServerEvent<DetectionSummary>("detections", setLive)
 
   useEffect(() => {
     fetchDetectionStatus()
@@ -39,5 +49,5 @@ export function useDetectionStatus(): UseDetectionStatusReturn {
     [status],
   )
 
-  return { status, toggling, toggle }
+  return { status, live: connected ? live : null, toggling, toggle }
 }
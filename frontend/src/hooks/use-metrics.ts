@@ -0,0 +1,30 @@
+import { useEffect, useState } from "react"
+import { type PerformanceMetrics, fetchMetrics } from "@/lib/api"
+
+const POLL_INTERVAL = 5_000
+
+/** Poll `/metrics?format=json` while the page is visible. */
+export function useMetrics(): PerformanceMetrics | null {
+  const [metrics, setMetrics] = useState<PerformanceMetrics | null>(null)
+
+  useEffect(() => {
+    let cancelled = false
+    const load = async () => {
+      if (document.hidden) return
+      try {
+        const data = await fetchMetrics()
+        if (!cancelled) setMetrics(data)
+      } catch {
+        // Metrics disabled or server unreachable: keep the last values
+      }
+    }
+    load()
+    const interval = setInterval(load, POLL_INTERVAL)
+    return () => {
+      cancelled = true
+      clearInterval(interval)
+    }
+  }, [])
+
+  return metrics
+}
@@ -1,6 +1,8 @@
 import { useCallback, useEffect, useRef, useState } from "react"
 import { type SensorReading, fetchReading } from "@/lib/api"
+import { useServerEvent } from "@/hooks/use-server-event"
 
+// Only used while the /events stream is down
 const POLL_INTERVAL = 10_000
 
 interface UseSensorDataReturn {
@@ -33,6 +35,13 @@ export function useSensorData(): UseSensorDataReturn {
     }
   }, [])
 
+  const live = useServerEvent<SensorReading>("sensor", (reading) => {
+    if (reading.success) {
+      setData(reading)
+      setError(null)
+    }
+  })
+
   const startPolling = useCallback(() => {
     if (intervalRef.current) return
     intervalRef.current = setInterval(load, POLL_INTERVAL)
@@ -47,6 +56,7 @@ export function useSensorData(): UseSensorDataReturn {
 
   useEffect(() => {
     load()
+    if (live) return
     startPolling()
 
     const handleVisibility = () => {
@@ -63,7 +73,7 @@ export function useSensorData(): UseSensorDataReturn {
       stopPolling()
       document.removeEventListener("visibilitychange", handleVisibility)
     }
-  }, [load, startPolling, stopPolling])
+  }, [live, load, startPolling, stopPolling])
 
   return { data, error, loading, refresh: load }
 }
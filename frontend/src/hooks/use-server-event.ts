@@ -0,0 +1,35 @@
+import { useEffect, useRef, useState } from "react"
+import {
+  isEventStreamConnected,
+  onConnectionChange,
+  subscribeEvent,
+} from "@/lib/events"
+
+/**
+ * Subscribe to a named `/events` message. Returns whether the event stream
+ * is currently connected, so callers can poll while it is not.
+ */
+export function useServerEvent<T>(
+  type: string,
+  handler: (data: T) => void,
+): boolean {
+  const [connected, setConnected] = useState(isEventStreamConnected)
+  const handlerRef = useRef(handler)
+
+  useEffect(() => {
+    handlerRef.current = handler
+  })
+
+  useEffect(() => {
+    const unsubscribe = subscribeEvent<T>(type, (data) =>
+      handlerRef.current(data),
+    )
+    const unlisten = onConnectionChange(setConnected)
+    return () => {
+      unlisten()
+      unsubscribe()
+    }
+  }, [type])
+
+  return connected
+}
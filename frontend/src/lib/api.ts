@@ -4,6 +4,8 @@ export interface SensorReading {
   temperature_fahrenheit: number
   humidity_percent: number
   timestamp: string
+  age_seconds?: number
+  stale?: boolean
   error?: string
 }
 
@@ -12,8 +14,19 @@ export interface DetectionStatus {
   objects: boolean
 }
 
+export interface DetectionSummary {
+  count: number
+  labels: Record<string, number>
+}
+
+export type DetectorState = "loading" | "ready" | "unavailable"
+
 export interface HealthStatus {
   status: string
+  ready: boolean
+  detectors: { faces: DetectorState; objects: DetectorState }
+  detectors_loaded_secs: number | null
+  first_detection_secs: number | null
   timestamp: string
 }
 
@@ -23,6 +36,36 @@ export interface AccessLogEntry {
   labels: string[]
   count: number
   image: string
+  thumbnail?: string
+  clip?: string
+}
+
+export interface StorageUsage {
+  bytes: number
+  files: number
+  entries: number
+  limits: {
+    max_age_days: number | null
+    max_bytes: number | null
+    max_entries: number | null
+  }
+  disk_free_bytes: number
+  disk_total_bytes: number
+}
+
+export interface StageTiming {
+  count: number
+  p50: number | null
+  p95: number | null
+  p99: number | null
+}
+
+export interface PerformanceMetrics {
+  enabled: boolean
+  uptime_secs: number
+  stages_ms: Record<string, StageTiming>
+  counters: Record<string, { total: number; per_sec: number }>
+  gauges: Record<string, number>
 }
 
 export async function fetchReading(): Promise<SensorReading> {
@@ -55,6 +98,18 @@ export async function fetchHealth(): Promise<HealthStatus> {
   return res.json()
 }
 
+export async function fetchStorageUsage(): Promise<StorageUsage> {
+  const res = await fetch("/storage")
+  if (!res.ok) throw new Error(`Storage error: ${res.status}`)
+  return res.json()
+}
+
+export async function fetchMetrics(): Promise<PerformanceMetrics> {
+  const res = await fetch("/metrics?format=json")
+  if (!res.ok) throw new Error(`Metrics error: ${res.status}`)
+  return res.json()
+}
+
 export async function fetchAccessLogs(limit = 100): Promise<AccessLogEntry[]> {
   const res = await fetch(`/access-logs?limit=${limit}`)
   if (!res.ok) throw new Error(`Access logs error: ${res.status}`)
@@ -71,8 +126,16 @@ export async function clearAccessLogs(): Promise<void> {
   if (!res.ok) throw new Error(`Clear logs error: ${res.status}`)
 }
 
-export function accessLogImageUrl(id: string): string {
-  return `/access-logs/${id}/image`
+export function accessLogImageUrl(id: string, width?: number): string {
+  return width ? `/access-logs/${id}/image?w=${width}` : `/access-logs/${id}/image`
+}
+
+export function accessLogThumbnailUrl(id: string): string {
+  return `/access-logs/${id}/thumbnail`
+}
+
+export function accessLogClipUrl(id: string): string {
+  return `/access-logs/${id}/clip`
 }
 
 export const VIDEO_FEED_URL = "/video_feed"
@@ -0,0 +1,96 @@
+// One shared EventSource for the whole dashboard. Hooks subscribe to named
+// events; the connection opens with the first subscriber and closes with
+// the last. While it is down, hooks fall back to polling.
+
+export const EVENTS_URL = "/events"
+
+const RECONNECT_DELAY = 5_000
+
+type Handler = (data: unknown) => void
+type ConnectionListener = (connected: boolean) => void
+
+const handlers = new Map<string, Set<Handler>>()
+const connectionListeners = new Set<ConnectionListener>()
+let source: EventSource | null = null
+let reconnectTimer: ReturnType<typeof setTimeout> | null = null
+let connected = false
+
+function setConnected(value: boolean) {
+  if (connected === value) return
+  connected = value
+  connectionListeners.forEach((listener) => listener(value))
+}
+
+function dispatch(event: MessageEvent) {
+  let data: unknown
+  try {
+    data = JSON.parse(event.data)
+  } catch {
+    return
+  }
+  handlers.get(event.type)?.forEach((handler) => handler(data))
+}
+
+function open() {
+  if (source || handlers.size === 0 || typeof EventSource === "undefined") {
+    return
+  }
+  source = new EventSource(EVENTS_URL)
+  source.onopen = () => setConnected(true)
+  source.onerror = () => {
+    setConnected(false)
+    // EventSource retries by itself unless the server refused the stream
+    if (source?.readyState === EventSource.CLOSED) {
+      source = null
+      reconnectTimer ??= setTimeout(() => {
+        reconnectTimer = null
+        open()
+      }, RECONNECT_DELAY)
+    }
+  }
+  handlers.forEach((_, type) => source?.addEventListener(type, dispatch))
+}
+
+function close() {
+  source?.close()
+  source = null
+  if (reconnectTimer) {
+    clearTimeout(reconnectTimer)
+    reconnectTimer = null
+  }
+  setConnected(false)
+}
+
+export function subscribeEvent<T>(
+  type: string,
+  handler: (data: T) => void,
+): () => void {
+  let set = handlers.get(type)
+  if (!set) {
+    set = new Set()
+    handlers.set(type, set)
+    source?.addEventListener(type, dispatch)
+  }
+  set.add(handler as Handler)
+  open()
+
+  return () => {
+    set.delete(handler as Handler)
+    if (set.size === 0) {
+      handlers.delete(type)
+      source?.removeEventListener(type, dispatch)
+    }
+    if (handlers.size === 0) close()
+  }
+}
+
+export function onConnectionChange(listener: ConnectionListener): () => void {
+  connectionListeners.add(listener)
+  return () => {
+    connectionListeners.delete(listener)
+  }
+}
+
+export function isEventStreamConnected(): boolean {
+  return connected
+}
@@ -0,0 +1,94 @@
+"""Serve the app from gevent's WSGI server: one greenlet per client.
+
+With the Flask development server every /video_feed viewer and /events
+subscriber holds an OS thread for as long as it is connected. Here each
+request is a greenlet on the main thread, so a connected client costs a
+few kilobytes instead of a thread stack.
+
+Nothing is monkey-patched: the capture, detection, writer and sampler
+threads stay real OS threads, because they do CPU-bound work that would
+starve greenlets. The two worlds meet at the FrameBuses clients wait on,
+where a GreenletWaiter lets greenlets sleep on the gevent hub and be
+woken, through a thread-safe async watcher, when another thread publishes.
+Handlers that must block (the monitor's store, SQLite and file calls, the
+aggregator's requests to its nodes) hand the call to gevent's thread pool
+with ``run_in_threadpool``.
+"""
+
+import signal
+import socket
+import threading
+import time
+
+import gevent
+from gevent.event import Event
+from gevent.pywsgi import WSGIServer
+
+
+class GreenletWaiter:
+    """FrameBus waiter for greenlets on the thread that runs the gevent hub."""
+
+    def __init__(self, bus, hub=None):
+        self._bus = bus
+        self._hub = hub or gevent.get_hub()
+        self._thread_id = threading.get_ident()
+        self._event = Event()
+        self._watcher = self._hub.loop.async_()
+        self._watcher.start(self._wake)
+        # Called from the publishing thread; send() is safe from any thread
+        # and several sends before the hub runs collapse into one wakeup
+        bus.add_listener(lambda seq: self._watcher.send())
+        bus.set_waiter(self)
+
+    def owns_thread(self):
+        return threading.get_ident() == self._thread_id
+
+    def _wake(self):
+        event, self._event = self._event, Event()
+        event.set()
+
+    def wait(self, after_seq, timeout=None):
+        """Same contract as FrameBus.wait, but only this greenlet sleeps."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            # Take the event before checking, so a publish in between still
+            # wakes us
+            event = self._event
+            seq, item = self._bus.latest()
+            if seq > after_seq:
+                return seq, item
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            event.wait(remaining)
+
+
+class _WSGIServer(WSGIServer):
+    """WSGIServer with Nagle's algorithm off on client connections.
+
+    pywsgi writes the headers and the body of a response separately; on a
+    keep-alive connection Nagle holds the body back until the client's
+    delayed ACK of the headers, adding ~40 ms to every reused request.
+    """
+
+    def handle(self, sock, address):
+        if sock.family in (socket.AF_INET, socket.AF_INET6):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        super().handle(sock, address)
+
+
+def run_in_threadpool(fn, *args):
+    """Call ``fn(*args)`` on a pool thread while only the calling greenlet waits."""
+    return gevent.get_hub().threadpool.apply(fn, args)
+
+
+def serve(app, host, port, buses, log="default"):
+    """Run ``app`` until SIGINT/SIGTERM; ``buses`` are the FrameBuses clients wait on."""
+    for bus in buses:
+        GreenletWaiter(bus)
+    server = _WSGIServer((host, port), app, log=log)
+    gevent.signal_handler(signal.SIGTERM, server.stop)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
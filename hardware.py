@@ -0,0 +1,383 @@
+"""Camera and DHT22 sources: the real drivers, recordings and fakes.
+
+The real drivers' modules (picamera2, board, adafruit_dht) are imported
+only when a real device is opened, so the rest of the server imports and
+runs on any Linux box. The fakes behave like the hardware closely enough
+for load tests: the camera paces frames at its frame rate and the sensor
+takes as long as a real read and fails as often. Recordings (a video
+file or image directory, and a CSV of sensor readings) replay a real
+scene off-device; see benchmarks/replay.py.
+
+A camera is anything with ``start``, ``stop``, ``close`` and a
+``capture_array`` that blocks for the next BGR frame; a sensor anything
+with ``temperature`` and ``humidity`` attributes and ``exit``. A camera
+may also offer ``capture_into(out)``, which writes the next frame into a
+buffer of shape ``(height, width, 3)`` for ``size``; the capture loop then
+fills buffers from a FramePool instead of getting a new array per frame.
+
+With the "picamera-hw" source the full-size stream never reaches the CPU:
+the VideoCore's MJPEG encoder compresses the camera's main stream and
+the detectors get the small "lores" stream (see HardwareJpegCamera).
+"""
+
+import io
+import os
+import time
+
+import cv2
+import numpy as np
+
+from sensor import FakeDHT22, RecordedDHT22
+
+CAMERA_SIZE = (1280, 720)
+# Frames from the camera's second, low-resolution output, which the
+# "picamera-hw" source captures for detection (a multiple of 64 wide, so
+# the YUV planes have no row padding)
+LORES_SIZE = (640, 360)
+
+_IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class _PacedCamera:
+    """Frame pacing shared by the fake and recorded cameras.
+
+    With ``fps`` 0 frames come as fast as they are asked for.
+    """
+
+    def __init__(self, fps):
+        self.fps = fps
+        self._next = None
+        self.captured = 0
+
+    def start(self):
+        self._next = time.monotonic()
+
+    def stop(self):
+        self._next = None
+
+    def _wait_for_frame(self):
+        if self._next is None:
+            raise RuntimeError("Camera is not started")
+        if not self.fps:
+            return
+        delay = self._next - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        # Like a real sensor, a late reader gets the next frame, not a burst
+        self._next = max(self._next + 1.0 / self.fps, time.monotonic())
+
+    def close(self):
+        self.stop()
+
+
+class FakeCamera(_PacedCamera):
+    """Stand-in for Picamera2 that produces synthetic BGR frames.
+
+    ``frames`` distinct frames (a noisy background with a moving block) are
+    rendered up front and replayed in a loop, so ``capture_array`` costs
+    no more than waiting for the next frame slot at ``fps``.
+    """
+
+    def __init__(self, size=CAMERA_SIZE, fps=30, frames=60, seed=0):
+        super().__init__(fps)
+        self.size = size
+        self._frames = self._render(size, frames, seed)
+        self._index = 0
+
+    @staticmethod
+    def _render(size, count, seed):
+        width, height = size
+        rng = np.random.default_rng(seed)
+        background = rng.integers(40, 80, (height, width, 3), dtype=np.uint8)
+        block = (width // 8, height // 4)
+        frames = []
+        for i in range(count):
+            frame = background.copy()
+            x = (width - block[0]) * i // max(count - 1, 1)
+            y = (height - block[1]) // 2
+            cv2.rectangle(frame, (x, y), (x + block[0], y + block[1]), (60, 160, 220), -1)
+            frames.append(frame)
+        return frames
+
+    def _next_frame(self):
+        self._wait_for_frame()
+        frame = self._frames[self._index]
+        self._index = (self._index + 1) % len(self._frames)
+        self.captured += 1
+        return frame
+
+    def capture_array(self):
+        """Block until the next frame is due and return it as a new array, like Picamera2."""
+        return self._next_frame().copy()
+
+    def capture_into(self, out):
+        """Block until the next frame is due and copy it into ``out``."""
+        np.copyto(out, self._next_frame())
+        return out
+
+
+class RecordedCamera(_PacedCamera):
+    """Replays a video file or a directory of images as a camera.
+
+    Frames are scaled to ``size`` if needed and replayed in order, from the
+    start again after the last one (or EOFError with ``loop=False``). They
+    are decoded on each capture, or all up front with ``preload``, which
+    keeps decoding out of the timings (mind the memory: 2.7 MB per 720p
+    frame). ``max_frames`` limits the recording to its first frames.
+    """
+
+    def __init__(self, path, size=CAMERA_SIZE, fps=30, loop=True, preload=False,
+                 max_frames=None):
+        super().__init__(fps)
+        self.path = path
+        self.size = size
+        self.loop = loop
+        self.max_frames = max_frames
+        self._paths = None
+        if os.path.isdir(path):
+            self._paths = sorted(
+                os.path.join(path, f) for f in os.listdir(path)
+                if f.lower().endswith(_IMAGE_EXTS)
+            )[:max_frames]
+            if not self._paths:
+                raise FileNotFoundError(f"No images in {path}")
+        elif not os.path.isfile(path):
+            raise FileNotFoundError(f"Recording not found: {path}")
+        self._video = None
+        self._index = 0
+        self._frames = list(self._read_all()) if preload else None
+        if self._frames is not None and not self._frames:
+            raise ValueError(f"No frames could be read from {path}")
+
+    def _fit(self, frame):
+        if (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        return frame
+
+    def _read(self):
+        """Decode the frame at the current position, or None at the end."""
+        if self.max_frames is not None and self._index >= self.max_frames:
+            return None
+        if self._paths is not None:
+            if self._index >= len(self._paths):
+                return None
+            frame = cv2.imread(self._paths[self._index])
+            if frame is None:
+                raise ValueError(f"Cannot read {self._paths[self._index]}")
+            return self._fit(frame)
+        if self._video is None:
+            self._video = cv2.VideoCapture(self.path)
+            if not self._video.isOpened():
+                raise ValueError(f"Cannot open video {self.path}")
+        ok, frame = self._video.read()
+        return self._fit(frame) if ok else None
+
+    def _rewind(self):
+        self._index = 0
+        if self._video is not None:
+            self._video.release()
+            self._video = None
+
+    def _read_all(self):
+        while True:
+            frame = self._read()
+            if frame is None:
+                self._rewind()
+                return
+            self._index += 1
+            yield frame
+
+    def __len__(self):
+        """Number of frames in the recording (for a video, as its header says)."""
+        if self._frames is not None:
+            return len(self._frames)
+        if self._paths is not None:
+            return len(self._paths)
+        video = cv2.VideoCapture(self.path)
+        count = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+        video.release()
+        return min(count, self.max_frames) if self.max_frames else count
+
+    def capture_array(self):
+        """Block until the next frame is due and return it (do not modify it)."""
+        self._wait_for_frame()
+        if self._frames is not None:
+            if self._index >= len(self._frames):
+                if not self.loop:
+                    raise EOFError(f"End of recording {self.path}")
+                self._index = 0
+            frame = self._frames[self._index]
+        else:
+            frame = self._read()
+            if frame is None:
+                if not self.loop:
+                    raise EOFError(f"End of recording {self.path}")
+                self._rewind()
+                frame = self._read()
+        self._index += 1
+        self.captured += 1
+        return frame
+
+    def close(self):
+        super().close()
+        if self._video is not None:
+            self._video.release()
+            self._video = None
+
+
+class PiCamera:
+    """The Pi camera delivering BGR frames of ``size`` to the CPU."""
+
+    def __init__(self, size=CAMERA_SIZE):
+        from picamera2 import MappedArray, Picamera2
+
+        self._mapped_array = MappedArray
+        self.size = size
+        self._camera = Picamera2()
+        # Picamera2's "RGB888" is BGR in memory, which is what OpenCV wants
+        self._camera.configure(self._camera.create_video_configuration(
+            main={"size": size, "format": "RGB888"},
+        ))
+
+    def start(self):
+        self._camera.start()
+
+    def stop(self):
+        self._camera.stop()
+
+    def close(self):
+        self._camera.close()
+
+    def capture_array(self):
+        """Block for the next frame; returns a new array."""
+        return self._camera.capture_array()
+
+    def capture_into(self, out):
+        """Block for the next frame and copy it straight from the camera buffer into ``out``."""
+        with self._camera.captured_request() as request:
+            with self._mapped_array(request, "main") as mapped:
+                np.copyto(out, mapped.array[:, :self.size[0]])
+        return out
+
+
+class _JpegOutput(io.BufferedIOBase):
+    """File-like sink for Picamera2's FileOutput: one ``write`` per JPEG."""
+
+    def __init__(self, camera):
+        self._camera = camera
+
+    def writable(self):
+        return True
+
+    def write(self, jpeg):
+        sink = self._camera.jpeg_sink
+        if sink is not None:
+            sink(jpeg, time.monotonic())
+        return len(jpeg)
+
+
+class HardwareJpegCamera:
+    """The Pi camera with hardware JPEG encoding of its full-size stream.
+
+    The main stream (``size``) goes from the camera straight to the
+    VideoCore's MJPEG encoder, and each JPEG is handed to ``jpeg_sink(jpeg,
+    now)``; the CPU neither copies nor encodes it. ``capture_array`` and
+    ``capture_into`` return BGR frames of the lores stream
+    (``lores_size``), for detection and the smaller stream profiles.
+
+    ``overlay(luma)``, if set, is called with the Y plane of every main
+    frame just before it is encoded, to draw on it in place.
+    """
+
+    def __init__(self, size=CAMERA_SIZE, lores_size=LORES_SIZE):
+        from picamera2 import MappedArray, Picamera2
+        from picamera2.encoders import MJPEGEncoder
+        from picamera2.outputs import FileOutput
+
+        self._mapped_array = MappedArray
+        self.size = lores_size
+        self.encoded_size = size
+        self.jpeg_sink = None
+        self.overlay = None
+        self._camera = Picamera2()
+        # The encoder and the ISP share YUV420; converting the small lores
+        # frames to BGR is cheap
+        self._camera.configure(self._camera.create_video_configuration(
+            main={"size": size, "format": "YUV420"},
+            lores={"size": lores_size, "format": "YUV420"},
+        ))
+        self._camera.pre_callback = self._draw_overlay
+        self._encoder = MJPEGEncoder()
+        self._output = FileOutput(_JpegOutput(self))
+
+    def _draw_overlay(self, request):
+        overlay = self.overlay
+        if overlay is None:
+            return
+        with self._mapped_array(request, "main") as mapped:
+            overlay(mapped.array[:self.encoded_size[1], :self.encoded_size[0]])
+
+    def start(self):
+        self._camera.start_recording(self._encoder, self._output)
+
+    def stop(self):
+        self._camera.stop_recording()
+
+    def close(self):
+        self._camera.close()
+
+    def capture_array(self):
+        """Block for the next lores frame; returns a new BGR array."""
+        return cv2.cvtColor(self._camera.capture_array("lores"), cv2.COLOR_YUV2BGR_I420)
+
+    def capture_into(self, out):
+        """Block for the next lores frame and convert it to BGR into ``out``."""
+        with self._camera.captured_request() as request:
+            with self._mapped_array(request, "lores") as mapped:
+                cv2.cvtColor(mapped.array, cv2.COLOR_YUV2BGR_I420, dst=out)
+        return out
+
+
+def frame_size(source):
+    """Size of the frames ``capture_array`` returns for a camera ``source``."""
+    if not isinstance(source, str):
+        return source.size
+    return LORES_SIZE if source == "picamera-hw" else CAMERA_SIZE
+
+
+def open_camera(source="picamera", size=CAMERA_SIZE):
+    """Return a configured (not yet started) camera.
+
+    ``source`` is "picamera" (the Pi camera), "picamera-hw" (the Pi camera
+    with hardware JPEG encoding, HardwareJpegCamera), "synthetic"
+    (FakeCamera), the path of a video file or image directory to replay,
+    or a camera object, which is returned as is.
+    """
+    if not isinstance(source, str):
+        return source
+    if source == "synthetic":
+        return FakeCamera(size)
+    if source == "picamera-hw":
+        return HardwareJpegCamera(size)
+    if source != "picamera":
+        return RecordedCamera(source, size)
+    return PiCamera(size)
+
+
+def open_dht(source="dht22"):
+    """Return a temperature/humidity sensor.
+
+    ``source`` is "dht22" (the DHT22 on GPIO 17), "synthetic" (FakeDHT22),
+    the path of a CSV recording to replay (RecordedDHT22), or a sensor
+    object, which is returned as is.
+    """
+    if not isinstance(source, str):
+        return source
+    if source == "synthetic":
+        return FakeDHT22()
+    if source != "dht22":
+        return RecordedDHT22(source)
+    import adafruit_dht
+    import board
+
+    return adafruit_dht.DHT22(board.D17)
@@ -0,0 +1,188 @@
+"""Append-only time-series store for temperature and humidity samples.
+
+Samples are buffered in memory and written to SQLite (WAL mode) in one
+transaction per flush interval, so the SD card sees one small sequential
+write burst per minute instead of one per sample. Min/max/avg rollups for
+1 minute, 1 hour and 1 day buckets are accumulated in memory alongside and
+upserted in the same transaction, so range queries at those resolutions
+read the rollup table and never scan raw samples.
+"""
+
+import sqlite3
+import threading
+import time
+
+# Rollup resolutions in seconds, keyed by their query name
+ROLLUPS = {"1m": 60, "1h": 3600, "1d": 86400}
+RESOLUTIONS = ("raw",) + tuple(ROLLUPS)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    ts INTEGER PRIMARY KEY,
+    temperature REAL NOT NULL,
+    humidity REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rollups (
+    resolution INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    t_min REAL NOT NULL, t_max REAL NOT NULL, t_sum REAL NOT NULL,
+    h_min REAL NOT NULL, h_max REAL NOT NULL, h_sum REAL NOT NULL,
+    PRIMARY KEY (resolution, bucket)
+) WITHOUT ROWID;
+"""
+
+_UPSERT_ROLLUP = """
+INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (resolution, bucket) DO UPDATE SET
+    count = count + excluded.count,
+    t_min = min(t_min, excluded.t_min),
+    t_max = max(t_max, excluded.t_max),
+    t_sum = t_sum + excluded.t_sum,
+    h_min = min(h_min, excluded.h_min),
+    h_max = max(h_max, excluded.h_max),
+    h_sum = h_sum + excluded.h_sum
+"""
+
+
+class SensorHistory:
+    """Embedded history of sensor samples with pre-computed rollups.
+
+    ``flush_interval`` is measured in sample time: buffered samples are
+    written once the oldest is that many seconds older than the newest.
+    Raw samples older than ``raw_retention_days`` are deleted (rollups are
+    kept forever). Queries see data up to the last flush.
+    """
+
+    def __init__(self, path, flush_interval=60, raw_retention_days=30, max_points=1000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.raw_retention = raw_retention_days * 86400
+        self.max_points = max_points
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._rollups = {}  # (resolution, bucket) -> [count, t_min, t_max, t_sum, h_min, h_max, h_sum]
+        self._last_prune = 0
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def append(self, ts, temperature, humidity):
+        """Buffer one sample (``ts`` in epoch seconds); flushes when due."""
+        ts = int(ts)
+        with self._lock:
+            self._buffer.append((ts, temperature, humidity))
+            for res in ROLLUPS.values():
+                key = (res, ts - ts % res)
+                acc = self._rollups.get(key)
+                if acc is None:
+                    self._rollups[key] = [1, temperature, temperature, temperature,
+                                          humidity, humidity, humidity]
+                else:
+                    acc[0] += 1
+                    acc[1] = min(acc[1], temperature)
+                    acc[2] = max(acc[2], temperature)
+                    acc[3] += temperature
+                    acc[4] = min(acc[4], humidity)
+                    acc[5] = max(acc[5], humidity)
+                    acc[6] += humidity
+            if ts - self._buffer[0][0] >= self.flush_interval:
+                self._flush_locked()
+
+    def flush(self):
+        """Write all buffered samples and rollups now."""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        newest = self._buffer[-1][0]
+        with self._db:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT OR REPLACE INTO samples VALUES (?, ?, ?)", self._buffer,
+            )
+            self._db.executemany(
+                _UPSERT_ROLLUP,
+                [(res, bucket, *acc) for (res, bucket), acc in self._rollups.items()],
+            )
+            # Prune raw samples at most once per day, in the same transaction
+            if self.raw_retention and newest - self._last_prune >= 86400:
+                self._db.execute(
+                    "DELETE FROM samples WHERE ts < ?", (newest - self.raw_retention,),
+                )
+                self._last_prune = newest
+        self._buffer = []
+        self._rollups = {}
+
+    def close(self):
+        self.flush()
+        self._db.close()
+
+    def pick_resolution(self, start, end):
+        """Finest resolution that returns at most ``max_points`` points."""
+        span = max(0, end - start)
+        if span / 2 <= self.max_points:
+            return "raw"
+        for name, res in ROLLUPS.items():
+            if span / res <= self.max_points:
+                return name
+        return "1d"
+
+    def query(self, start, end, resolution="auto"):
+        """Return samples or rollup points with ``start <= t < end``.
+
+        Raw points are ``{"t", "temperature", "humidity"}``; rollup points
+        carry ``count`` and ``{"min", "max", "avg"}`` for both values.
+        """
+        if resolution == "auto":
+            resolution = self.pick_resolution(start, end)
+        if resolution not in RESOLUTIONS:
+            raise ValueError(
+                f"Unknown resolution '{resolution}' (choose from auto, {', '.join(RESOLUTIONS)})"
+            )
+        start, end = int(start), int(end)
+
+        if resolution == "raw":
+            rows = self._db.execute(
+                "SELECT ts, temperature, humidity FROM samples "
+                "WHERE ts >= ? AND ts < ? ORDER BY ts",
+                (start, end),
+            ).fetchall()
+            points = [
+                {"t": ts, "temperature": round(t, 2), "humidity": round(h, 2)}
+                for ts, t, h in rows
+            ]
+        else:
+            res = ROLLUPS[resolution]
+            rows = self._db.execute(
+                "SELECT bucket, count, t_min, t_max, t_sum, h_min, h_max, h_sum "
+                "FROM rollups WHERE resolution = ? AND bucket >= ? AND bucket < ? "
+                "ORDER BY bucket",
+                (res, start - start % res, end),
+            ).fetchall()
+            points = [
+                {
+                    "t": bucket,
+                    "count": n,
+                    "temperature": {"min": round(t_min, 2), "max": round(t_max, 2),
+                                    "avg": round(t_sum / n, 2)},
+                    "humidity": {"min": round(h_min, 2), "max": round(h_max, 2),
+                                 "avg": round(h_sum / n, 2)},
+                }
+                for bucket, n, t_min, t_max, t_sum, h_min, h_max, h_sum in rows
+            ]
+        return {"from": start, "to": end, "resolution": resolution, "points": points}
+
+    def stats(self):
+        """Row counts and on-disk size, for diagnostics."""
+        samples = self._db.execute("SELECT count(*) FROM samples").fetchone()[0]
+        rollups = self._db.execute("SELECT count(*) FROM rollups").fetchone()[0]
+        pages, page_size = (
+            self._db.execute("PRAGMA page_count").fetchone()[0],
+            self._db.execute("PRAGMA page_size").fetchone()[0],
+        )
+        return {"samples": samples, "rollups": rollups, "bytes": pages * page_size,
+                "buffered": len(self._buffer), "now": int(time.time())}
@@ -0,0 +1,166 @@
+"""Size-bounded disk cache of resized access log snapshots.
+
+Dashboards show snapshots at a few display widths (``?w=`` on
+/access-logs/<id>/image). Each variant is resized from the full-size
+snapshot once, saved in its own directory (outside the snapshots
+directory, so retention never mistakes it for an orphan) and read back
+from there afterwards. Once the variants add up to more than
+``max_bytes``, the least recently served ones are removed.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+
+from metrics import registry
+
+_HITS = registry.counter("image_cache_requests", "Resized snapshot requests.", result="hit")
+_MISSES = registry.counter("image_cache_requests", "Resized snapshot requests.", result="miss")
+_RESIZE = registry.stage("image_resize")
+
+MIN_WIDTH = 32
+MAX_WIDTH = 4096
+
+
+class ResizedImageCache:
+    """Resized JPEG variants of snapshot images, least recently used evicted first.
+
+    Recency is kept in memory; on startup the files already in ``directory``
+    are ordered by modification time.
+    """
+
+    def __init__(self, directory, max_bytes, quality=80):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self._files = OrderedDict()  # filename -> size, least recent first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        found = []
+        with os.scandir(self.directory) as it:
+            for item in it:
+                if not item.is_file():
+                    continue
+                if item.name.endswith(".tmp"):  # interrupted write
+                    os.remove(item.path)
+                    continue
+                st = item.stat()
+                found.append((st.st_mtime, item.name, st.st_size))
+        for _, name, size in sorted(found):
+            self._files[name] = size
+            self._bytes += size
+        with self._lock:
+            self._evict()
+
+    @staticmethod
+    def variant_name(entry_id, width):
+        return f"{entry_id}_w{width}.jpg"
+
+    def get(self, entry_id, source, width):
+        """Return the JPEG bytes of ``source`` scaled to ``width`` pixels wide.
+
+        The variant is made on the first request and read from the cache
+        after that. Images are never upscaled: a width at or above the
+        source's gets the source bytes. Returns None if ``source`` cannot
+        be read.
+        """
+        name = self.variant_name(entry_id, width)
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            cached = name in self._files
+            if cached:
+                self._files.move_to_end(name)
+        if cached:
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                self.hits += 1
+                _HITS.inc()
+                return data
+            except FileNotFoundError:  # evicted meanwhile; make it again
+                pass
+        self.misses += 1
+        _MISSES.inc()
+        return self._make(name, path, source, width)
+
+    def _make(self, name, path, source, width):
+        data = self._resize(source, width)
+        if data is not None:
+            self._store(name, path, data)
+        return data
+
+    def _resize(self, source, width):
+        t0 = registry.clock()
+        try:
+            image = cv2.imread(source, cv2.IMREAD_COLOR)
+            if image is None:
+                return None
+            h, w = image.shape[:2]
+            if width >= w:
+                with open(source, "rb") as f:
+                    return f.read()
+            size = (width, max(1, round(h * width / w)))
+            resized = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+            ok, jpeg = cv2.imencode(".jpg", resized, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            return jpeg.tobytes() if ok else None
+        finally:
+            _RESIZE.since(t0)
+
+    def _store(self, name, path, data):
+        if len(data) > self.max_bytes:
+            return
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError as exc:
+            print(f"Warning: could not cache {name} ({exc})")
+            return
+        with self._lock:
+            self._bytes += len(data) - self._files.pop(name, 0)
+            self._files[name] = len(data)
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used variants until under the limit. Lock held."""
+        while self._bytes > self.max_bytes and self._files:
+            name, size = self._files.popitem(last=False)
+            self._bytes -= size
+            self.evicted += 1
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def discard(self, entry_id):
+        """Remove every cached variant of ``entry_id``."""
+        prefix = f"{entry_id}_w"
+        with self._lock:
+            names = [n for n in self._files if n.startswith(prefix)]
+            for name in names:
+                self._bytes -= self._files.pop(name)
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evicted": self.evicted,
+            }
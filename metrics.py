@@ -0,0 +1,255 @@
+"""Lightweight performance telemetry: per-stage timings, counters and gauges.
+
+Hot paths hold on to their Stage and Counter objects (created once, at
+import or construction) and time themselves with ``registry.clock()``::
+
+    t0 = registry.clock()
+    ...
+    _ENCODE.since(t0)
+
+When the registry is disabled ``clock()`` returns 0 and ``since``/``inc``
+return straight away, so an instrumented stage costs two method calls.
+Each stage keeps a reservoir of its most recent durations for
+p50/p95/p99 plus running totals; counter rates are derived when the
+metrics are read, never on the hot path.
+"""
+
+import collections
+import threading
+import time
+
+import numpy as np
+
+QUANTILES = (0.5, 0.95, 0.99)
+_PREFIX = "monitor_"
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _json_name(key):
+    name, labels = key
+    return ".".join([name] + [str(v) for _, v in labels])
+
+
+def _prom_number(value):
+    return "NaN" if value is None else f"{value:.6g}"
+
+
+def _prom_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class Stage:
+    """Durations of one pipeline stage, in milliseconds."""
+
+    def __init__(self, registry, key, size=1024):
+        self._registry = registry
+        self.key = key
+        self._samples = collections.deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_ms = 0.0
+
+    def since(self, t0):
+        """Record the time since ``t0`` (from ``registry.clock()``)."""
+        if t0:
+            self.observe((time.perf_counter() - t0) * 1e3)
+
+    def observe(self, ms):
+        if not self._registry.enabled:
+            return
+        pending = self._registry._pending
+        if pending is not None:
+            pending.append((self.key, ms))
+            return
+        with self._lock:
+            self._samples.append(ms)
+            self.count += 1
+            self.total_ms += ms
+
+    def summary(self):
+        """``{"count", "p50", "p95", "p99"}`` over the recent samples (None until measured)."""
+        with self._lock:
+            samples = list(self._samples)
+            count = self.count
+        out = {"count": count}
+        values = np.percentile(samples, [q * 100 for q in QUANTILES]) if samples else [None] * 3
+        for q, v in zip(QUANTILES, values):
+            out[f"p{round(q * 100)}"] = round(float(v), 3) if v is not None else None
+        return out
+
+
+class Counter:
+    """Monotonic event count."""
+
+    def __init__(self, registry, key, help_text):
+        self._registry = registry
+        self.key = key
+        self.help = help_text
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, n=1):
+        if self._registry.enabled and n:
+            with self._lock:
+                self.value += n
+
+
+class Metrics:
+    """Registry of stages, counters and gauges; see the module docstring."""
+
+    def __init__(self, enabled=True, rate_window=10.0):
+        self.enabled = enabled
+        self.rate_window = rate_window
+        self._stages = {}
+        self._counters = {}
+        self._gauges = {}  # key -> (callback, help)
+        self._lock = threading.Lock()
+        self._pending = None
+        self._started = time.monotonic()
+        self._history = collections.deque()  # (monotonic, {key: counter value})
+
+    def clock(self):
+        """Start time for ``Stage.since``; 0 while disabled."""
+        return time.perf_counter() if self.enabled else 0.0
+
+    def stage(self, name, **labels):
+        """The Stage for ``name`` and ``labels``, created on first use."""
+        key = _key(name, labels)
+        with self._lock:
+            stage = self._stages.get(key)
+            if stage is None:
+                stage = self._stages[key] = Stage(self, key)
+            return stage
+
+    def counter(self, name, help_text="", **labels):
+        """The Counter for ``name`` and ``labels``, created on first use."""
+        key = _key(name, labels)
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                counter = self._counters[key] = Counter(self, key, help_text)
+            return counter
+
+    def gauge(self, name, callback, help_text="", **labels):
+        """Report ``callback()`` as the gauge's value whenever metrics are read."""
+        with self._lock:
+            self._gauges[_key(name, labels)] = (callback, help_text)
+
+    # --- Forked workers ---
+
+    def buffer(self):
+        """Collect stage observations in a list instead of recording them.
+
+        For a forked worker process, whose registry is a copy: it ships
+        ``drain()`` to the parent, which ``replay``s it into the real one.
+        """
+        self._pending = []
+
+    def drain(self):
+        pending, self._pending = self._pending, []
+        return pending or []
+
+    def replay(self, observations):
+        for key, ms in observations:
+            name, labels = key
+            self.stage(name, **dict(labels)).observe(ms)
+
+    # --- Reading ---
+
+    def _rates(self, values):
+        """Per-second counter rates over roughly the last ``rate_window`` seconds."""
+        now = time.monotonic()
+        with self._lock:
+            history = self._history
+            while len(history) > 1 and now - history[1][0] >= self.rate_window:
+                history.popleft()
+            if history and now - history[0][0] >= 1.0:
+                since, old = history[0]
+            else:
+                since, old = self._started, {}
+            if not history or now - history[-1][0] >= 1.0:
+                history.append((now, dict(values)))
+        elapsed = max(now - since, 1e-9)
+        return {key: (value - old.get(key, 0)) / elapsed for key, value in values.items()}
+
+    def _gauge_values(self):
+        values = {}
+        for key, (callback, _) in list(self._gauges.items()):
+            try:
+                values[key] = callback()
+            except Exception as exc:
+                print(f"Warning: gauge {_json_name(key)} failed ({exc})")
+        return values
+
+    def snapshot(self):
+        """Everything as a JSON-ready dict (for the dashboard)."""
+        counters = {key: c.value for key, c in list(self._counters.items())}
+        rates = self._rates(counters)
+        return {
+            "enabled": self.enabled,
+            "uptime_secs": round(time.monotonic() - self._started, 1),
+            "stages_ms": {
+                _json_name(key): stage.summary()
+                for key, stage in sorted(self._stages.items())
+            },
+            "counters": {
+                _json_name(key): {"total": value, "per_sec": round(rates[key], 2)}
+                for key, value in sorted(counters.items())
+            },
+            "gauges": {
+                _json_name(key): value
+                for key, value in sorted(self._gauge_values().items())
+            },
+        }
+
+    def prometheus(self):
+        """Everything in the Prometheus text exposition format."""
+        lines = []
+        stages = sorted(self._stages.items())
+        if stages:
+            name = f"{_PREFIX}stage_duration_seconds"
+            lines.append(f"# HELP {name} Pipeline stage durations (recent samples).")
+            lines.append(f"# TYPE {name} summary")
+            for (stage_name, labels), stage in stages:
+                labels = (("stage", stage_name),) + labels
+                summary = stage.summary()
+                for q in QUANTILES:
+                    value = summary[f"p{round(q * 100)}"]
+                    value = _prom_number(None if value is None else value / 1e3)
+                    lines.append(f"{name}{_prom_labels(labels, [('quantile', q)])} {value}")
+                lines.append(f"{name}_sum{_prom_labels(labels)} {_prom_number(stage.total_ms / 1e3)}")
+                lines.append(f"{name}_count{_prom_labels(labels)} {stage.count}")
+
+        families = collections.defaultdict(list)
+        for (name, labels), counter in sorted(self._counters.items()):
+            families[name].append((labels, counter.value, counter.help))
+        for name, series in families.items():
+            full = f"{_PREFIX}{name}_total"
+            if series[0][2]:
+                lines.append(f"# HELP {full} {series[0][2]}")
+            lines.append(f"# TYPE {full} counter")
+            for labels, value, _ in series:
+                lines.append(f"{full}{_prom_labels(labels)} {value}")
+
+        gauges = self._gauge_values()
+        families = collections.defaultdict(list)
+        for (name, labels), value in sorted(gauges.items()):
+            families[name].append((labels, value, self._gauges[(name, labels)][1]))
+        for name, series in families.items():
+            full = f"{_PREFIX}{name}"
+            if series[0][2]:
+                lines.append(f"# HELP {full} {series[0][2]}")
+            lines.append(f"# TYPE {full} gauge")
+            for labels, value, _ in series:
+                lines.append(f"{full}{_prom_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry, shared by every instrumented module
+registry = Metrics()
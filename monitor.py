@@ -0,0 +1,706 @@
+"""The monitor's hardware, capture/detection pipeline and background services.
+
+Constructing a Monitor touches no hardware and starts no threads; start()
+opens the camera and sensor and starts everything in dependency order,
+and stop() shuts it down in reverse. The web app (dht22_api.create_app)
+only reads from and publishes to a started Monitor.
+"""
+
+import collections
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import numpy as np
+
+import hardware
+from access_log import AccessLogStore
+from alerts import AlertDispatcher, AlertEngine, AlertRuleStore, WebhookSink
+from clips import CLIP_SUFFIX, ClipRecorder
+from detection import (
+    DetectionOverlay, DetectionTracker, FaceDetector, MotionGate, ObjectDetector,
+    draw_detections_luma,
+)
+from detection_worker import DetectionWorker
+from events import EventHub
+from history import SensorHistory
+from image_cache import ResizedImageCache
+from metrics import registry
+from regions import RegionStore
+from retention import RetentionManager
+from sensor import SensorSampler
+from snapshot_writer import THUMBNAIL_SUFFIX, SnapshotWriter
+from streaming import DEFAULT_PROFILES, FramePool, FrameBus, ProfileStream
+
+PERSON_LABELS = {"person", "Face"}
+# Minimum time between person-event entries; each one saves a snapshot and a clip
+_LOG_COOLDOWN_SECS = 30
+# Written clips kept waiting for their entry's commit
+_MAX_UNLINKED_CLIPS = 64
+
+_CAPTURE = registry.stage("capture")  # time blocked waiting for the camera
+_OVERLAY = registry.stage("overlay")
+_MOTION = registry.stage("motion_gate")
+_DETECTION = registry.stage("detection")  # one detection-loop pass
+_CAPTURED = registry.counter("frames_captured", "Frames delivered by the camera.")
+_DETECTION_FRAMES = registry.counter(
+    "detection_frames", "Frames the detection loop processed (detector or tracker).",
+)
+_DETECTOR_RUNS = registry.counter("detector_runs", "Detector passes.")
+_DETECTION_DROPS = registry.counter(
+    "frames_dropped", "Frames skipped by a slow consumer.", consumer="detection",
+)
+
+
+def _call(fn, *args):
+    return fn(*args)
+
+
+def _inside_any(box, others, min_share=0.5):
+    """True if at least ``min_share`` of ``box``'s area lies within one of ``others``."""
+    x1, y1, x2, y2 = box
+    area = max(1, (x2 - x1) * (y2 - y1))
+    for ox1, oy1, ox2, oy2 in others:
+        w = min(x2, ox2) - max(x1, ox1)
+        h = min(y2, oy2) - max(y1, oy1)
+        if w > 0 and h > 0 and w * h >= min_share * area:
+            return True
+    return False
+
+
+class Monitor:
+    """Everything behind the API: camera, sensor, detection and storage.
+
+    ``camera_source`` and ``sensor_source`` pick the camera and sensor (see
+    hardware.open_camera and hardware.open_dht): the real devices by
+    default, or fakes and recordings. Detection runs in-process
+    (``detection_mode="thread"``) or in a worker process (``"process"``); either way the models load in the
+    background after start() returns, and ``readiness()`` reports progress.
+    The detectors only search the regions saved in ``regions_file`` (the
+    whole frame if there are none). An empty ``clip_profile`` disables clip
+    recording.
+
+    Request handlers make their store, filesystem and SQLite calls through
+    ``run_blocking``: a direct call, unless the gevent server points it at
+    its thread pool so they never block the hub.
+    """
+
+    def __init__(self, snapshots_dir, access_log_file, history_db_file,
+                 regions_file, legacy_access_log_file=None, camera_source="picamera",
+                 sensor_source="dht22",
+                 detection_mode="thread", face_backend="haar",
+                 object_backend="yolov4-tiny", face_work_width=0,
+                 object_input_size=None, max_stream_viewers=10,
+                 max_event_subscribers=64, sensor_interval=3.0,
+                 history_raw_days=30, snapshot_queue_policy="coalesce",
+                 retention_max_age_days=30, retention_max_bytes=1024 ** 3,
+                 retention_max_entries=0, clip_profile="medium",
+                 clip_pre_secs=5.0, clip_post_secs=10.0,
+                 clip_buffer_bytes=32 * 1024 * 1024, frame_pool_size=4,
+                 image_cache_dir=None, image_cache_bytes=64 * 1024 * 1024,
+                 alert_rules_file=None, alert_webhook_url=""):
+        self.snapshots_dir = snapshots_dir
+        self.access_log_file = access_log_file
+        self.history_db_file = history_db_file
+        self.regions_file = regions_file
+        self.legacy_access_log_file = legacy_access_log_file
+        self.camera_source = camera_source
+        self.sensor_source = sensor_source
+        self.detection_mode = detection_mode
+        self.face_backend = face_backend
+        self.object_backend = object_backend
+        self.face_work_width = face_work_width
+        self.object_input_size = object_input_size
+        self.sensor_interval = sensor_interval
+        self.history_raw_days = history_raw_days
+        self.snapshot_queue_policy = snapshot_queue_policy
+        self.retention_max_age_days = retention_max_age_days
+        self.retention_max_bytes = retention_max_bytes
+        self.retention_max_entries = retention_max_entries
+        self.clip_profile = clip_profile
+        self.clip_pre_secs = clip_pre_secs
+        self.clip_post_secs = clip_post_secs
+        self.clip_buffer_bytes = clip_buffer_bytes
+        # Capture buffers reused between frames (0 = a new array per frame)
+        self.frame_pool_size = frame_pool_size
+        # Resized snapshot variants (?w=); defaults to next to snapshots_dir
+        self.image_cache_dir = image_cache_dir or os.path.join(
+            os.path.dirname(os.path.abspath(snapshots_dir)), "image_cache")
+        self.image_cache_bytes = image_cache_bytes
+        # Alert rules (None: no rules file) and where alerts are POSTed
+        self.alert_rules_file = alert_rules_file
+        self.alert_webhook_url = alert_webhook_url
+
+        # Push channel for the dashboard (/events)
+        self.event_hub = EventHub(max_subscribers=max_event_subscribers)
+        # Drops detection to a keep-alive rate while the scene is static
+        self.motion_gate = MotionGate()
+        # Moves boxes between detector passes; detectors run every Nth frame
+        self.tracker = DetectionTracker(detect_every=5)
+        # Frame fan-out: consumers wait on a sequence number instead of polling
+        self.raw_bus = FrameBus()  # BGR numpy array (detection thread and snapshots)
+        # One encoder/broadcaster per stream profile, keyed by profile name
+        self.streams = {
+            name: ProfileStream(profile, max_viewers=max_stream_viewers)
+            for name, profile in DEFAULT_PROFILES.items()
+        }
+
+        # Shared state — reference swaps are atomic under the GIL
+        self.latest_detections = []
+        self._overlay = DetectionOverlay()  # re-rasterized only when detections change
+        self.detection_state = {"faces": True, "objects": True}
+        self.detection_summary = {"count": 0, "labels": {}}  # last one pushed to /events
+        self._logged_track_ids = set()  # confirmed person tracks that already have an entry
+        self._last_person_event = float("-inf")
+
+        self.camera = None
+        self.frame_pool = None
+        self.dht_device = None
+        self.detection_worker = None
+        self.face_detector = None
+        self.object_detector = None
+        self.region_store = None
+        # "loading", then "ready" or "unavailable", per detector
+        self.detector_state = {"faces": "loading", "objects": "loading"}
+        self.detectors_ready = False
+        self._started_at = None
+        self._detectors_loaded_secs = None
+        self._first_detection_secs = None
+        self.access_log = None
+        self.snapshot_writer = None
+        self.retention = None
+        self.image_cache = None
+        self.run_blocking = _call
+        self.alert_rules = None
+        self.alerts = None
+        self.alert_dispatcher = None
+        self.clip_recorder = None
+        self._clip_lock = threading.Lock()
+        self._unlinked_clips = collections.OrderedDict()  # clips written before their entry
+        self.sensor_sampler = None
+        self.sensor_history = None
+        self._stopping = threading.Event()
+        self._threads = []
+
+    # --- Lifecycle ---
+
+    def start(self, pipeline=True):
+        """Open the hardware and start the pipeline and background services.
+
+        With ``pipeline=False`` the capture, detection, detector-loader and
+        sensor-sampler threads are not started; the caller loads the
+        detectors and feeds frames and readings itself (benchmarks/replay.py).
+        """
+        self._started_at = time.monotonic()
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+        self.region_store = RegionStore(self.regions_file)
+
+        # The worker is forked before the camera opens and before any thread
+        # starts, so the child holds no camera or GPIO handles it does not use.
+        # It loads its models on its own; the loader thread waits for it.
+        if self.detection_mode == "process":
+            self.detection_worker = DetectionWorker(
+                frame_shape=self._frame_shape(),
+                face_backend=self.face_backend,
+                object_backend=self.object_backend,
+                face_work_width=self.face_work_width,
+                object_input_size=self.object_input_size,
+            )
+
+        self.access_log = AccessLogStore(self.access_log_file)
+        if self.legacy_access_log_file:
+            migrated = self.access_log.migrate_json(self.legacy_access_log_file)
+            if migrated:
+                print(f"Imported {migrated} entries from {self.legacy_access_log_file}")
+        self.snapshot_writer = SnapshotWriter(
+            self.access_log, self.snapshots_dir, policy=self.snapshot_queue_policy,
+        )
+        self.snapshot_writer.add_listener(self._publish_access_log_entries)
+        self.snapshot_writer.start()
+        self.image_cache = ResizedImageCache(self.image_cache_dir, self.image_cache_bytes)
+        self.retention = RetentionManager(
+            self.access_log, self.snapshots_dir,
+            max_age_days=self.retention_max_age_days,
+            max_bytes=self.retention_max_bytes,
+            max_entries=self.retention_max_entries,
+            delete_entries=self.delete_access_log_entries,
+        )
+        self.retention.start()
+        if self.alert_webhook_url:
+            self.alert_dispatcher = AlertDispatcher(WebhookSink(self.alert_webhook_url))
+            self.alert_dispatcher.start()
+        rules = []
+        if self.alert_rules_file:
+            self.alert_rules = AlertRuleStore(self.alert_rules_file)
+            rules = self.alert_rules.rules
+        self.alerts = AlertEngine(rules, self.event_hub, self.alert_dispatcher)
+        if pipeline:
+            self.alerts.start()
+        self._register_gauges()
+
+        self.camera = hardware.open_camera(self.camera_source)
+        if self.frame_pool_size and hasattr(self.camera, "capture_into"):
+            self.frame_pool = FramePool(self._frame_shape(), count=self.frame_pool_size)
+        if hasattr(self.camera, "jpeg_sink"):
+            # The camera encodes its full-size stream itself
+            stream = next(
+                s for s in self.streams.values()
+                if (s.profile.width, s.profile.height) == self.camera.encoded_size
+            )
+            stream.hardware = True
+            self.camera.jpeg_sink = stream.publish_jpeg
+            self.camera.overlay = self._draw_hardware_overlay
+        self.camera.start()
+
+        # Taps its profile's encoded frames, which keeps that profile encoding
+        # without taking a viewer slot
+        if self.clip_profile:
+            self.clip_recorder = ClipRecorder(
+                self.streams[self.clip_profile], self.snapshots_dir,
+                pre_secs=self.clip_pre_secs, post_secs=self.clip_post_secs,
+                max_bytes=self.clip_buffer_bytes,
+            )
+            self.clip_recorder.add_listener(self._on_clip)
+            self.clip_recorder.start()
+
+        self._stopping.clear()
+        if pipeline:
+            self._threads = [
+                threading.Thread(target=self._camera_capture_loop, name="capture", daemon=True),
+                threading.Thread(target=self._detection_loop, name="detection", daemon=True),
+                threading.Thread(target=self._load_detectors, name="detector-loader", daemon=True),
+            ]
+        for thread in self._threads:
+            thread.start()
+
+        # The sampler thread is the only code that touches the DHT22
+        self.dht_device = hardware.open_dht(self.sensor_source)
+        self.sensor_sampler = SensorSampler(self.dht_device, interval=self.sensor_interval)
+        self.sensor_history = SensorHistory(
+            self.history_db_file, raw_retention_days=self.history_raw_days,
+        )
+        self.sensor_sampler.add_listener(self.sensor_history.append)
+        self.sensor_sampler.add_listener(self._publish_sensor_reading)
+        self.sensor_sampler.add_listener(self._observe_reading)
+        if pipeline:
+            self.sensor_sampler.start()
+
+    def stop(self):
+        """Stop everything started by start(), flushing queued writes."""
+        self._stopping.set()
+        if self.sensor_sampler is not None:
+            self.sensor_sampler.stop()
+            self.sensor_history.close()
+            self.dht_device.exit()
+        if self.clip_recorder is not None:
+            self.clip_recorder.stop()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        if self.camera is not None:
+            self.camera.stop()
+            self.camera.close()
+        if self.snapshot_writer is not None:
+            self.snapshot_writer.stop()
+        if self.retention is not None:
+            self.retention.stop()
+        if self.alerts is not None:
+            self.alerts.stop()
+        if self.alert_dispatcher is not None:
+            self.alert_dispatcher.stop()
+        if self.access_log is not None:
+            self.access_log.close()
+        if self.detection_worker is not None:
+            self.detection_worker.close()
+
+    def _register_gauges(self):
+        for name, stream in self.streams.items():
+            registry.gauge(
+                "stream_viewers", lambda b=stream.broadcaster: b.viewer_count,
+                "Connected /video_feed clients.", profile=name,
+            )
+        registry.gauge(
+            "event_subscribers", lambda: self.event_hub.subscriber_count,
+            "Connected /events clients.",
+        )
+        registry.gauge(
+            "snapshot_queue_depth", lambda: self.snapshot_writer.stats()["queue_depth"],
+            "Person events waiting for the snapshot writer.",
+        )
+
+    def _load_detectors(self):
+        """Load and warm up the detectors; the detection loop waits for this."""
+        if self.detection_worker is not None:
+            if not self.detection_worker.wait_ready():
+                print("Warning: detection worker did not finish loading its models")
+                self.detector_state = {"faces": "unavailable", "objects": "unavailable"}
+                return
+            available = {
+                "faces": self.detection_worker.faces_available,
+                "objects": self.detection_worker.objects_available,
+            }
+        else:
+            available = {}
+            try:
+                detector = FaceDetector(backend=self.face_backend,
+                                        work_width=self.face_work_width)
+                detector.warm_up(self._frame_shape())
+                self.face_detector = detector
+            except Exception as exc:
+                print(f"Warning: face detection unavailable ({exc})")
+            try:
+                detector = ObjectDetector(backend=self.object_backend,
+                                          input_size=self.object_input_size)
+                detector.warm_up()
+                self.object_detector = detector
+            except Exception as exc:
+                print(f"Warning: object detection unavailable ({exc})")
+            available = {
+                "faces": self.face_detector is not None,
+                "objects": self.object_detector is not None,
+            }
+        self.detector_state = {
+            key: "ready" if ok else "unavailable" for key, ok in available.items()
+        }
+        self._detectors_loaded_secs = time.monotonic() - self._started_at
+        self.detectors_ready = True
+        print(f"Detectors loaded in {self._detectors_loaded_secs:.1f}s "
+              f"(faces: {self.detector_state['faces']}, "
+              f"objects: {self.detector_state['objects']})")
+
+    # --- Capture and detection pipeline ---
+
+    def _frame_shape(self):
+        """Shape of the BGR frames the camera delivers to the pipeline."""
+        width, height = hardware.frame_size(self.camera_source)
+        return (height, width, 3)
+
+    def _publish_access_log_entries(self, entries):
+        for entry in entries:
+            self.event_hub.publish("access_log", entry)
+        with self._clip_lock:
+            for entry in entries:
+                if self._unlinked_clips.pop(entry["id"], None):
+                    self._link_clip(entry["id"])
+
+    def _on_clip(self, entry_ids, written):
+        """Link a written clip to its entries, once they are committed."""
+        if not written:
+            return
+        with self._clip_lock:
+            for entry_id in entry_ids:
+                if not self._link_clip(entry_id):
+                    # Not committed yet (or gone); retention removes the clip
+                    # as an orphan if the entry never arrives
+                    self._unlinked_clips[entry_id] = True
+                    while len(self._unlinked_clips) > _MAX_UNLINKED_CLIPS:
+                        self._unlinked_clips.popitem(last=False)
+
+    def _link_clip(self, entry_id):
+        entry = self.access_log.update(entry_id, clip=f"{entry_id}{CLIP_SUFFIX}")
+        if entry is None:
+            return False
+        self.event_hub.publish("access_log_updated", entry)
+        return True
+
+    def _publish_sensor_reading(self, *_):
+        self.event_hub.publish("sensor", self.sensor_sampler.reading())
+
+    def _observe_reading(self, sampled_at, temperature_c, humidity):
+        self.alerts.observe("temperature", temperature_c, sampled_at)
+        self.alerts.observe("humidity", humidity, sampled_at)
+
+    def _record_person_event(self, frame_bgr, detections):
+        """Queue a snapshot and log entry when a person is detected.
+
+        The snapshot writer draws, encodes and saves it in the background.
+        """
+        person_dets = [d for d in detections if d["label"] in PERSON_LABELS]
+        if not person_dets:
+            return
+
+        entry_id = uuid.uuid4().hex[:12]
+        entry = {
+            "id": entry_id,
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "labels": sorted({d["label"] for d in person_dets}),
+            "count": len(person_dets),
+            "image": f"{entry_id}.jpg",
+            "tracks": sorted(d["track_id"] for d in person_dets if "track_id" in d),
+        }
+        if self.clip_recorder is not None:
+            # The entry gets its "clip" once the clip is written
+            self.clip_recorder.trigger(entry_id)
+        self.snapshot_writer.submit(frame_bgr, person_dets, entry)
+
+    def _log_new_person_tracks(self, frame_bgr, tracks, now=None):
+        """Record an access-log entry when a new person track is confirmed.
+
+        A face inside a confirmed person's box is the same person and does
+        not count as new. Entries are at least ``_LOG_COOLDOWN_SECS`` apart;
+        people who arrive during the cooldown are logged once it ends, if
+        they are still in view.
+        """
+        now = time.monotonic() if now is None else now
+        people = [
+            t for t in tracks
+            if t["label"] in PERSON_LABELS and self.tracker.is_confirmed(t)
+        ]
+        bodies = [t["box"] for t in people if t["label"] == "person"]
+        current = {
+            t["track_id"] for t in people
+            if t["label"] != "Face" or not _inside_any(t["box"], bodies)
+        }
+        # Track ids are never reused, so forgetting ended tracks is safe
+        self._logged_track_ids &= current
+        if not current - self._logged_track_ids:
+            return
+        if now - self._last_person_event < _LOG_COOLDOWN_SECS:
+            return
+        self._last_person_event = now
+        self._logged_track_ids = current
+        self._record_person_event(frame_bgr, people)
+
+    def render_frame(self, frame_bgr, out=None):
+        """Return the frame with the current detections drawn on it.
+
+        ``out`` is an optional reusable buffer; the input frame is left untouched.
+        """
+        return self._overlay.composite(frame_bgr, self.latest_detections, out)
+
+    def _camera_capture_loop(self):
+        """Capture frames, overlay detections, encode to JPEG.
+
+        Paced by ``capture_array``, which blocks until the camera delivers the
+        next frame. Only stream profiles with viewers are encoded, each at most
+        at its own FPS cap.
+        """
+        out_buf = None
+        while not self._stopping.is_set():
+            t0 = registry.clock()
+            frame_bgr = self._capture_frame()
+            _CAPTURE.since(t0)
+            out_buf = self._publish_frame(frame_bgr, time.monotonic(), out_buf)
+
+    def _capture_frame(self):
+        """Block for the next camera frame, in a pooled buffer if the camera can fill one."""
+        if self.frame_pool is not None:
+            return self.camera.capture_into(self.frame_pool.acquire())
+        return self.camera.capture_array()
+
+    def _draw_hardware_overlay(self, luma):
+        """Draw the current detections onto a main-stream frame before hardware encoding."""
+        detections = self.latest_detections
+        if detections:
+            scale = self.camera.encoded_size[0] / self.camera.size[0]
+            draw_detections_luma(luma, detections, scale)
+
+    def _publish_frame(self, frame_bgr, now, out_buf=None):
+        """Hand a captured frame to the detection thread and the due stream profiles.
+
+        Returns the overlay buffer, for reuse with the next frame.
+        """
+        _CAPTURED.inc()
+        self.raw_bus.publish(frame_bgr)
+
+        due = [s for s in self.streams.values() if not s.hardware and s.due(now)]
+        if not due:
+            return out_buf
+
+        if out_buf is None or out_buf.shape != frame_bgr.shape:
+            out_buf = np.empty_like(frame_bgr)
+        t0 = registry.clock()
+        output = self.render_frame(frame_bgr, out_buf)
+        _OVERLAY.since(t0)
+        for stream in due:
+            stream.publish(output, now)
+        return out_buf
+
+    def _run_detectors(self, frame, state):
+        """Run the enabled detectors on ``frame``, in-process or in the worker."""
+        regions = self.region_store.regions or None
+        if self.detection_worker is not None:
+            try:
+                return self.detection_worker.detect(
+                    frame, faces=state["faces"], objects=state["objects"], regions=regions,
+                )
+            except TimeoutError as exc:
+                print(f"Warning: {exc}")
+                return []
+        dets = []
+        if state["faces"] and self.face_detector is not None:
+            dets.extend(self.face_detector.detect(frame, regions))
+        if state["objects"] and self.object_detector is not None:
+            dets.extend(self.object_detector.detect(frame, regions))
+        return dets
+
+    def _publish_detection_summary(self, tracks):
+        """Push a per-label count of the current tracks when it changes.
+
+        Also feeds the ``people`` and ``detections`` alert signals.
+        """
+        self.alerts.observe("people", sum(
+            1 for t in tracks
+            if t["label"] in PERSON_LABELS and self.tracker.is_confirmed(t)
+        ))
+        self.alerts.observe("detections", len(tracks))
+        labels = {}
+        for t in tracks:
+            labels[t["label"]] = labels.get(t["label"], 0) + 1
+        summary = {"count": len(tracks), "labels": labels}
+        if summary != self.detection_summary:
+            self.detection_summary = summary
+            self.event_hub.publish("detections", summary)
+
+    def _detection_loop(self):
+        """Run face/object detection on the latest frame in a background thread.
+
+        Always takes the newest frame not yet processed; frames captured while
+        a detection pass was running are dropped. Frames the motion gate rejects
+        skip inference entirely; between detector passes the tracker moves the
+        boxes along.
+        """
+        seq = 0
+        while not self._stopping.is_set():
+            item = self.raw_bus.wait(seq, timeout=1.0)
+            if item is None:
+                continue
+            if seq:
+                _DETECTION_DROPS.inc(item[0] - seq - 1)
+            seq, frame = item
+            if not self.detectors_ready:
+                continue
+
+            state = self.detection_state
+            if not state["faces"] and not state["objects"]:
+                self.latest_detections = []
+                self._publish_detection_summary([])
+                time.sleep(0.3)
+                continue
+            self._detect_frame(frame, state)
+
+    def _detect_frame(self, frame, state, now=None):
+        """One detection-loop pass over ``frame``: gate, detect or track, log.
+
+        Returns the tracks, or None if the motion gate skipped the frame.
+        """
+        t0 = registry.clock()
+        gated = not self.motion_gate.should_detect(frame, now)
+        _MOTION.since(t0)
+        if gated:
+            return None
+
+        if self.tracker.needs_detection():
+            dets = self._run_detectors(frame, state)
+            _DETECTOR_RUNS.inc()
+            if self._first_detection_secs is None:
+                self._first_detection_secs = time.monotonic() - self._started_at
+            tracks = self.tracker.update(dets, now)
+            self._log_new_person_tracks(frame, tracks, now)
+        else:
+            tracks = self.tracker.predict(now)
+        _DETECTION.since(t0)
+        _DETECTION_FRAMES.inc()
+
+        self.latest_detections = tracks
+        self._publish_detection_summary(tracks)
+        if any(t["label"] in PERSON_LABELS and self.tracker.is_confirmed(t) for t in tracks):
+            # Someone sitting still must not send the gate back to idle; a
+            # chair or rack in view must not keep it active
+            self.motion_gate.hold(now)
+        return tracks
+
+    # --- State for the API ---
+
+    def _remove_entry_files(self, entry_id):
+        self.image_cache.discard(entry_id)
+        for filename in (f"{entry_id}.jpg", f"{entry_id}{THUMBNAIL_SUFFIX}",
+                         f"{entry_id}{CLIP_SUFFIX}"):
+            try:
+                os.remove(os.path.join(self.snapshots_dir, filename))
+            except FileNotFoundError:
+                pass
+
+    def delete_access_log_entries(self, entry_ids):
+        """Delete entries with their files and cached images; returns those that existed.
+
+        Each deletion is pushed to /events as ``access_log_deleted``. Used by
+        the API and by retention.
+        """
+        removed = self.access_log.delete_many(entry_ids)
+        for entry in removed:
+            self._remove_entry_files(entry["id"])
+            self.event_hub.publish("access_log_deleted", {"id": entry["id"]})
+        return removed
+
+    def clear_access_log(self):
+        """Delete every entry with its files; returns how many there were."""
+        removed = self.access_log.clear()
+        for entry_id, _ in removed:
+            self._remove_entry_files(entry_id)
+        self.event_hub.publish("access_log_cleared", {"cleared": len(removed)})
+        return len(removed)
+
+    def set_detection_state(self, faces=None, objects=None):
+        """Toggle detectors; returns the new state and pushes it to /events."""
+        new = dict(self.detection_state)
+        if faces is not None:
+            new["faces"] = bool(faces)
+        if objects is not None:
+            new["objects"] = bool(objects)
+        self.detection_state = new
+        self.event_hub.publish("detection_status", new)
+        return new
+
+    def set_regions(self, regions):
+        """Save and apply new detection regions (raises ValueError if invalid)."""
+        saved = self.region_store.set(regions).regions
+        self.event_hub.publish("detection_regions", {"regions": saved})
+        return saved
+
+    def set_alert_rules(self, rules):
+        """Save and apply new alert rules (raises ValueError if invalid)."""
+        if self.alert_rules is None:
+            raise ValueError("No alert rules file is configured")
+        saved = self.alert_rules.set(rules)
+        self.alerts.set_rules(saved)
+        self.event_hub.publish("alert_rules", {"rules": saved})
+        return saved
+
+    def readiness(self):
+        """Detector loading progress, in seconds since start()."""
+        def secs(value):
+            return round(value, 2) if value is not None else None
+        return {
+            "ready": self.detectors_ready,
+            "detectors": dict(self.detector_state),
+            "detectors_loaded_secs": secs(self._detectors_loaded_secs),
+            "first_detection_secs": secs(self._first_detection_secs),
+        }
+
+    def backend_status(self):
+        """Configured detector backends with their load state and per-frame latency."""
+        if self.detection_worker is not None:
+            latency = self.detection_worker.latency
+        else:
+            latency = {
+                "faces": self.face_detector.latency if self.face_detector else None,
+                "objects": self.object_detector.latency if self.object_detector else None,
+            }
+        names = {"faces": self.face_backend, "objects": self.object_backend}
+        state = self.detector_state
+        return {
+            key: {
+                "name": names[key],
+                "state": state[key],
+                "available": state[key] == "ready",
+                "latency_ms": latency[key].summary() if latency[key] else None,
+            }
+            for key in ("faces", "objects")
+        }
+
+    def client_buses(self):
+        """The FrameBuses HTTP clients wait on (streams and /events)."""
+        return [s.broadcaster.bus for s in self.streams.values()] + [self.event_hub.bus]
@@ -0,0 +1,167 @@
+"""Detection regions of interest: the parts of the frame the detectors look at.
+
+Regions are rectangles or polygons given in fractions of the frame (0-1),
+so they survive a change of camera resolution::
+
+    [{"name": "door", "rect": [0.0, 0.1, 0.3, 1.0]},
+     {"name": "aisle", "polygon": [[0.4, 0.2], [0.7, 0.2], [0.9, 1.0], [0.3, 1.0]]}]
+
+The detectors run on each region's bounding rectangle (overlapping ones
+merged, so nothing is detected twice) and keep only detections whose box
+centre lies inside a region. No regions means the whole frame.
+"""
+
+import json
+import os
+import threading
+
+import cv2
+import numpy as np
+
+MAX_REGIONS = 16
+MAX_POLYGON_POINTS = 32
+
+
+def _point(value, name):
+    if (not isinstance(value, (list, tuple)) or len(value) != 2
+            or not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value)):
+        raise ValueError(f"Region '{name}': points must be [x, y] pairs of numbers")
+    x, y = float(value[0]), float(value[1])
+    if not (0.0 <= x <= 1.0 and 0.0 <= y <= 1.0):
+        raise ValueError(f"Region '{name}': coordinates must be fractions of the frame (0-1)")
+    return [x, y]
+
+
+def parse_regions(data):
+    """Validate a list of region dicts; returns a normalized copy or raises ValueError."""
+    if not isinstance(data, list):
+        raise ValueError("'regions' must be a list")
+    if len(data) > MAX_REGIONS:
+        raise ValueError(f"At most {MAX_REGIONS} regions are supported")
+    regions = []
+    for i, region in enumerate(data):
+        if not isinstance(region, dict):
+            raise ValueError("Each region must be an object")
+        name = str(region.get("name") or f"region-{i + 1}")
+        if ("rect" in region) == ("polygon" in region):
+            raise ValueError(f"Region '{name}' needs exactly one of 'rect' or 'polygon'")
+        if "rect" in region:
+            rect = region["rect"]
+            if not isinstance(rect, (list, tuple)) or len(rect) != 4:
+                raise ValueError(f"Region '{name}': 'rect' must be [x1, y1, x2, y2]")
+            (x1, y1), (x2, y2) = _point(rect[:2], name), _point(rect[2:], name)
+            if x2 <= x1 or y2 <= y1:
+                raise ValueError(f"Region '{name}': 'rect' must have x2 > x1 and y2 > y1")
+            regions.append({"name": name, "rect": [x1, y1, x2, y2]})
+        else:
+            points = region["polygon"]
+            if not isinstance(points, list) or not 3 <= len(points) <= MAX_POLYGON_POINTS:
+                raise ValueError(
+                    f"Region '{name}': 'polygon' needs 3 to {MAX_POLYGON_POINTS} points"
+                )
+            regions.append({"name": name, "polygon": [_point(p, name) for p in points]})
+    return regions
+
+
+def _merge_overlapping(rects):
+    """Replace overlapping pixel rectangles by their bounding rectangle."""
+    rects = list(rects)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(rects)):
+            for j in range(i + 1, len(rects)):
+                a, b = rects[i], rects[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    rects[i] = (min(a[0], b[0]), min(a[1], b[1]),
+                                max(a[2], b[2]), max(a[3], b[3]))
+                    del rects[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return rects
+
+
+class Regions:
+    """A validated region list, with its pixel geometry cached per frame size.
+
+    Immutable once built; swap in a new instance to change the regions.
+    """
+
+    def __init__(self, regions):
+        self.regions = parse_regions(regions)
+        self._geometry = {}  # (width, height) -> (crops, contours)
+
+    def __bool__(self):
+        return bool(self.regions)
+
+    # Sent to the detection worker process without the cached geometry
+    def __getstate__(self):
+        return {"regions": self.regions}
+
+    def __setstate__(self, state):
+        self.regions = state["regions"]
+        self._geometry = {}
+
+    def _pixels(self, width, height):
+        geometry = self._geometry.get((width, height))
+        if geometry is None:
+            contours, bounds = [], []
+            for region in self.regions:
+                if "rect" in region:
+                    x1, y1, x2, y2 = region["rect"]
+                    points = [[x1, y1], [x2, y1], [x2, y2], [x1, y2]]
+                else:
+                    points = region["polygon"]
+                contour = np.array(
+                    [[x * width, y * height] for x, y in points], dtype=np.float32,
+                )
+                contours.append(contour)
+                x, y, w, h = cv2.boundingRect(np.round(contour).astype(np.int32))
+                bounds.append((max(x, 0), max(y, 0), min(x + w, width), min(y + h, height)))
+            crops = [r for r in _merge_overlapping(bounds) if r[2] > r[0] and r[3] > r[1]]
+            geometry = self._geometry[(width, height)] = (crops, contours)
+        return geometry
+
+    def crops(self, width, height):
+        """Non-overlapping ``(x1, y1, x2, y2)`` pixel rectangles covering every region."""
+        return self._pixels(width, height)[0]
+
+    def contains(self, box, width, height):
+        """Whether the centre of pixel ``box`` lies inside any region."""
+        cx, cy = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+        return any(
+            cv2.pointPolygonTest(contour, (cx, cy), False) >= 0
+            for contour in self._pixels(width, height)[1]
+        )
+
+
+class RegionStore:
+    """The detection regions, persisted as JSON at ``path``."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.regions = self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return Regions([])
+        try:
+            with open(self.path) as f:
+                return Regions(json.load(f)["regions"])
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            print(f"Warning: ignoring detection regions in {self.path} ({exc})")
+            return Regions([])
+
+    def set(self, regions):
+        """Validate, save and apply ``regions``; raises ValueError if they are invalid."""
+        new = Regions(regions)
+        with self._lock:
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"regions": new.regions}, f, indent=2)
+            os.replace(tmp, self.path)
+            self.regions = new
+        return new
@@ -0,0 +1,175 @@
+"""Age, size and count limits for the access log and its snapshot files.
+
+A background thread periodically measures the snapshots directory and
+removes the oldest access log entries, in small batches, until every limit
+holds again. Entries are deleted before their files, so an interrupted pass
+can only leave files without an entry; those orphans are swept on the next
+pass once they are older than a grace period (the snapshot writer saves
+files shortly before it commits their entry).
+"""
+
+import os
+import shutil
+import threading
+import time
+
+
+def _entry_id(filename):
+    """``abc123.jpg`` / ``abc123_thumb.jpg`` -> ``abc123``."""
+    return filename.split(".", 1)[0].split("_", 1)[0]
+
+
+class RetentionManager:
+    """Enforces retention limits on an AccessLogStore and its snapshot files.
+
+    Any of ``max_age_days``, ``max_bytes`` and ``max_entries`` may be None
+    (or 0) to disable that limit. Each pass deletes at most ``batch_size``
+    entries at a time and sleeps ``batch_pause`` seconds between batches so
+    the SD card stays available to the rest of the server.
+
+    ``delete_entries(entry_ids)`` deletes a batch of entries and their
+    files; by default only the store rows and the snapshot files go. The
+    size limit applies to the files of entries: files without one (orphans
+    in their grace period, anything else in the directory) cannot be freed
+    by deleting entries, so they do not count.
+    """
+
+    def __init__(self, store, snapshots_dir, max_age_days=None, max_bytes=None,
+                 max_entries=None, interval=300, batch_size=50, batch_pause=0.2,
+                 orphan_grace_secs=600, delete_entries=None):
+        self._store = store
+        self._delete_entries = delete_entries or store.delete_many
+        self.snapshots_dir = snapshots_dir
+        self.max_age = max_age_days * 86400 if max_age_days else None
+        self.max_bytes = max_bytes or None
+        self.max_entries = max_entries or None
+        self.interval = interval
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.orphan_grace = orphan_grace_secs
+        self._usage = {"bytes": 0, "files": 0, "entries": 0}
+        self._last_pass = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+    def trigger(self):
+        """Run a pass now instead of waiting for the next interval."""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as exc:
+                print(f"Warning: retention pass failed ({exc})")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _scan(self):
+        """Return ``{entry_id: [bytes, newest mtime, [filenames]]}`` for the directory."""
+        files = {}
+        seen = set()  # entries sharing a clip hard-link it; count it once
+        with os.scandir(self.snapshots_dir) as it:
+            for item in it:
+                if not item.is_file() or item.name.startswith("."):
+                    continue
+                st = item.stat()
+                info = files.setdefault(_entry_id(item.name), [0, 0.0, []])
+                if st.st_nlink == 1 or item.inode() not in seen:
+                    seen.add(item.inode())
+                    info[0] += st.st_size
+                info[1] = max(info[1], st.st_mtime)
+                info[2].append(item.name)
+        return files
+
+    def _remove_files(self, names):
+        for name in names:
+            try:
+                os.remove(os.path.join(self.snapshots_dir, name))
+            except FileNotFoundError:
+                pass
+
+    def run_once(self, now=None):
+        """Run one pass; returns a summary of what was removed."""
+        now = time.time() if now is None else now
+        started = time.monotonic()
+        files = self._scan()
+        known = self._store.ids()
+
+        # Files whose entry is gone (deleted, or a crash mid-write)
+        orphans = [
+            entry_id for entry_id, (_, mtime, _) in files.items()
+            if entry_id not in known and now - mtime > self.orphan_grace
+        ]
+        for entry_id in orphans:
+            self._remove_files(files.pop(entry_id)[2])
+
+        total_bytes = sum(info[0] for info in files.values())
+        entry_bytes = sum(info[0] for entry_id, info in files.items() if entry_id in known)
+        entries = len(known)
+        expired = 0
+        while True:
+            batch = self._store.oldest(self.batch_size)
+            victims = []
+            for entry_id, ts in batch:
+                over = (
+                    (self.max_entries and entries - len(victims) > self.max_entries)
+                    or (self.max_bytes and entry_bytes > self.max_bytes)
+                    or (self.max_age and ts < now - self.max_age)
+                )
+                if not over:
+                    break
+                victims.append(entry_id)
+                size = files.get(entry_id, [0])[0]
+                total_bytes -= size
+                entry_bytes -= size
+            if not victims:
+                break
+            self._delete_entries(victims)
+            for entry_id in victims:
+                info = files.pop(entry_id, None)
+                if info is not None:
+                    self._remove_files(info[2])
+            entries -= len(victims)
+            expired += len(victims)
+            if self._stop.wait(self.batch_pause):
+                break
+
+        self._usage = {
+            "bytes": total_bytes,
+            "files": sum(len(info[2]) for info in files.values()),
+            "entries": entries,
+        }
+        self._last_pass = {
+            "finished": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now)),
+            "duration_ms": round((time.monotonic() - started) * 1e3, 1),
+            "expired_entries": expired,
+            "orphans_removed": len(orphans),
+        }
+        return self._last_pass
+
+    def usage(self):
+        """Usage as of the last pass, with the limits and free disk space."""
+        disk = shutil.disk_usage(self.snapshots_dir)
+        return {
+            **self._usage,
+            "limits": {
+                "max_age_days": self.max_age / 86400 if self.max_age else None,
+                "max_bytes": self.max_bytes,
+                "max_entries": self.max_entries,
+            },
+            "disk_free_bytes": disk.free,
+            "disk_total_bytes": disk.total,
+            "last_pass": self._last_pass,
+        }
@@ -0,0 +1,215 @@
+"""Background sampling of the DHT22 temperature/humidity sensor.
+
+A single thread owns the sensor and reads it at a fixed interval; request
+handlers only ever look at the cached reading, so they never block on the
+sensor or read it faster than its 2 s minimum.
+"""
+
+import csv
+import random
+import threading
+import time
+
+from metrics import registry
+
+# The DHT22 cannot be read more often than every 2 seconds
+MIN_READ_INTERVAL = 2.0
+
+_READ = registry.stage("sensor_read")
+
+
+def _format_reading(temperature_c, humidity, sampled_at):
+    return {
+        "success": True,
+        "temperature_celsius": round(temperature_c, 1),
+        "temperature_fahrenheit": round(temperature_c * 9 / 5 + 32, 1),
+        "humidity_percent": round(humidity, 1),
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(sampled_at)),
+    }
+
+
+class SensorSampler:
+    """Reads a DHT device in a background thread and caches the latest reading.
+
+    ``device`` is anything with ``temperature`` and ``humidity`` attributes
+    that raise RuntimeError on a failed read (adafruit_dht.DHT22 or
+    FakeDHT22). A reading older than ``stale_after`` seconds is still served
+    but flagged ``stale``.
+    """
+
+    def __init__(self, device, interval=3.0, stale_after=30.0):
+        self._device = device
+        self.interval = max(interval, MIN_READ_INTERVAL)
+        self.stale_after = stale_after
+        self._latest = None  # (reading dict, monotonic time)
+        self._last_error = None
+        self.reads = 0
+        self.failures = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """Call ``callback(sampled_at, temperature_c, humidity)`` after each
+        good read, from the sampler thread; keep it quick."""
+        self._listeners.append(callback)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sensor-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+
+    def _sample_once(self):
+        """Take one reading; returns False if the sensor read failed."""
+        self.reads += 1
+        t0 = registry.clock()
+        try:
+            temperature_c = self._device.temperature
+            humidity = self._device.humidity
+            _READ.since(t0)
+        except Exception as exc:
+            # DHT sensors fail reads fairly often (RuntimeError); keep the
+            # previous reading and try again shortly
+            self.failures += 1
+            self._last_error = str(exc)
+            return False
+        if temperature_c is None or humidity is None:
+            self.failures += 1
+            self._last_error = "Sensor returned no data"
+            return False
+
+        sampled_at = time.time()
+        reading = _format_reading(temperature_c, humidity, sampled_at)
+        self._latest = (reading, time.monotonic())
+        self._last_error = None
+        for callback in self._listeners:
+            try:
+                callback(sampled_at, temperature_c, humidity)
+            except Exception as exc:
+                print(f"Warning: sensor listener failed ({exc})")
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            delay = self.interval if self._sample_once() else MIN_READ_INTERVAL
+            self._stop.wait(max(0.0, delay - (time.monotonic() - started)))
+
+    def reading(self):
+        """Return the latest good reading with its age, without touching the sensor."""
+        latest = self._latest
+        if latest is None:
+            return {
+                "success": False,
+                "error": self._last_error or "No sensor reading yet",
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+        reading, sampled = latest
+        age = time.monotonic() - sampled
+        return {
+            **reading,
+            "age_seconds": round(age, 1),
+            "stale": age > self.stale_after,
+        }
+
+
+class FakeDHT22:
+    """Stand-in for adafruit_dht.DHT22 for running without the hardware.
+
+    Values drift slowly around a base point, each read takes ``read_time``
+    seconds like the real bit-banged protocol, and a ``failure_rate``
+    fraction of reads raise RuntimeError. Reads closer than 2 s apart return
+    the previous measurement, as the real driver does.
+    """
+
+    def __init__(self, temperature=23.0, humidity=45.0, failure_rate=0.1,
+                 read_time=0.25, seed=None):
+        self._rng = random.Random(seed)
+        self._temperature = temperature
+        self._humidity = humidity
+        self.failure_rate = failure_rate
+        self.read_time = read_time
+        self._last_measure = float("-inf")
+        self._lock = threading.Lock()
+        self.measurements = 0
+
+    def _measure(self):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_measure < MIN_READ_INTERVAL:
+                return
+            time.sleep(self.read_time)
+            self._last_measure = time.monotonic()
+            self.measurements += 1
+            if self._rng.random() < self.failure_rate:
+                raise RuntimeError("Checksum did not validate. Try again.")
+            self._temperature += self._rng.uniform(-0.1, 0.1)
+            self._humidity = min(100.0, max(0.0, self._humidity + self._rng.uniform(-0.3, 0.3)))
+
+    @property
+    def temperature(self):
+        self._measure()
+        return self._temperature
+
+    @property
+    def humidity(self):
+        self._measure()
+        return self._humidity
+
+    def exit(self):
+        pass
+
+
+class RecordedDHT22:
+    """Replays a CSV recording of readings in place of adafruit_dht.DHT22.
+
+    The CSV needs ``temperature_celsius`` and ``humidity_percent`` columns
+    (others are ignored); a row with either left empty replays a failed
+    read. Each ``temperature`` access moves to the next row and
+    ``humidity`` returns that row's value, which is the order
+    SensorSampler reads them in, so a replay does not depend on timing.
+    The recording loops.
+    """
+
+    def __init__(self, path):
+        with open(path, newline="") as f:
+            self._rows = [
+                (_float_or_none(row.get("temperature_celsius")),
+                 _float_or_none(row.get("humidity_percent")))
+                for row in csv.DictReader(f)
+            ]
+        if not self._rows:
+            raise ValueError(f"No readings in {path}")
+        self._index = -1
+        self.measurements = 0
+
+    def __len__(self):
+        """Number of recorded readings."""
+        return len(self._rows)
+
+    def _row(self):
+        temperature, humidity = self._rows[self._index % len(self._rows)]
+        if temperature is None or humidity is None:
+            raise RuntimeError("Recorded read failure")
+        return temperature, humidity
+
+    @property
+    def temperature(self):
+        self._index += 1
+        self.measurements += 1
+        return self._row()[0]
+
+    @property
+    def humidity(self):
+        return self._row()[1]
+
+    def exit(self):
+        pass
+
+
+def _float_or_none(value):
+    return float(value) if value not in (None, "") else None
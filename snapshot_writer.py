@@ -0,0 +1,197 @@
+"""Persist person-event snapshots off the detection thread.
+
+Annotating a 720p frame, JPEG-encoding it at quality 90 and writing it to
+an SD card can take longer than a detector pass. The detection thread only
+queues the event; a writer thread does the drawing, encoding and file I/O
+and commits the access log entries of a whole batch in one transaction.
+"""
+
+import collections
+import os
+import threading
+import time
+
+import cv2
+
+from detection import LatencyWindow, draw_detections
+from metrics import registry
+
+THUMBNAIL_SUFFIX = "_thumb.jpg"
+
+QUEUE_POLICIES = ("coalesce", "drop")
+
+_WRITE = registry.stage("snapshot_write")
+
+
+def _merge_entries(queued, newer, detections):
+    """Fold a newer event into a queued access log entry."""
+    queued["labels"] = sorted(set(queued["labels"]) | set(newer["labels"]))
+    queued["count"] = len(detections)
+    queued["tracks"] = sorted(set(queued.get("tracks", [])) | set(newer.get("tracks", [])))
+
+
+class SnapshotWriter:
+    """Bounded queue of person events written by a background thread.
+
+    ``store`` is an AccessLogStore. When ``max_queue`` events are waiting,
+    the ``coalesce`` policy folds a new event into the newest queued one
+    (its entry keeps the first timestamp and gets the newer frame plus the
+    union of labels and tracks), while ``drop`` discards it. With
+    ``thumbnail_width`` set, a downscaled copy is saved next to each image
+    and recorded as the entry's ``thumbnail``.
+    """
+
+    def __init__(self, store, snapshots_dir, max_queue=8, policy="coalesce",
+                 batch_size=4, quality=90, thumbnail_width=320, fsync=True):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(
+                f"Unknown queue policy '{policy}' (choose from {', '.join(QUEUE_POLICIES)})"
+            )
+        self._store = store
+        self.snapshots_dir = snapshots_dir
+        self.max_queue = max_queue
+        self.policy = policy
+        self.batch_size = batch_size
+        self.quality = quality
+        self.thumbnail_width = thumbnail_width
+        self.fsync = fsync
+        self._queue = collections.deque()  # (frame, detections, entry, submitted)
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self.write_latency = LatencyWindow()  # ms per batch, images + commit
+        self.event_latency = LatencyWindow()  # ms from submit to committed entry
+        self.written = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.failed = 0
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """Call ``callback(entries)`` from the writer thread after each committed batch."""
+        self._listeners.append(callback)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """Write what is still queued, then stop the writer thread."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self, frame_bgr, detections, entry):
+        """Queue an event without blocking; returns False if it was dropped.
+
+        The frame is not copied, so the caller must not modify it afterwards
+        (frames taken from a FrameBus never are).
+        """
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                if self.policy == "drop":
+                    self.dropped += 1
+                    return False
+                _, _, queued, submitted = self._queue[-1]
+                _merge_entries(queued, entry, detections)
+                self._queue[-1] = (frame_bgr, detections, queued, submitted)
+                self.coalesced += 1
+                return True
+            self._queue.append((frame_bgr, detections, entry, time.monotonic()))
+            self._cond.notify()
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._stopping:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                batch = [self._queue.popleft()
+                         for _ in range(min(self.batch_size, len(self._queue)))]
+            try:
+                self._write_batch(batch)
+            except Exception as exc:  # keep draining the queue whatever happens
+                print(f"Warning: snapshot batch failed ({exc})")
+                self.failed += len(batch)
+
+    def _write_batch(self, batch):
+        t0 = time.perf_counter()
+        entries, submitted = [], []
+        for frame_bgr, detections, entry, queued_at in batch:
+            try:
+                self._write_images(frame_bgr, detections, entry)
+            except Exception as exc:
+                print(f"Warning: could not save snapshot {entry['id']} ({exc})")
+                self.failed += 1
+                continue
+            entries.append(entry)
+            submitted.append(queued_at)
+        if not entries:
+            return
+        try:
+            if self.fsync:
+                # One directory sync makes the batch's new file names durable
+                # before the entries referencing them are committed
+                fd = os.open(self.snapshots_dir, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            self._store.append_many(entries)
+        except Exception as exc:
+            # e.g. disk full or "database is locked"; the images left behind
+            # are removed by retention as orphans
+            print(f"Warning: could not log {len(entries)} snapshot(s) ({exc})")
+            self.failed += len(entries)
+            return
+        self.written += len(entries)
+        for callback in self._listeners:
+            try:
+                callback(entries)
+            except Exception as exc:
+                print(f"Warning: snapshot listener failed ({exc})")
+        ms = (time.perf_counter() - t0) * 1e3
+        self.write_latency.add(ms)
+        _WRITE.observe(ms)
+        now = time.monotonic()
+        for queued_at in submitted:
+            self.event_latency.add((now - queued_at) * 1e3)
+
+    def _write_images(self, frame_bgr, detections, entry):
+        annotated = frame_bgr.copy()
+        draw_detections(annotated, detections)
+        self._write_jpeg(entry["image"], annotated, self.quality)
+        if self.thumbnail_width:
+            h, w = annotated.shape[:2]
+            size = (self.thumbnail_width, round(h * self.thumbnail_width / w))
+            thumb = cv2.resize(annotated, size, interpolation=cv2.INTER_AREA)
+            name = entry["id"] + THUMBNAIL_SUFFIX
+            self._write_jpeg(name, thumb, 80)
+            entry["thumbnail"] = name
+
+    def _write_jpeg(self, filename, image, quality):
+        ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise RuntimeError("JPEG encoding failed")
+        with open(os.path.join(self.snapshots_dir, filename), "wb") as f:
+            f.write(jpeg)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def stats(self):
+        return {
+            "queue_depth": len(self._queue),
+            "max_queue": self.max_queue,
+            "policy": self.policy,
+            "written": self.written,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "failed": self.failed,
+            "write_ms": self.write_latency.summary(),
+            "event_ms": self.event_latency.summary(),
+        }
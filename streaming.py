@@ -0,0 +1,393 @@
+"""Frame fan-out between the capture thread and its consumers.
+
+The capture loop publishes every frame to a FrameBus; consumers (MJPEG
+viewers, the detection thread) block until a frame newer than the one they
+last saw is available instead of polling shared globals on a timer.
+"""
+
+import sys
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from metrics import registry
+
+# Frames a viewer skipped because a newer one arrived first
+_VIEWER_DROPS = registry.counter(
+    "frames_dropped", "Frames skipped by a slow consumer.", consumer="viewer",
+)
+# Capture-to-send delay of every MJPEG chunk handed to a client
+_FRAME_AGE = registry.stage("frame_age_at_send")
+
+
+class FrameBus:
+    """Latest-value channel with sequence numbers.
+
+    Only the newest frame is kept. A consumer remembers the sequence number
+    of the frame it last handled and waits for anything newer, so slow
+    consumers automatically skip stale frames and fast consumers never see
+    the same frame twice.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._frame = None
+        self._listeners = []
+        self._waiter = None
+
+    def add_listener(self, callback):
+        """Call ``callback(seq)`` from the publishing thread after every publish."""
+        self._listeners.append(callback)
+
+    def set_waiter(self, waiter):
+        """Route ``wait()`` through ``waiter`` for the threads it owns.
+
+        For servers whose clients are not OS threads (see gevent_server.py):
+        ``waiter.owns_thread()`` says whether the calling thread is theirs,
+        and ``waiter.wait(after_seq, timeout)`` then waits without blocking
+        it. Every other thread keeps using the condition variable.
+        """
+        self._waiter = waiter
+
+    def publish(self, frame):
+        """Store a new frame and wake every waiting consumer."""
+        with self._cond:
+            self._seq += 1
+            seq = self._seq
+            self._frame = frame
+            self._cond.notify_all()
+        for callback in self._listeners:
+            callback(seq)
+        return seq
+
+    def latest(self):
+        """Return ``(seq, frame)`` for the newest frame; seq is 0 if none yet."""
+        with self._cond:
+            return self._seq, self._frame
+
+    def wait(self, after_seq, timeout=None):
+        """Block until a frame newer than ``after_seq`` exists.
+
+        Returns ``(seq, frame)`` for the newest frame, or ``None`` on timeout.
+        Frames published between ``after_seq`` and the returned one are
+        skipped (``seq - after_seq - 1`` of them).
+        """
+        waiter = self._waiter
+        if waiter is not None and waiter.owns_thread():
+            return waiter.wait(after_seq, timeout)
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > after_seq, timeout):
+                return None
+            return self._seq, self._frame
+
+
+class FramePool:
+    """Preallocated frame buffers for the capture loop to fill.
+
+    A camera that can write into a given buffer (``capture_into``) then
+    costs no frame-sized allocation per frame. A buffer is handed out again
+    only once nothing but the pool refers to it (CPython reference counts),
+    so a frame on a FrameBus is still never modified while any consumer,
+    such as the detection thread or the snapshot writer's queue, holds it.
+    When every buffer is in use the pool grows, up to ``max_count``; past
+    that each acquire allocates a buffer the pool does not keep
+    (``misses``).
+    """
+
+    def __init__(self, shape, count=4, max_count=8, dtype=np.uint8):
+        self.shape = shape
+        self.dtype = dtype
+        self.max_count = max(count, max_count)
+        self._buffers = [np.empty(shape, dtype) for _ in range(count)]
+        self._next = 0
+        self.misses = 0
+        # References to a free buffer: the pool's list plus getrefcount's own
+        self._free_refs = sys.getrefcount(self._buffers[0])
+
+    def acquire(self):
+        """Return a buffer no one else holds. Call from one thread only."""
+        buffers = self._buffers
+        for _ in range(len(buffers)):
+            i = self._next
+            self._next = (i + 1) % len(buffers)
+            if sys.getrefcount(buffers[i]) <= self._free_refs:
+                return buffers[i]
+        buffer = np.empty(self.shape, self.dtype)
+        if len(buffers) < self.max_count:
+            buffers.append(buffer)
+        else:
+            self.misses += 1
+        return buffer
+
+    def __len__(self):
+        return len(self._buffers)
+
+
+# Content-Length lets a client (such as the aggregator) read each part
+# without scanning for the boundary
+_PART_HEADER = b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n"
+_PART_TRAILER = b"\r\n"
+
+
+class ViewerLimitError(RuntimeError):
+    """Raised when a stream already has its maximum number of viewers."""
+
+
+class _EncodedFrame:
+    """One JPEG frame, pre-built as a complete multipart chunk.
+
+    ``chunk`` is shared by every viewer; ``jpeg`` is a zero-copy view of the
+    image bytes inside it. ``captured`` is the monotonic capture time of the
+    source frame, if known.
+    """
+
+    __slots__ = ("chunk", "jpeg", "captured")
+
+    def __init__(self, jpeg, captured=None):
+        jpeg = memoryview(jpeg).cast("B")
+        header = _PART_HEADER % len(jpeg)
+        self.chunk = b"".join((header, jpeg, _PART_TRAILER))
+        self.jpeg = memoryview(self.chunk)[len(header):-len(_PART_TRAILER)]
+        self.captured = captured
+
+
+class MjpegViewer:
+    """A single /video_feed client and its position in the stream."""
+
+    def __init__(self, broadcaster):
+        self._broadcaster = broadcaster
+        self.seq = 0
+        self.sent = 0
+        self.skipped = 0
+        self.closed = False
+
+    def stream(self, timeout=5.0):
+        """Yield multipart chunks, jumping to the newest frame each time.
+
+        A viewer that falls behind never queues frames; it simply resumes at
+        the latest one and the frames in between count as ``skipped``.
+        """
+        try:
+            while not self.closed:
+                frame = self._next(timeout)
+                if frame is not None:
+                    if frame.captured is not None and registry.enabled:
+                        _FRAME_AGE.observe((time.monotonic() - frame.captured) * 1e3)
+                    yield frame.chunk
+        finally:
+            self.close()
+
+    def next_jpeg(self, timeout=5.0):
+        """Wait for the next frame; returns its JPEG bytes (a memoryview) or None on timeout."""
+        frame = self._next(timeout)
+        return frame.jpeg if frame is not None else None
+
+    def _next(self, timeout):
+        item = self._broadcaster._bus.wait(self.seq, timeout)
+        if item is None:
+            return None
+        seq, frame = item
+        if self.seq:
+            self.skipped += seq - self.seq - 1
+            _VIEWER_DROPS.inc(seq - self.seq - 1)
+        self.seq = seq
+        self.sent += 1
+        return frame
+
+    def close(self):
+        """Release the viewer slot. Safe to call more than once."""
+        if not self.closed:
+            self.closed = True
+            self._broadcaster._remove(self)
+
+
+class MjpegBroadcaster:
+    """Fan out encoded JPEG frames to any number of MJPEG viewers.
+
+    Each published frame is turned into its multipart chunk exactly once,
+    no matter how many viewers are connected.
+    """
+
+    def __init__(self, max_viewers=None):
+        self.max_viewers = max_viewers
+        self._bus = FrameBus()
+        self._viewers = set()
+        self._taps = []
+        self._lock = threading.Lock()
+
+    @property
+    def bus(self):
+        """The FrameBus viewers wait on; carries ``_EncodedFrame`` items."""
+        return self._bus
+
+    def publish(self, jpeg, captured=None):
+        """Publish encoded JPEG data (bytes or a uint8 array).
+
+        ``captured`` is the frame's ``time.monotonic()`` capture time, used
+        for the frame age metric.
+        """
+        frame = _EncodedFrame(jpeg, captured)
+        seq = self._bus.publish(frame)
+        for callback in self._taps:
+            callback(frame.jpeg, frame.captured)
+        return seq
+
+    def latest_jpeg(self):
+        """Return the newest JPEG as a memoryview, or None before the first frame."""
+        _, frame = self._bus.latest()
+        return frame.jpeg if frame is not None else None
+
+    def open_viewer(self):
+        """Register a viewer; raises ViewerLimitError when the stream is full."""
+        with self._lock:
+            if self.max_viewers is not None and len(self._viewers) >= self.max_viewers:
+                raise ViewerLimitError(
+                    f"Stream is limited to {self.max_viewers} viewers"
+                )
+            viewer = MjpegViewer(self)
+            self._viewers.add(viewer)
+            return viewer
+
+    def add_tap(self, callback):
+        """Call ``callback(jpeg, captured)`` from the publishing thread for every frame.
+
+        ``jpeg`` is the frame's memoryview, the same bytes viewers are sent.
+        A tap keeps the stream encoding like a viewer does, but takes no
+        viewer slot and is not counted in ``viewer_count``.
+        """
+        with self._lock:
+            self._taps = self._taps + [callback]
+
+    def remove_tap(self, callback):
+        with self._lock:
+            self._taps = [c for c in self._taps if c is not callback]
+
+    @property
+    def tapped(self):
+        return bool(self._taps)
+
+    @property
+    def viewer_count(self):
+        with self._lock:
+            return len(self._viewers)
+
+    def _remove(self, viewer):
+        with self._lock:
+            self._viewers.discard(viewer)
+
+
+StreamProfile = namedtuple("StreamProfile", "name width height quality max_fps")
+
+DEFAULT_PROFILES = {
+    p.name: p
+    for p in (
+        StreamProfile("full", 1280, 720, 85, 30),
+        StreamProfile("medium", 640, 360, 75, 15),
+        StreamProfile("thumbnail", 320, 180, 60, 5),
+    )
+}
+
+
+class ProfileStream:
+    """A stream profile and the broadcaster its encoded frames go to.
+
+    The capture loop only encodes a profile while it has viewers or taps,
+    and no more often than the profile's FPS cap.
+    """
+
+    def __init__(self, profile, max_viewers=None):
+        self.profile = profile
+        self.broadcaster = MjpegBroadcaster(max_viewers=max_viewers)
+        self._interval = 1.0 / profile.max_fps
+        self._last_encode = 0.0
+        self._next_due = 0.0
+        # Set when the camera delivers this profile already encoded
+        self.hardware = False
+        self._resized = None  # reused by publish() for the downscaled frame
+        self._snapshot = (0, None)  # (raw frame seq, JPEG) last encoded by snapshot()
+        self._encode_stage = registry.stage("encode", profile=profile.name)
+        self._encoded = registry.counter(
+            "frames_encoded", "Frames encoded per stream profile.", profile=profile.name,
+        )
+
+    @property
+    def active(self):
+        return self.broadcaster.viewer_count > 0 or self.broadcaster.tapped
+
+    def due(self, now):
+        """True if the profile has viewers or taps and its next frame is due.
+
+        Frames are due on a fixed schedule of one per interval rather than
+        an interval after the last encode, so a frame that arrives slightly
+        early (capture jitter) does not push the next one a frame later.
+        """
+        return self.active and now >= self._next_due
+
+    def _encoded_at(self, now):
+        self._last_encode = now
+        self._next_due += self._interval
+        if self._next_due < now - self._interval:  # idle or a slow camera; restart the schedule
+            self._next_due = now + self._interval
+
+    def encode(self, frame_bgr, resized=None):
+        """Encode ``frame_bgr`` for this profile; returns the JPEG array or None.
+
+        ``resized`` is an optional reusable buffer for the downscaled frame.
+        """
+        p = self.profile
+        if frame_bgr.shape[1] != p.width or frame_bgr.shape[0] != p.height:
+            frame_bgr = cv2.resize(
+                frame_bgr, (p.width, p.height), dst=resized, interpolation=cv2.INTER_AREA,
+            )
+        ok, jpeg = cv2.imencode(".jpg", frame_bgr, [cv2.IMWRITE_JPEG_QUALITY, p.quality])
+        return jpeg if ok else None
+
+    def publish(self, frame_bgr, now=None):
+        """Encode ``frame_bgr`` and push it to this profile's viewers.
+
+        ``now`` is the frame's monotonic capture time.
+        """
+        self._encoded_at(time.monotonic() if now is None else now)
+        p = self.profile
+        if self._resized is None and frame_bgr.shape[:2] != (p.height, p.width):
+            self._resized = np.empty((p.height, p.width) + frame_bgr.shape[2:], np.uint8)
+        t0 = registry.clock()
+        jpeg = self.encode(frame_bgr, self._resized)
+        self._encode_stage.since(t0)
+        if jpeg is not None:
+            self._encoded.inc()
+            self.broadcaster.publish(jpeg, captured=self._last_encode)
+
+    def snapshot(self, raw_bus, render):
+        """Return ``(tag, jpeg)`` for the newest frame, or ``(None, None)`` before the first.
+
+        Reuses the live stream's JPEG when the profile is being encoded
+        anyway; otherwise the newest frame on ``raw_bus`` is passed through
+        ``render`` and encoded, once per frame however many clients ask.
+        ``tag`` names the frame (``s<seq>`` or ``r<seq>``) and changes
+        whenever the JPEG does.
+        """
+        if self.active or self.hardware:
+            seq, item = self.broadcaster.bus.latest()
+            if item is not None:
+                return f"s{seq}", item.jpeg
+        seq, raw = raw_bus.latest()
+        if raw is None:
+            return None, None
+        cached_seq, jpeg = self._snapshot
+        if cached_seq != seq:
+            jpeg = self.encode(render(raw))
+            if jpeg is None:
+                return f"r{seq}", None
+            self._snapshot = (seq, jpeg)
+        return f"r{seq}", jpeg
+
+    def publish_jpeg(self, jpeg, now=None):
+        """Push a frame the camera encoded itself (see ``hardware``) to the viewers."""
+        self._encoded_at(time.monotonic() if now is None else now)
+        self._encoded.inc()
+        self.broadcaster.publish(jpeg, captured=self._last_encode)